@@ -48,7 +48,7 @@ def menu(selected_index):
         else:
             print(f"  {option}")
 
-    print("\n使用 ↑ ↓ 键选择，按 Enter 执行，按 'q' 退出")
+    print("\n使用 ↑ ↓ 键选择，按 Enter 执行，按 'd' 导出调试日志，按 'q' 退出")
 
 
 @handle_exception(UserInputError, default_return=None, error_message="Command UI operation failed")
@@ -72,6 +72,14 @@ def main():
             # 处理普通按键
             elif key == b'\r':  # 回车键
                 utils.selectOption(selected_index)
+            elif key.lower() == b'd':  # 导出最近的调试日志
+                path = utils.dumpDebugLog()
+                if path:
+                    print(f"\n{Fore.GREEN}Debug log dumped to {path}{Style.RESET_ALL}")
+                else:
+                    print(f"\n{Fore.YELLOW}Ring buffer logging is disabled{Style.RESET_ALL}")
+                print("Press any key to continue...")
+                msvcrt.getch()
             elif key.lower() == b'q':  # 退出
                 break
             # 其他按键不做处理，继续循环
@@ -0,0 +1,34 @@
+"""
+配置读取微基准测试
+对比热路径上读取配置的几种方式（纳秒/次）：
+- config.get(key, default): 经过handle_exception装饰器和一次字典查找
+- config.snapshot()[key]: 直接读映射快照
+- config.values.key: 读取类型化快照的slots属性
+
+运行方法（在项目根目录）：
+python -m benchmarks.bench_config
+"""
+import timeit
+from utils.impl.ConfigManager import config
+
+NUMBER = 1000000
+
+
+def bench(name, statement):
+    """多次测量取最小值，返回每次读取的纳秒数"""
+    best = min(timeit.repeat(statement, globals={"config": config}, number=NUMBER, repeat=5))
+    ns = best * 1e9 / NUMBER
+    print(f"{name:<28} {ns:>8.1f} ns/read")
+    return ns
+
+
+def main():
+    baseline = bench('config.get("timeout", 5)', 'config.get("timeout", 5)')
+    bench('config.snapshot()["timeout"]', 'config.snapshot()["timeout"]')
+    fast = bench("config.values.timeout", "config.values.timeout")
+    print(f"speedup {baseline / fast:.1f}x")
+    assert config.get("timeout", 5) == config.values.timeout
+
+
+if __name__ == "__main__":
+    main()
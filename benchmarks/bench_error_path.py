@@ -0,0 +1,90 @@
+"""
+handle_exception错误路径微基准测试
+一个热循环中的函数每次调用都抛出异常并返回默认值，对比：
+- legacy: 旧版装饰器，每次都traceback.format_exc()并print到标准输出（重定向到空设备）
+- pipeline: 新版装饰器，错误事件交给日志管线，堆栈按调用点采样，输出时才格式化
+  （分别测量去掉管线过滤器和保留过滤器（重复消息合并、限流）两种情况）
+
+输出处理器替换为写入空设备的文件格式化处理器，只测量错误路径本身的开销
+
+运行方法（在项目根目录）：
+python -m benchmarks.bench_error_path
+"""
+import contextlib
+import logging
+import os
+import time
+import traceback
+from functools import wraps
+from utils.impl.AdvancedLog import logger as cctb_logger
+from utils.impl.ErrorHandler import handle_exception, get_error_stats
+
+CALLS = 20000
+
+
+def legacy_handle_exception(exception_type=Exception, default_return=None, error_message=None, error_code=None):
+    """旧版handle_exception（保留用作对照）"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except exception_type as e:
+                msg = error_message or f"Error in {func.__name__}: {str(e)}"
+                print(f"ERROR: {msg} (Error code: {error_code or 'UNKNOWN'})")
+                print(f"ERROR: Traceback: {traceback.format_exc()}")
+                return default_return
+        return wrapper
+    return decorator
+
+
+def parse_port(text):
+    return int(text)
+
+
+legacy_parse = legacy_handle_exception(ValueError, default_return=0)(parse_port)
+pipeline_parse = handle_exception(ValueError, default_return=0)(parse_port)
+
+
+def bench(func):
+    """计算每次出错调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for i in range(CALLS):
+        func("port-%d" % (i % 50))
+    return (time.perf_counter() - start) * 1e6 / CALLS
+
+
+def report(name, per_call):
+    print(f"{name:<28} {per_call:>8.2f} us/call")
+
+
+def main():
+    pipeline = cctb_logger._pipeline
+    saved_targets = pipeline.targets
+    saved_filters = list(pipeline.filters)
+    devnull = open(os.devnull, "w", encoding="utf-8")
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(cctb_logger._get_file_formatter())
+    pipeline.targets = [handler]
+    try:
+        # 旧版直接print，只能整体重定向标准输出
+        with contextlib.redirect_stdout(devnull):
+            legacy = bench(legacy_parse)
+        report("legacy (print traceback)", legacy)
+        pipeline.filters = []
+        raw = bench(pipeline_parse)
+        report("pipeline (no filters)", raw)
+        pipeline.filters = saved_filters
+        filtered = bench(pipeline_parse)
+        report("pipeline (dedup/rate limit)", filtered)
+        print(f"speedup {legacy / raw:.1f}x (no filters), {legacy / filtered:.1f}x (with filters)")
+        site = get_error_stats()[f"{parse_port.__module__}.parse_port"]
+        print(f"caught={site['caught']} tracebacks={site['tracebacks']} avg_error_path={site['avg_error_path_ms'] * 1000:.2f}us")
+    finally:
+        pipeline.targets = saved_targets
+        pipeline.filters = saved_filters
+        devnull.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+日志入口微基准测试
+对比旧版utils.info/warn/error调用路径（每次调用都重新导入utils.impl.Log、定义闭包并套一层
+handle_exception，再经过Log -> LogManager.info -> get_default_logger() -> CCTBLogger.info）
+与缓存入口 + isEnabledFor级别检查的新路径，
+以及环形缓冲级别为DEBUG时（根记录器降到DEBUG，记录由管线上的级别闸门挡住）utils.debug的开销：
+直接写入缓冲的路径与创建LogRecord并经过处理器链的路径对比
+
+为了只测量调用开销，测试期间输出处理器被替换为空处理器
+
+运行方法（在项目根目录）：
+python -m benchmarks.bench_facade
+"""
+import logging
+import time
+from utils import UtilsManager as utils
+from utils.impl.AdvancedLog import logger as cctb_logger
+from utils.impl.ErrorHandler import handle_exception
+
+CALLS = 100000
+
+
+def legacy_info(message):
+    """旧版utils.info（保留用作对照）"""
+    from utils.impl.Log import info as _info
+
+    @handle_exception(default_return=None, error_message="Failed to log info message")
+    def _log():
+        return _info(message)
+
+    return _log()
+
+
+def legacy_debug(message):
+    """旧版调用路径下的debug（旧版utils没有debug，按info的写法构造）"""
+    from utils.impl.Log import debug as _debug
+
+    @handle_exception(default_return=None, error_message="Failed to log debug message")
+    def _log():
+        return _debug(message)
+
+    return _log()
+
+
+class _NullHandler(logging.Handler):
+    """丢弃所有记录的处理器"""
+
+    def emit(self, record):
+        pass
+
+
+def bench(name, func, *args):
+    """计算每次调用的平均耗时"""
+    start = time.perf_counter()
+    for i in range(CALLS):
+        func(*args)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed * 1e9 / CALLS
+    print(f"{name:<32} {per_call:>10,.0f} ns/call")
+    return per_call
+
+
+def main():
+    pipeline = cctb_logger._pipeline
+    saved_targets = pipeline.targets
+    pipeline.targets = [_NullHandler()]
+    saved_level = cctb_logger._logger.level
+    cctb_logger._logger.setLevel(logging.INFO)
+    value = 42
+    try:
+        print("enabled level (INFO):")
+        old = bench("  legacy utils.info(f-string)", lambda: legacy_info(f"value: {value}"))
+        new = bench("  facade utils.info(f-string)", lambda: utils.info(f"value: {value}"))
+        bench("  facade utils.info(lazy args)", utils.info, "value: %s", value)
+        print(f"  speedup {old / new:.2f}x")
+
+        print("disabled level (DEBUG):")
+        old = bench("  legacy debug(f-string)", lambda: legacy_debug(f"value: {value}"))
+        new = bench("  facade utils.debug(lazy args)", utils.debug, "value: %s", value)
+        bench("  empty function call", lambda: None)
+        print(f"  speedup {old / new:.2f}x")
+
+        ring_buffer = cctb_logger._ring_buffer
+        if ring_buffer is not None and cctb_logger._level_gate is not None:
+            print("ring buffer at DEBUG (log_level INFO):")
+            saved_ring_level = ring_buffer.level
+            ring_buffer.setLevel(logging.DEBUG)
+            cctb_logger._logger.setLevel(logging.DEBUG)
+            try:
+                chain = bench("  logger.debug via handler chain", cctb_logger._logger.debug, "value: %s", value)
+                direct = bench("  facade utils.debug(lazy args)", utils.debug, "value: %s", value)
+            finally:
+                ring_buffer.setLevel(saved_ring_level)
+                cctb_logger._logger.setLevel(logging.INFO)
+            print(f"  direct capture {chain / direct:.1f}x faster than the handler chain, "
+                  f"{direct / new:.1f}x the disabled-level fast path")
+    finally:
+        pipeline.targets = saved_targets
+        cctb_logger._logger.setLevel(saved_level)
+
+
+if __name__ == "__main__":
+    main()
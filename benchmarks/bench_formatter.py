@@ -0,0 +1,95 @@
+"""
+格式化器微基准测试
+对比旧版ColoredFormatter/FileFormatter（每次调用都导入GetTime、调用datetime.now().strftime、
+走if/elif分支并重新拼接colorama转义串）与预编译格式化器的吞吐量（记录数/秒）
+
+运行方法（在项目根目录）：
+python -m benchmarks.bench_formatter
+"""
+import logging
+import time
+from colorama import Fore, Style, Back
+from utils.impl.LogFormatter import LevelTemplates, ColoredFormatter, FileFormatter
+
+RECORDS = 200000
+
+
+class LegacyColoredFormatter(logging.Formatter):
+    """旧版彩色格式化器（保留用作对照）"""
+
+    def format(self, record):
+        message = record.getMessage()
+        from utils.impl.GetTime import gettime
+        current_time = gettime()
+        if record.levelname == 'INFO':
+            console_output = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}{current_time}{Style.BRIGHT}{Fore.LIGHTWHITE_EX} INF{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}{message}"
+            file_output = f"[{current_time} INF] {message}"
+        elif record.levelname == 'WARNING':
+            console_output = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}{current_time}{Style.BRIGHT}{Fore.LIGHTYELLOW_EX} WRN{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}* {message}"
+            file_output = f"[{current_time} WRN] * {message}"
+        elif record.levelname == 'ERROR':
+            console_output = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}{current_time} {Back.RED}{Style.BRIGHT}{Fore.LIGHTWHITE_EX}ERR{Back.RESET}{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}* {message}"
+            file_output = f"[{current_time} ERR] * {message}"
+        elif record.levelname == 'DEBUG':
+            console_output = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}{current_time}{Style.BRIGHT}{Fore.LIGHTCYAN_EX} DBG{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}{message}"
+            file_output = f"[{current_time} DBG] {message}"
+        else:
+            console_output = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}{current_time}{Style.BRIGHT}{Fore.LIGHTMAGENTA_EX} {record.levelname}{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}{message}"
+            file_output = f"[{current_time} {record.levelname}] {message}"
+        record.file_output = file_output
+        return console_output
+
+
+class LegacyFileFormatter(logging.Formatter):
+    """旧版文件格式化器（保留用作对照），不复用record.file_output"""
+
+    def format(self, record):
+        message = record.getMessage()
+        from utils.impl.GetTime import gettime
+        current_time = gettime()
+        if record.levelname == 'INFO':
+            return f"[{current_time} INF] {message}"
+        elif record.levelname == 'WARNING':
+            return f"[{current_time} WRN] * {message}"
+        elif record.levelname == 'ERROR':
+            return f"[{current_time} ERR] * {message}"
+        elif record.levelname == 'DEBUG':
+            return f"[{current_time} DBG] {message}"
+        else:
+            return f"[{current_time} {record.levelname}] {message}"
+
+
+def make_records(count):
+    """构造不同级别的测试记录"""
+    levels = [logging.INFO, logging.WARNING, logging.ERROR, logging.DEBUG]
+    records = []
+    for i in range(count):
+        level = levels[i % len(levels)]
+        records.append(logging.LogRecord("CCTB", level, __file__, 0, "[+] Sent to 192.168.1.%d:7500 (anti_full_screen)", (i % 255,), None))
+    return records
+
+
+def bench(name, console, file, records):
+    """对一组格式化器做一次控制台+文件的完整格式化并计算吞吐量"""
+    for record in records:
+        record.__dict__.pop("file_output", None)
+    start = time.perf_counter()
+    for record in records:
+        console.format(record)
+        file.format(record)
+    elapsed = time.perf_counter() - start
+    rate = len(records) / elapsed
+    print(f"{name:<12} {rate:>12,.0f} records/s  ({elapsed * 1e6 / len(records):.2f} us/record)")
+    return rate
+
+
+def main():
+    records = make_records(RECORDS)
+    legacy = bench("legacy", LegacyColoredFormatter(), LegacyFileFormatter(), records)
+    templates = LevelTemplates()
+    compiled = bench("compiled", ColoredFormatter(templates), FileFormatter(templates), records)
+    print(f"speedup      {compiled / legacy:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
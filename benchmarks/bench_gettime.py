@@ -0,0 +1,46 @@
+"""
+时间获取微基准测试
+对比GetTime中缓存到下一个整秒的gettime/getdatetime与每次调用都执行datetime.now().strftime()的
+同样带handle_exception装饰器的写法（纳秒/次），用来确认记忆化确实比直接格式化快
+
+运行方法（在项目根目录）：
+python -m benchmarks.bench_gettime
+"""
+import datetime
+import timeit
+from utils.impl.ErrorHandler import handle_exception, SystemError
+from utils.impl.GetTime import gettime, getdatetime
+
+NUMBER = 200000
+
+
+@handle_exception(SystemError, default_return="00:00:00", error_message="Failed to get current time")
+def plain_gettime():
+    return datetime.datetime.now().strftime("%H:%M:%S")
+
+
+@handle_exception(SystemError, default_return="1970-01-01 00:00:00", error_message="Failed to get current date and time")
+def plain_getdatetime():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def bench(name, func):
+    """多次测量取最小值，返回每次调用的纳秒数"""
+    best = min(timeit.repeat(func, number=NUMBER, repeat=5))
+    ns = best * 1e9 / NUMBER
+    print(f"{name:<24} {ns:>8.1f} ns/call")
+    return ns
+
+
+def main():
+    for label, memoized, plain in (("gettime", gettime, plain_gettime),
+                                   ("getdatetime", getdatetime, plain_getdatetime)):
+        baseline = bench(f"{label} (strftime)", plain)
+        fast = bench(f"{label} (memoized)", memoized)
+        print(f"speedup {baseline / fast:.1f}x")
+        # 跨秒时两者的值可能不同，只检查格式一致
+        assert len(memoized()) == len(plain())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+JSON格式化器微基准测试
+对比旧版JsonFormatter（每条记录新建字典、调用datetime.fromtimestamp().isoformat()再json.dumps）
+与LogJson.JsonFormatter在orjson和标准库两种后端下的吞吐量（记录数/秒）
+
+运行方法（在项目根目录）：
+python -m benchmarks.bench_json
+"""
+import json
+import logging
+import time
+from datetime import datetime
+from utils.impl.LogJson import JsonFormatter, get_backend
+
+RECORDS = 200000
+
+
+class LegacyJsonFormatter(logging.Formatter):
+    """旧版JSON格式化器（保留用作对照）"""
+
+    def format(self, record):
+        log_entry = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno
+        }
+        if record.exc_info:
+            log_entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(log_entry, ensure_ascii=False)
+
+
+def make_records(count):
+    """构造测试记录"""
+    records = []
+    for i in range(count):
+        record = logging.LogRecord("CCTB.IPscanner", logging.INFO, __file__, 42,
+                                   "[+] Sent to 192.168.1.%d:7500 (anti_full_screen)", (i % 255,), None)
+        record.funcName = "send_packet"
+        records.append(record)
+    return records
+
+
+def bench(name, format_record, records):
+    """对所有记录格式化一次并计算吞吐量"""
+    start = time.perf_counter()
+    for record in records:
+        format_record(record)
+    elapsed = time.perf_counter() - start
+    rate = len(records) / elapsed
+    print(f"{name:<10} {rate:>12,.0f} records/s  ({elapsed * 1e6 / len(records):.2f} us/record)")
+    return rate
+
+
+def main():
+    records = make_records(RECORDS)
+    legacy = bench("legacy", LegacyJsonFormatter().format, records)
+
+    formatter = JsonFormatter()
+    stdlib = bench("stdlib", formatter._format_stdlib, records)
+    print(f"speedup    {stdlib / legacy:.2f}x (stdlib)")
+    if get_backend() == "orjson":
+        fast = bench("orjson", formatter._format_orjson, records)
+        print(f"speedup    {fast / legacy:.2f}x (orjson)")
+
+    # 两种后端的输出解析后应当一致
+    sample = records[0]
+    assert json.loads(formatter._format_stdlib(sample)) == json.loads(formatter.format(sample))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+性能历史微基准测试
+对比不同历史长度下读取统计的耗时（微秒/次）：
+- deque: 旧版三个deque，get_average_stats()每次重新求和
+- deque+sorted: 在旧版结构上计算p50/p95/p99需要每次排序
+- MetricHistory: 数组环形缓冲，均值、最值增量维护，分位数来自分桶草图
+以及两种结构的内存占用
+
+运行方法（在项目根目录）：
+python -m benchmarks.bench_metric_history
+"""
+import sys
+import random
+import timeit
+from collections import deque
+from utils.impl.MetricHistory import MetricHistory
+
+SIZES = (100, 3600, 4 * 3600)
+METRICS = ("cpu", "memory_mb", "threads")
+
+
+def fill(size):
+    histories = [deque(maxlen=size) for _ in METRICS]
+    history = MetricHistory(METRICS, size)
+    for i in range(size):
+        sample = (random.uniform(0, 100), random.uniform(50, 300), random.randint(5, 40))
+        for column, value in zip(histories, sample):
+            column.append(value)
+        history.append(float(i), sample)
+    return histories, history
+
+
+def deque_average(histories):
+    return [sum(column) / len(column) for column in histories]
+
+
+def deque_quantiles(histories):
+    result = []
+    for column in histories:
+        ordered = sorted(column)
+        result.append([ordered[int(q * (len(ordered) - 1))] for q in (0.5, 0.95, 0.99)])
+    return result
+
+
+def history_read(history, step):
+    # 每次读取前追加一个采样，分位数缓存失效，测量的是采样后第一次读取的开销
+    history.append(float(history.sequence), (50.0, 100.0, 10))
+    return [history.stats(name) for name in METRICS]
+
+
+def bench(statement, namespace, number):
+    return min(timeit.repeat(statement, globals=namespace, number=number, repeat=3)) * 1e6 / number
+
+
+def main():
+    print(f"{'samples':>8} {'deque avg':>12} {'deque+sorted':>14} {'MetricHistory':>14} {'deque KB':>10} {'array KB':>10}")
+    for size in SIZES:
+        histories, history = fill(size)
+        namespace = {"histories": histories, "history": history, "deque_average": deque_average,
+                     "deque_quantiles": deque_quantiles, "history_read": history_read}
+        number = max(20, 200000 // size)
+        average = bench("deque_average(histories)", namespace, number)
+        quantiles = bench("deque_quantiles(histories)", namespace, number)
+        fresh = bench("history_read(history, 0)", namespace, 2000)
+        deque_bytes = sum(sys.getsizeof(column) + sum(sys.getsizeof(value) for value in column) for column in histories)
+        print(f"{size:>8} {average:>10.1f}us {quantiles:>12.1f}us {fresh:>12.1f}us "
+              f"{deque_bytes / 1024:>10.1f} {history.estimate_size() / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+脱敏过滤器微基准测试
+按不同消息长度测量每条记录经过RedactionFilter的额外耗时：
+- miss: 消息中不含任何敏感键，由字面量预过滤直接跳过
+- near: 含有敏感键字面量但没有键值对，需要走一次正则
+- hit: 含有password=xxx，需要正则替换
+
+运行方法（在项目根目录）：
+python -m benchmarks.bench_redaction
+"""
+import json
+import logging
+import time
+from utils.impl.LogFilters import create_redaction_filter
+
+RECORDS = 20000
+SIZES = [32, 256, 2048, 16384]
+
+
+def load_rules():
+    """读取logging.json中的脱敏规则"""
+    with open("config/logging.json", "r", encoding="utf-8") as f:
+        return json.load(f).get("filters", {})
+
+
+def make_message(size, kind):
+    """构造指定长度和类型的消息"""
+    filler = "[+] Sent to 192.168.1.10:7500 anti_full_screen "
+    if kind == "miss":
+        tail = ""
+    elif kind == "near":
+        tail = " keyboard hotkey "
+    else:
+        tail = " password=hunter2 "
+    body = (filler * (size // len(filler) + 1))[:max(0, size - len(tail))]
+    return body + tail
+
+
+def bench(redaction, message):
+    """返回每条记录的平均耗时（微秒），扣除getMessage本身的开销"""
+    records = [logging.LogRecord("CCTB", logging.INFO, __file__, 0, message, None, None) for _ in range(RECORDS)]
+
+    start = time.perf_counter()
+    for record in records:
+        record.getMessage()
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for record in records:
+        redaction.filter(record)
+    elapsed = time.perf_counter() - start
+    return max(0.0, elapsed - baseline) * 1e6 / RECORDS
+
+
+def main():
+    redaction = create_redaction_filter(load_rules())
+    if redaction is None:
+        print("No redaction rules configured")
+        return
+
+    print(f"{'size':>8} {'miss':>12} {'near':>12} {'hit':>12}   (us/record)")
+    for size in SIZES:
+        row = [bench(redaction, make_message(size, kind)) for kind in ("miss", "near", "hit")]
+        print(f"{size:>8} {row[0]:>12.3f} {row[1]:>12.3f} {row[2]:>12.3f}")
+    print(redaction.get_stats())
+
+
+if __name__ == "__main__":
+    main()
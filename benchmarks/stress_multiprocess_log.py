@@ -0,0 +1,136 @@
+"""
+多进程共享日志压力测试
+多个写入进程同时向同一个日志文件写入带编号的记录，结束后逐行检查：
+每一行都必须完整（没有被其他进程的内容截断或穿插），每条记录恰好出现一次。
+场景：
+- owner: 主进程是属主，写入进程通过本地连接发送批次
+- lockfile: 端口被占用但没有属主在监听，写入进程全部走锁文件协议
+- handover: 写入过程中属主退出，写入进程降级为锁文件并由其中一个接管属主
+
+运行方法（在项目根目录）：
+python -m benchmarks.stress_multiprocess_log
+"""
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter
+from utils.impl.LogIPC import SharedFileHandler
+
+WRITERS = 6
+RECORDS = 20000
+LINE_PATTERN = re.compile(r"^w(\d+) seq (\d+) len (\d+) ([a-z]*)$")
+
+
+def free_port():
+    """获取一个当前空闲的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_handler(path, port):
+    """创建共享文件处理器（不做会话轮转）"""
+    handler = SharedFileHandler(
+        path,
+        sink_config={"batch_size": 64 * 1024, "flush_interval": 0.2},
+        ipc_config={"port": port, "batch_size": 16 * 1024, "flush_interval": 0.05, "reconnect_interval": 0.2},
+        rotation_config={"when": ["size"]}
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def writer(index, path, port, records):
+    """写入进程：写入records条长度不一的记录"""
+    handler = make_handler(path, port)
+    logger = logging.getLogger(f"stress.{index}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    for seq in range(records):
+        # 偶尔写入超过一个批次大小的长行，检验整批写入不会被截断
+        size = 20000 if seq % 997 == 0 else seq % 300
+        level = logging.ERROR if seq % 1500 == 0 else logging.INFO
+        logger.log(level, "w%d seq %d len %d %s", index, seq, size, "x" * size)
+    stats = handler.get_stats()
+    handler.close()
+    print(f"  writer {index}: role={stats['role']} sent={stats['records_sent']} "
+          f"fallback={stats['fallback_records']} promotions={stats['promotions']}")
+
+
+def verify(path, writers, records):
+    """检查每一行都完整且每条记录恰好出现一次"""
+    seen = Counter()
+    torn = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = LINE_PATTERN.match(line.rstrip("\n"))
+            if not match or int(match.group(3)) != len(match.group(4)):
+                torn += 1
+                continue
+            seen[(int(match.group(1)), int(match.group(2)))] += 1
+    missing = sum(1 for w in range(writers) for s in range(records) if (w, s) not in seen)
+    duplicated = sum(1 for count in seen.values() if count > 1)
+    return torn, missing, duplicated
+
+
+def run(name, setup):
+    directory = tempfile.mkdtemp(prefix="cctb-stress-")
+    path = os.path.join(directory, "latest.log")
+    port = free_port()
+    owner, teardown = setup(path, port)
+
+    # 使用spawn（与Windows一致），fork会让子进程继承属主的监听套接字
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    processes = [context.Process(target=writer, args=(i, path, port, RECORDS)) for i in range(WRITERS)]
+    for process in processes:
+        process.start()
+    if owner is not None and name == "handover":
+        time.sleep(0.5)
+        owner.close()
+        owner = None
+    for process in processes:
+        process.join()
+    if owner is not None:
+        owner.close()
+    teardown()
+    elapsed = time.perf_counter() - start
+
+    torn, missing, duplicated = verify(path, WRITERS, RECORDS)
+    total = WRITERS * RECORDS
+    ok = torn == 0 and missing == 0
+    print(f"{name:<10} {total} records in {elapsed:.2f}s ({total / elapsed:,.0f} records/s) "
+          f"torn={torn} missing={missing} duplicated={duplicated} -> {'OK' if ok else 'FAILED'}")
+    shutil.rmtree(directory, ignore_errors=True)
+    return ok
+
+
+def with_owner(path, port):
+    return make_handler(path, port), lambda: None
+
+
+def without_owner(path, port):
+    # 只绑定不监听：连接被拒绝，端口也无法被写入进程占用
+    blocker = socket.socket()
+    blocker.bind(("127.0.0.1", port))
+    return None, blocker.close
+
+
+def main():
+    results = [
+        run("owner", with_owner),
+        run("lockfile", without_owner),
+        run("handover", with_owner)
+    ]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,23 @@
 import ctypes
 import sys
 import os
+import subprocess
+
+if __name__ == "__main__" and "--print-config" in sys.argv[1:]:
+    # 只打印生效的配置及其来源，在初始化日志系统（会做会话轮转）之前退出
+    from utils.impl.ConfigManager import config
+    config.load_layers()
+    print(config.format_config())
+    sys.exit(0)
+
 import psutil
 from utils import UtilsManager as utils
 from utils.impl.ErrorHandler import handle_exception, SystemError, PermissionError
 from utils.impl.ConfigManager import config
+from utils.impl.AdvancedLog import shutdown_logging
 from utils.impl.Performance import initialize_performance_manager, start_performance_monitoring, stop_performance_monitoring
+from utils.impl.Scheduler import scheduler
+from utils.impl.LogRotation import CONTINUE_SESSION_FLAG
 from packages.bypass.forceTop import set_console_topmost
 from packages.bypass import autoTop
 
@@ -35,7 +47,11 @@ def main():
         if utils.SysCheck()["name"] == "windows":
             # Windows系统下以管理员身份重新启动程序
             try:
-                ctypes.windll.shell32.ShellExecuteW(None, "runas", sys.executable, os.path.abspath(__file__), None, 1)
+                # 把命令行参数（如--set key=value）原样传给提权后的进程，
+                # 提权后的进程延续这次的日志会话，不再把这次启动写的几行日志单独归档
+                arguments = [arg for arg in sys.argv[1:] if arg != CONTINUE_SESSION_FLAG]
+                parameters = subprocess.list2cmdline([os.path.abspath(__file__)] + arguments + [CONTINUE_SESSION_FLAG])
+                ctypes.windll.shell32.ShellExecuteW(None, "runas", sys.executable, parameters, None, 1)
                 sys.exit(0)
             except Exception as e:
                 utils.error(f"Failed to restart with administrator privileges: {e}")
@@ -45,13 +61,7 @@ def main():
             utils.error("This program must be run in Windows.")
             raise SystemError("This program must be run in Windows.")
 
-    # 初始化日志文件
-    try:
-        from utils.impl import AdvancedLog
-        with open(AdvancedLog.log_file, "w", encoding="ANSI") as f:
-            f.truncate(0)
-    except Exception as e:
-        utils.error(f"Failed to initialize log file: {e}")
+    # 上一次运行的日志已在日志系统初始化时按会话轮转归档（见logging.json的rotation节）
 
     # 显示程序信息
     utils.info("Starting...")
@@ -64,11 +74,11 @@ def main():
         initialize_performance_manager()
         
         # 根据配置决定是否启用性能监控
-        enable_perf_monitor = config.get("performance_monitoring", True)
+        enable_perf_monitor = config.values.performance_monitoring
         if enable_perf_monitor:
-            monitor_interval = config.get("performance_monitor_interval", 5.0)
-            auto_optimize = config.get("performance_auto_optimize", True)
-            optimize_interval = config.get("performance_optimize_interval", 30.0)
+            monitor_interval = config.values.performance_monitor_interval
+            auto_optimize = config.values.performance_auto_optimize
+            optimize_interval = config.values.performance_optimize_interval
             
             start_performance_monitoring(
                 interval=monitor_interval,
@@ -78,6 +88,9 @@ def main():
             utils.info(f"Performance monitoring enabled (interval: {monitor_interval}s)")
     except Exception as e:
         utils.error(f"Failed to initialize performance monitoring: {e}")
+    
+    # 监视配置文件，修改config.json或logging.json后自动生效
+    config.start_watching()
 
     # 启动命令行界面
     try:
@@ -101,7 +114,12 @@ def main():
     except Exception as e:
         utils.error(f"Failed to stop performance monitoring: {e}")
         
+    config.stop_watching()
+    # 取消剩余的定时任务（如自动前置），等待正在运行的任务结束后调度线程退出
+    scheduler.shutdown()
     utils.info("bye!")
+    # 写出异步队列中剩余的日志
+    shutdown_logging()
     sys.exit(0)
 
 
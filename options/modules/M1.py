@@ -9,7 +9,9 @@ from utils.impl.ErrorHandler import handle_exception, NetworkError
 
 init(autoreset=True)
 
-TARGET_PORT = config.get("target_port", 4705)
+# 端口来自合并后的配置（config.json、环境变量或命令行）
+config.ensure_loaded()
+TARGET_PORT = config.values.target_port
 
 @handle_exception(SystemError, default_return=None, error_message="Failed to start anti full screen module")
 def _handle_anti_full_screen():
@@ -132,7 +134,7 @@ def anti_full_screen(target_ip, target_port=TARGET_PORT):
     """
     # 创建UDP套接字
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.settimeout(config.get("timeout", 5))  # 从配置管理器获取超时时间
+    sock.settimeout(config.values.timeout)  # 从配置管理器获取超时时间
 
     # 获取反全屏数据包
     payload = _get_anti_full_screen_payload()
@@ -5,7 +5,9 @@ from utils import UtilsManager as utils
 from utils.impl.ConfigManager import config
 from utils.impl.ErrorHandler import handle_exception, ValidationError, NetworkError
 
-TARGET_PORT = config.get("target_port", 4705)
+# 端口来自合并后的配置（config.json、环境变量或命令行）
+config.ensure_loaded()
+TARGET_PORT = config.values.target_port
 
 @handle_exception(SystemError, default_return=None, error_message="Failed to send teacher message")
 def _handle_send_teacher_message():
@@ -180,7 +182,7 @@ def send_teacher_message(text, target_ip, target_port=TARGET_PORT):
 
     # 创建UDP套接字
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.settimeout(config.get("timeout", 5))  # 从配置管理器获取超时时间
+    sock.settimeout(config.values.timeout)  # 从配置管理器获取超时时间
 
     # 获取教师消息数据包
     try:
@@ -251,7 +253,7 @@ def _get_teacher_message_payload(text):
     ])
 
     # 预计算长度，减少重复调用
-    max_message_length = config.get("max_message_length", 954)
+    max_message_length = config.values.max_message_length
     max_middle_length = max_message_length - len(header) - len(tail)
 
     # 优化文本转换，直接在目标字节数组中操作
@@ -8,7 +8,9 @@ from utils import UtilsManager as utils
 from utils.impl.ConfigManager import config
 from utils.impl.ErrorHandler import handle_exception, ValidationError
 
-TARGET_PORT = config.get("target_port", 4705)
+# 端口来自合并后的配置（config.json、环境变量或命令行）
+config.ensure_loaded()
+TARGET_PORT = config.values.target_port
 
 @handle_exception(SystemError, default_return=None, error_message="我去为什么不允许我当余志文")
 def _handle_start_application():
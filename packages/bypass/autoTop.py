@@ -3,11 +3,10 @@ import win32gui
 import win32con
 import win32process
 import ctypes
-import time
-import threading
 import sys
 import os
 from utils import UtilsManager as utils
+from utils.impl.Scheduler import scheduler
 
 # 全局配置
 TOPMOST_INTERVAL = 120  # 自动前置间隔（秒）= 2分钟
@@ -43,6 +42,28 @@ def get_console_handle():
     win32gui.EnumWindows(enum_window_callback, pid)
     return target_hwnd if target_hwnd and win32gui.IsWindowVisible(target_hwnd) else None
 
+def activate_window(hwnd):
+    """强制激活窗口（附加到目标窗口的输入线程后再激活，解决部分窗口激活失败问题）"""
+    ctypes.windll.user32.AttachThreadInput(
+        win32api.GetCurrentThreadId(),
+        win32gui.GetWindowThreadProcessId(hwnd)[0],
+        True
+    )
+    win32gui.SetForegroundWindow(hwnd)
+    ctypes.windll.user32.AttachThreadInput(
+        win32api.GetCurrentThreadId(),
+        win32gui.GetWindowThreadProcessId(hwnd)[0],
+        False
+    )
+
+def confirm_focus(hwnd):
+    """焦点锁定结束时检查窗口仍在前台，被其他窗口抢走焦点时重新激活"""
+    try:
+        if win32gui.GetForegroundWindow() != hwnd:
+            activate_window(hwnd)
+    except Exception as e:
+        utils.warn(f"autoTop focus check failed")
+
 def force_foreground_and_focus(hwnd):
     """强制将窗口置于前台并锁定焦点"""
     if not hwnd:
@@ -61,27 +82,17 @@ def force_foreground_and_focus(hwnd):
         )
 
         # 2. 强制激活窗口（解决部分窗口激活失败问题）
-        ctypes.windll.user32.AttachThreadInput(
-            win32api.GetCurrentThreadId(),
-            win32gui.GetWindowThreadProcessId(hwnd)[0],
-            True
-        )
-        win32gui.SetForegroundWindow(hwnd)
-        ctypes.windll.user32.AttachThreadInput(
-            win32api.GetCurrentThreadId(),
-            win32gui.GetWindowThreadProcessId(hwnd)[0],
-            False
-        )
+        activate_window(hwnd)
 
-        # 3. 锁定焦点（0.5秒内阻止焦点切换）
+        # 3. 锁定焦点：0.5秒后再确认一次焦点（一次性调度器任务，不在调度线程上睡眠）
         utils.info(f"autoTop successfully")
-        time.sleep(FOCUS_LOCK_DURATION)
+        scheduler.schedule_once("autoTop.focus", lambda: confirm_focus(hwnd), FOCUS_LOCK_DURATION)
 
     except Exception as e:
         utils.warn(f"autoTop failed")
 
 def auto_topmost_loop():
-    """定时前置窗口的循环线程"""
+    """初始置顶，并在全局调度器上登记定时前置窗口的任务"""
     hwnd = get_console_handle()
     if not hwnd:
         utils.warn("Could not find window!")
@@ -93,16 +104,13 @@ def auto_topmost_loop():
         win32con.SWP_NOMOVE | win32con.SWP_NOSIZE
     )
 
-    # 定时循环
-    while True:
-        time.sleep(TOPMOST_INTERVAL)
-        force_foreground_and_focus(hwnd)
+    # 定时前置（同名任务只保留一个）
+    scheduler.schedule_periodic("autoTop", lambda: force_foreground_and_focus(hwnd), TOPMOST_INTERVAL)
 
 def start():
     try:
-        # 启动定时前置线程（不阻塞主线程，可添加自己的业务逻辑）
-        topmost_thread = threading.Thread(target=auto_topmost_loop, daemon=True)
-        topmost_thread.start()
+        # 登记定时前置任务（不阻塞主线程，可添加自己的业务逻辑）
+        auto_topmost_loop()
 
 
     except KeyboardInterrupt:
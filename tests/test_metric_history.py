@@ -0,0 +1,179 @@
+"""
+指标时间序列测试
+随机时间戳（包括小于1毫秒和超过MAX_WEIGHT的间隔）下，把各滚动窗口的增量统计与直接由保留的采样
+重新计算的结果对比：按时间加权的均值、最值、last、分位数和窗口权重，中途调整容量后同样成立
+
+运行方法（在项目根目录）：
+python -m pytest tests
+"""
+import random
+import unittest
+from utils.impl.MetricHistory import (
+    MetricHistory, QuantileSketch, DEFAULT_WEIGHT, MAX_WEIGHT, SKETCH_GAMMA, SKETCH_MIN
+)
+
+METRICS = ("cpu", "memory")
+QUANTILES = (0.5, 0.95, 0.99)
+# 桶的代表值与桶内任意值的最大相对误差；小于SKETCH_MIN的值计入零桶，估计为0
+SKETCH_ERROR = (SKETCH_GAMMA - 1) / (SKETCH_GAMMA + 1) + 1e-9
+
+
+class _Model:
+    """直接保存保留的采样，按定义重新计算统计"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # (时间戳, 权重, 各指标的值)
+        self.kept = []
+
+    def append(self, timestamp, values):
+        if self.kept:
+            elapsed = timestamp - self.kept[-1][0]
+            weight = min(max(1, round(elapsed * 1000)), MAX_WEIGHT)
+        else:
+            weight = DEFAULT_WEIGHT
+        self.kept.append((timestamp, weight, tuple(values)))
+        del self.kept[:-self.capacity]
+
+    def resize(self, capacity):
+        self.capacity = capacity
+        del self.kept[:-capacity]
+
+    def window(self, duration):
+        if duration is None or not self.kept:
+            return list(self.kept)
+        cutoff = self.kept[-1][0] - duration
+        return [sample for sample in self.kept if not sample[0] < cutoff]
+
+    def stats(self, name, duration):
+        index = METRICS.index(name)
+        samples = self.window(duration)
+        values = [sample[2][index] for sample in samples]
+        weights = [sample[1] for sample in samples]
+        total = sum(weights)
+        result = {
+            "count": len(samples),
+            "weight": total,
+            "mean": sum(v * w for v, w in zip(values, weights)) / total,
+            "min": min(values),
+            "max": max(values),
+            "last": values[-1]
+        }
+        # 分位数：按值排序后累计权重，取累计区间包含q * (total - 1)的采样
+        ordered = sorted(zip(values, weights))
+        for q in QUANTILES:
+            position = q * (total - 1)
+            cumulative = 0
+            for value, weight in ordered:
+                cumulative += weight
+                if cumulative > position:
+                    break
+            result[f"p{q * 100:g}"] = value
+        return result, values, weights
+
+
+def _random_gap(rng):
+    """采样间隔：多数为正常间隔，偶尔是不到1毫秒或超过MAX_WEIGHT的间隔"""
+    roll = rng.random()
+    if roll < 0.1:
+        return rng.uniform(0.0, 0.0004)
+    if roll < 0.15:
+        return rng.uniform(61.0, 120.0)
+    return rng.uniform(0.05, 4.0)
+
+
+class MetricHistoryTest(unittest.TestCase):
+
+    def assert_matches(self, history, model, duration):
+        window = history.window(duration)
+        for name in METRICS:
+            stats = history.stats(name, duration, QUANTILES)
+            expected, values, weights = model.stats(name, duration)
+            where = f"{name} window={duration}"
+            self.assertEqual(stats["count"], expected["count"], where)
+            self.assertEqual(window.weight, expected["weight"], where)
+            self.assertAlmostEqual(stats["mean"], expected["mean"], delta=1e-9 * max(1.0, expected["max"]), msg=where)
+            for key in ("min", "max", "last"):
+                self.assertEqual(stats[key], expected[key], f"{where} {key}")
+            for q in QUANTILES:
+                key = f"p{q * 100:g}"
+                tolerance = max(expected[key] * SKETCH_ERROR, SKETCH_MIN)
+                self.assertLessEqual(abs(stats[key] - expected[key]), tolerance, f"{where} {key}")
+
+            # 移出窗口的采样从草图中减去后，草图与由窗口内采样重新构建的草图完全一致
+            sketch = window.aggregates[name].sketch
+            rebuilt = QuantileSketch()
+            for value, weight in zip(values, weights):
+                rebuilt.add(value, weight)
+            self.assertEqual(sketch.total, rebuilt.total, where)
+            self.assertEqual(sketch.zeros, rebuilt.zeros, where)
+            self.assertEqual(sketch.counts, rebuilt.counts, where)
+
+    def run_stream(self, seed, capacity, durations, steps, resize_at=None, late_window=None):
+        rng = random.Random(seed)
+        history = MetricHistory(METRICS, capacity)
+        model = _Model(capacity)
+        for duration in durations:
+            history.window(duration)
+        durations = list(durations)
+        timestamp = 1000.0
+        for step in range(steps):
+            if resize_at is not None and step in resize_at:
+                history.resize(resize_at[step])
+                model.resize(resize_at[step])
+                for duration in durations:
+                    self.assert_matches(history, model, duration)
+            if late_window is not None and step == late_window[0]:
+                # 中途创建的窗口回放缓冲中的采样
+                durations.append(late_window[1])
+            timestamp += _random_gap(rng)
+            # 取值包括零附近的小值（进入草图的零桶）和大范围的值
+            values = (rng.choice((0.0, rng.uniform(0.0, 0.02), rng.uniform(0.1, 100.0))), rng.uniform(10.0, 5000.0))
+            history.append(timestamp, values)
+            model.append(timestamp, values)
+            for duration in durations:
+                self.assert_matches(history, model, duration)
+        return history
+
+    def test_windows_match_brute_force(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                self.run_stream(seed, capacity=64, durations=(None, 5.0, 30.0, 120.0), steps=400)
+
+    def test_monotonic_queues_with_runs(self):
+        # 单调递增和递减的长序列让最值队列反复整体弹出
+        history = MetricHistory(METRICS, 32)
+        model = _Model(32)
+        history.window(10.0)
+        timestamp = 0.0
+        for step in range(300):
+            timestamp += 0.5
+            phase = (step // 25) % 2
+            value = float(step % 25) if phase else float(25 - step % 25)
+            history.append(timestamp, (value, 100.0 - value))
+            model.append(timestamp, (value, 100.0 - value))
+            for duration in (None, 10.0):
+                self.assert_matches(history, model, duration)
+
+    def test_resize_mid_stream(self):
+        history = self.run_stream(7, capacity=50, durations=(None, 20.0), steps=300,
+                                  resize_at={100: 20, 180: 90, 250: 1})
+        self.assertEqual(history.capacity, 1)
+        self.assertEqual(len(history), 1)
+
+    def test_window_created_mid_stream(self):
+        self.run_stream(11, capacity=40, durations=(None,), steps=200, late_window=(120, 15.0))
+
+    def test_first_sample_and_clamped_weights(self):
+        history = MetricHistory(METRICS, 8)
+        history.append(10.0, (1.0, 1.0))
+        history.append(10.0001, (3.0, 3.0))
+        history.append(500.0, (5.0, 5.0))
+        self.assertEqual(list(history.weights[:3]), [DEFAULT_WEIGHT, 1, MAX_WEIGHT])
+        stats = history.stats("cpu")
+        self.assertEqual(stats["count"], 3)
+        self.assertAlmostEqual(stats["mean"], (1.0 * DEFAULT_WEIGHT + 3.0 + 5.0 * MAX_WEIGHT) / (DEFAULT_WEIGHT + 1 + MAX_WEIGHT))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+环形缓冲导出的脱敏测试
+被级别闸门挡在控制台和文件之外的DEBUG记录只进入环形缓冲，导出到崩溃日志时也必须脱敏
+
+运行方法（在项目根目录）：
+python -m pytest tests
+"""
+import os
+import sys
+import logging
+import tempfile
+import unittest
+from utils.impl.LogFilters import create_redaction_filter, install_filters
+from utils.impl.LogPipeline import FanoutHandler
+from utils.impl.LogRingBuffer import RingBufferHandler, LevelGateFilter
+
+FILTERS = {
+    "sensitive_data": {
+        "pattern": "password|token|secret|key",
+        "replacement": "***REDACTED***",
+        "mode": "value"
+    }
+}
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+class RingBufferRedactionTest(unittest.TestCase):
+
+    def test_dump_redacts_records_that_skipped_the_pipeline(self):
+        ring = RingBufferHandler(16, logging.DEBUG)
+        ring.set_redaction(create_redaction_filter(FILTERS))
+        test_logger = logging.getLogger("CCTBTest.ring")
+        test_logger.propagate = False
+        test_logger.setLevel(logging.DEBUG)
+        test_logger.addHandler(ring)
+        try:
+            test_logger.debug("debug password=hunter2")
+            try:
+                raise ValueError("token=abc123")
+            except ValueError as e:
+                exc_info = (type(e), e, e.__traceback__)
+            with tempfile.TemporaryDirectory() as directory:
+                content = _read(ring.dump(os.path.join(directory, "crash.log"), "test", exc_info))
+        finally:
+            test_logger.removeHandler(ring)
+
+        self.assertIn("debug password=***REDACTED***", content)
+        self.assertNotIn("hunter2", content)
+        self.assertNotIn("abc123", content)
+
+    def test_gated_debug_record_is_redacted_in_dump(self):
+        # 按根记录器的组装方式搭建：管线带级别闸门和脱敏，环形缓冲直接挂在记录器上，文件都在临时目录中
+        test_logger = logging.getLogger("CCTBTest.gate")
+        test_logger.propagate = False
+        test_logger.setLevel(logging.DEBUG)
+        with tempfile.TemporaryDirectory() as directory:
+            file_handler = logging.FileHandler(os.path.join(directory, "test.log"), encoding="utf-8")
+            pipeline = FanoutHandler([file_handler])
+            pipeline.addFilter(LevelGateFilter(test_logger, logging.INFO))
+            filters = install_filters(pipeline, redaction_config=FILTERS)
+            ring = RingBufferHandler(16, logging.DEBUG)
+            ring.set_redaction(filters["redaction"])
+            test_logger.addHandler(pipeline)
+            test_logger.addHandler(ring)
+            try:
+                # 经过处理器链的DEBUG记录和utils.debug()直接写入缓冲的记录
+                test_logger.debug("chain password=hunter2")
+                ring.capture(test_logger.name, logging.DEBUG, "direct token=%s", ("abc123",), sys._getframe())
+                test_logger.info("info secret=s3cr3t")
+                file_handler.flush()
+                log_content = _read(file_handler.baseFilename)
+                dump_content = _read(ring.dump(os.path.join(directory, "crash.log"), "test"))
+            finally:
+                test_logger.removeHandler(pipeline)
+                test_logger.removeHandler(ring)
+                file_handler.close()
+
+        self.assertNotIn("chain", log_content)
+        self.assertIn("info secret=***REDACTED***", log_content)
+        self.assertIn("chain password=***REDACTED***", dump_content)
+        self.assertIn("direct token=***REDACTED***", dump_content)
+        self.assertIn("test_ring_buffer_redaction", dump_content)
+        for secret in ("hunter2", "abc123", "s3cr3t"):
+            self.assertNotIn(secret, dump_content)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+声明式优化规则测试
+用MetricHistory驱动编译后的规则：进入/退出阈值的滞回、冷却、repeat、max_per_hour抑制、
+all/any嵌套条件，以及重新加载时沿用旧规则的触发状态
+
+运行方法（在项目根目录）：
+python -m pytest tests
+"""
+import unittest
+from utils.impl.ConfigManager import ConfigError
+from utils.impl.MetricHistory import MetricHistory
+from utils.impl.RuleEngine import compile_condition, compile_rule, compile_rules
+
+METRICS = ("cpu", "memory", "threads")
+
+
+class RuleEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.history = MetricHistory(METRICS, 600)
+        self.fired = []
+        self.actions = {"record": lambda sample, rule, values: self.fired.append((sample["time"], dict(values)))}
+
+    def rule(self, when, **options):
+        spec = {"name": "test", "when": when, "action": "record"}
+        spec.update(options)
+        return compile_rule(spec, self.history, self.actions)
+
+    def step(self, rule, now, cpu, memory=0.0, threads=0.0):
+        """追加一个采样并检查规则，返回是否执行了动作"""
+        self.history.append(now, (cpu, memory, threads))
+        return rule.check(now, self.history, {"time": now, "cpu": cpu, "memory": memory, "threads": threads})
+
+    def test_default_exit_threshold_above(self):
+        # 进入阈值80，默认退出阈值80 * (1 - 0.1) = 72
+        rule = self.rule({"metric": "cpu", "above": 80})
+        self.assertFalse(self.step(rule, 0, 79))
+        self.assertTrue(self.step(rule, 1, 85))
+        self.assertFalse(self.step(rule, 2, 75))
+        self.assertTrue(rule.active)
+        self.assertFalse(self.step(rule, 3, 71))
+        self.assertFalse(rule.active)
+        self.assertTrue(self.step(rule, 4, 81))
+        self.assertEqual(rule.trigger_count, 2)
+        self.assertEqual([entry["event"] for entry in rule.history], ["enter", "fire", "exit", "enter", "fire"])
+
+    def test_default_exit_threshold_below(self):
+        # 进入阈值10，默认退出阈值10 * (1 + 0.1) = 11
+        rule = self.rule({"metric": "cpu", "below": 10})
+        self.assertTrue(self.step(rule, 0, 9))
+        self.assertFalse(self.step(rule, 1, 10.5))
+        self.assertTrue(rule.active)
+        self.assertFalse(self.step(rule, 2, 11.5))
+        self.assertFalse(rule.active)
+
+    def test_explicit_exit_threshold(self):
+        rule = self.rule({"metric": "cpu", "above": 80, "exit": 50})
+        self.assertTrue(self.step(rule, 0, 90))
+        self.assertFalse(self.step(rule, 1, 60))
+        self.assertTrue(rule.active)
+        self.assertFalse(self.step(rule, 2, 49))
+        self.assertFalse(rule.active)
+
+    def test_windowed_stat(self):
+        # 10秒窗口的均值：单个尖峰不足以越过阈值，持续偏高才触发
+        rule = self.rule({"metric": "cpu", "stat": "mean", "window": 10, "above": 50})
+        for now in range(10):
+            self.assertFalse(self.step(rule, now, 20))
+        self.assertFalse(self.step(rule, 10, 100))
+        fired = [self.step(rule, now, 100) for now in range(11, 20)]
+        self.assertEqual(fired.count(True), 1)
+        _, values = self.fired[0]
+        self.assertGreater(values["mean(cpu,10s)"], 50)
+
+    def test_cooldown(self):
+        rule = self.rule({"metric": "cpu", "above": 80, "exit": 80}, cooldown=100)
+        self.assertTrue(self.step(rule, 0, 90))
+        self.assertFalse(self.step(rule, 10, 70))
+        # 重新进入但仍在冷却中，保持触发状态，冷却结束后执行
+        self.assertFalse(self.step(rule, 20, 90))
+        self.assertTrue(rule.active)
+        self.assertFalse(self.step(rule, 99, 90))
+        self.assertTrue(self.step(rule, 100, 90))
+        self.assertEqual(rule.trigger_count, 2)
+
+    def test_repeat(self):
+        rule = self.rule({"metric": "cpu", "above": 80}, repeat=30)
+        fired = [now for now in range(0, 100, 5) if self.step(rule, now, 90)]
+        self.assertEqual(fired, [0, 30, 60, 90])
+
+    def test_without_repeat_fires_once_per_entry(self):
+        rule = self.rule({"metric": "cpu", "above": 80})
+        fired = [now for now in range(0, 100, 5) if self.step(rule, now, 90)]
+        self.assertEqual(fired, [0])
+
+    def test_max_per_hour_suppression(self):
+        rule = self.rule({"metric": "cpu", "above": 80}, repeat=1, max_per_hour=2)
+        self.assertTrue(self.step(rule, 0, 90))
+        self.assertTrue(self.step(rule, 1, 90))
+        for now in range(2, 6):
+            self.assertFalse(self.step(rule, now, 90))
+        self.assertEqual(rule.suppressed, 4)
+        # 同一次进入只记录一次抑制
+        self.assertEqual([entry["event"] for entry in rule.history].count("suppressed"), 1)
+        # 第一次执行满一小时后移出计数
+        self.assertFalse(self.step(rule, 3599, 90))
+        self.assertTrue(self.step(rule, 3600, 90))
+        self.assertFalse(self.step(rule, 3600.5, 90))
+        self.assertTrue(self.step(rule, 3601, 90))
+        self.assertEqual(rule.trigger_count, 4)
+
+    def test_nested_all_any(self):
+        evaluate = compile_condition({"all": [
+            {"metric": "cpu", "above": 80},
+            {"any": [
+                {"metric": "memory", "above": 70},
+                {"metric": "threads", "stat": "max", "window": 30, "above": 50}
+            ]}
+        ]}, METRICS, self.history)
+        cases = [
+            ((85, 10, 10), False),
+            ((85, 75, 10), True),
+            ((85, 10, 60), True),
+            # threads的窗口最大值仍为60
+            ((85, 10, 10), True),
+            ((70, 90, 90), False)
+        ]
+        for now, (sample, expected) in enumerate(cases):
+            self.history.append(now, sample)
+            values = {}
+            matched = evaluate(False, self.history, dict(zip(METRICS, sample)), values)
+            self.assertEqual(matched, expected, sample)
+            # 不短路：每个条件读取到的值都被记录
+            self.assertEqual(set(values), {"last(cpu)", "last(memory)", "max(threads,30s)"})
+
+    def test_inherit_on_reload(self):
+        spec = {"name": "high_cpu", "when": {"metric": "cpu", "above": 80}, "action": "record",
+                "repeat": 60, "max_per_hour": 5}
+        old = compile_rule(spec, self.history, self.actions)
+        self.assertTrue(self.step(old, 0, 90))
+
+        # 重新加载：新规则沿用触发状态，不会因为“重新进入”立即再次执行
+        new = compile_rules([dict(spec, repeat=30)], self.history, self.actions)[0]
+        new.inherit(old)
+        self.assertTrue(new.active)
+        self.assertEqual(new.trigger_count, 1)
+        self.assertFalse(self.step(new, 10, 90))
+        # 新的repeat立即生效
+        self.assertTrue(self.step(new, 30, 90))
+        self.assertEqual(new.trigger_count, 2)
+        self.assertEqual([entry["event"] for entry in new.history], ["enter", "fire", "fire"])
+        self.assertEqual(len(self.fired), 2)
+
+    def test_invalid_specs(self):
+        invalid = [
+            {"metric": "cpu"},
+            {"metric": "cpu", "above": 80, "below": 10},
+            {"metric": "cpu", "stat": "mean", "above": 80},
+            {"metric": "cpu", "stat": "p100", "window": 10, "above": 80},
+            {"metric": "io_write_rate", "stat": "mean", "window": 10, "above": 80},
+            {"metric": "cpu", "above": "no_such_config_key"},
+            {"metric": "cpu", "above": True},
+            {"all": []}
+        ]
+        for when in invalid:
+            with self.subTest(when=when), self.assertRaises(ConfigError):
+                self.rule(when)
+        with self.assertRaises(ConfigError):
+            compile_rule({"name": "x", "when": {"metric": "cpu", "above": 80}, "action": "missing"},
+                         self.history, self.actions)
+
+    def test_compile_rules_reports_and_skips(self):
+        reports = []
+        rules = compile_rules([
+            {"name": "a", "when": {"metric": "cpu", "above": 80}, "action": "record"},
+            {"name": "a", "when": {"metric": "cpu", "above": 90}, "action": "record"},
+            {"name": "b", "when": {"metric": "cpu", "above": 80}, "action": "record", "cooldown": -1},
+            {"when": {"metric": "cpu", "above": 80}, "action": "record"}
+        ], self.history, self.actions, reports.append)
+        self.assertEqual([rule.name for rule in rules], ["a"])
+        self.assertEqual(len(reports), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,9 @@ UtilsManager
 格式可以参考下面添加
 """
 
+from sys import _getframe
+from logging import DEBUG as _DEBUG, INFO as _INFO, WARNING as _WARNING, ERROR as _ERROR
+
 # 导入错误处理模块
 from utils.impl.ErrorHandler import (
     handle_exception, PermissionError, NetworkError, SystemError, setup_global_exception_handler
@@ -50,35 +53,63 @@ def SysCheck():
     
     return _check()
 
-def info(message):
-    """记录信息日志，带有错误处理"""
-    from utils.impl.Log import info as _info
-    
-    @handle_exception(default_return=None, error_message="Failed to log info message")
-    def _log():
-        return _info(message)
-    
-    return _log()
-
-def warn(message):
-    """记录警告日志，带有错误处理"""
-    from utils.impl.Log import warn as _warn
-    
-    @handle_exception(default_return=None, error_message="Failed to log warning message")
-    def _log():
-        return _warn(message)
-    
-    return _log()
-
-def error(message):
-    """记录错误日志，带有错误处理"""
-    from utils.impl.Log import error as _error
-    
-    @handle_exception(default_return=None, error_message="Failed to log error message")
-    def _log():
-        return _error(message)
-    
-    return _log()
+# 日志入口：底层logging.Logger只在第一次记录日志时解析一次，之后直接复用
+_logger = None
+# 启用环形缓冲时的缓冲和管线级别闸门，闸门以下的记录只会进入缓冲
+_ring_buffer = None
+_level_gate = None
+
+
+def _resolve_logger():
+    """解析并缓存CCTB日志记录器（延迟导入，避免循环依赖）"""
+    global _logger, _ring_buffer, _level_gate
+    if _logger is None:
+        import logging
+        from utils.impl.AdvancedLog import logger as _cctb_logger
+        cctb_logger = getattr(_cctb_logger, "_logger", None)
+        if cctb_logger is not None and _cctb_logger._ring_buffer is not None:
+            _ring_buffer = _cctb_logger._ring_buffer
+            _level_gate = _cctb_logger._level_gate
+        _logger = cctb_logger or logging.getLogger("CCTB")
+    return _logger
+
+
+def _emit(logger, level, message, args):
+    """写出一条已通过级别检查的日志，stacklevel指向utils.xxx的调用方"""
+    try:
+        gate = _level_gate
+        if gate is not None and level < gate.level:
+            # 管线闸门会挡住这条记录，直接写入环形缓冲，不创建LogRecord、不经过处理器链
+            _ring_buffer.capture(logger.name, level, message, args, _getframe(2))
+            return
+        logger._log(level, message, args, stacklevel=3)
+    except Exception as e:
+        print(f"ERROR: Failed to log message: {e}")
+
+
+def debug(message, *args):
+    """记录调试日志，支持%风格的延迟参数，如 utils.debug("value: %s", value)"""
+    logger = _logger or _resolve_logger()
+    if logger.isEnabledFor(_DEBUG):
+        _emit(logger, _DEBUG, message, args)
+
+def info(message, *args):
+    """记录信息日志，支持%风格的延迟参数"""
+    logger = _logger or _resolve_logger()
+    if logger.isEnabledFor(_INFO):
+        _emit(logger, _INFO, message, args)
+
+def warn(message, *args):
+    """记录警告日志，支持%风格的延迟参数"""
+    logger = _logger or _resolve_logger()
+    if logger.isEnabledFor(_WARNING):
+        _emit(logger, _WARNING, message, args)
+
+def error(message, *args):
+    """记录错误日志，支持%风格的延迟参数"""
+    logger = _logger or _resolve_logger()
+    if logger.isEnabledFor(_ERROR):
+        _emit(logger, _ERROR, message, args)
 
 def Clear():
     """清屏，带有错误处理"""
@@ -120,6 +151,26 @@ def optimize_performance():
     
     return _opt()
 
+def dumpDebugLog():
+    """把环形缓冲中最近的日志和性能统计导出到文件，返回文件路径，带有错误处理"""
+    from utils.impl.AdvancedLog import logger as _logger_instance
+    
+    @handle_exception(default_return=None, error_message="Failed to dump debug log")
+    def _dump():
+        return _logger_instance.dump_ring_buffer(reason="manual")
+    
+    return _dump()
+
+def invalidate_cache(name=None):
+    """失效记忆化缓存（如重新检查权限或系统信息），name为None时失效全部，返回失效的条目数"""
+    from utils.impl.Memoize import invalidate as _invalidate
+    return _invalidate(name)
+
+def get_cache_stats():
+    """获取各记忆化缓存的命中统计"""
+    from utils.impl.Memoize import get_memo_stats as _get_memo_stats
+    return _get_memo_stats()
+
 def getdate():
     """获取当前日期，带有错误处理"""
     from utils.impl.GetTime import getdate as _getdate
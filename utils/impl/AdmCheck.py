@@ -7,6 +7,7 @@ import ctypes
 import os
 from utils.impl import SysCheck
 from utils.impl.ErrorHandler import handle_exception, PermissionError
+from utils.impl.Memoize import memoize
 
 """
 使用方法：
@@ -14,9 +15,11 @@ import utils.UtilsManager as utils
 utils.AdmCheck
 
 返回值：True/False
+进程的权限在运行期间不会改变，结果在进程内只计算一次
 """
 
 @handle_exception(PermissionError, default_return=False, error_message="Failed to check administrator privileges")
+@memoize(maxsize=1)
 def checkAdm():
     """
     检查当前程序是否以管理员权限运行
@@ -40,7 +43,7 @@ def checkAdm():
                 return True
             else:
                 return False
-        elif system["name"] == "linux" or SysCheck.sysCheck()["name"] == "darwin":
+        elif system["name"] in ("linux", "darwin"):
             # Linux和macOS系统检查root权限
             return os.getuid() == 0
         else:
@@ -5,13 +5,23 @@
 import os
 import sys
 import logging
-import logging.handlers
 from enum import Enum
 from typing import Union
-from datetime import datetime
-from colorama import Fore, Style, Back, init
-from utils.impl.ErrorHandler import handle_exception, CCTBException
+from colorama import init
+from utils.impl.ErrorHandler import handle_exception, CCTBException, register_crash_hook, set_error_recorder
 from utils.impl.ConfigManager import config
+from utils.impl.LogPipeline import create_pipeline
+from utils.impl.LogFormatter import LevelTemplates, ColoredFormatter, FileFormatter
+from utils.impl.LogJson import create_json_formatter
+from utils.impl.LogStore import create_store_sink
+from utils.impl.ErrorStore import create_error_recorder
+from utils.impl.CacheRegistry import cache_registry, PRIORITY_DIAGNOSTIC
+from utils.impl.LogSink import BatchingFileHandler, create_file_sink
+from utils.impl.LogRotation import create_rotator
+from utils.impl.LogIPC import create_shared_file_sink
+from utils.impl.LogFilters import install_filters
+from utils.impl.LogRingBuffer import LevelGateFilter, create_ring_buffer, crash_file_path
+from utils.impl.Scheduler import scheduler
 
 # 初始化colorama
 init(autoreset=True)
@@ -19,6 +29,9 @@ init(autoreset=True)
 # 全局log_file位置
 log_file = ""
 
+# 根日志记录器名称，其他日志记录器都是它的子记录器（或共享它的处理器）
+ROOT_LOGGER_NAME = "CCTB"
+
 class LogLevel(Enum):
     """日志级别枚举"""
     DEBUG = logging.DEBUG
@@ -42,21 +55,64 @@ class LoggerError(CCTBException):
 
 
 class CCTBLogger:
-    """CCTB应用程序日志记录器"""
+    """
+    CCTB应用程序日志记录器
+    每个名称对应一个实例；根记录器（CCTB）持有唯一的处理器树，
+    其他记录器只是logging层级中的子记录器，记录通过propagate交给根记录器的处理器
+    """
     
-    _instance = None
+    _instances = {}
     _initialized = False
     
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(CCTBLogger, cls).__new__(cls)
-        return cls._instance
+    def __new__(cls, name: str = ROOT_LOGGER_NAME):
+        instance = cls._instances.get(name)
+        if instance is None:
+            instance = super(CCTBLogger, cls).__new__(cls)
+            cls._instances[name] = instance
+        return instance
     
-    def __init__(self):
+    def __init__(self, name: str = ROOT_LOGGER_NAME):
         if not self._initialized:
-            self._setup_logger()
+            if name == ROOT_LOGGER_NAME:
+                self._root = self
+                self._setup_logger()
+            else:
+                self._setup_child(name)
             self._initialized = True
     
+    @property
+    def name(self) -> str:
+        """日志记录器名称"""
+        return self._logger.name
+    
+    @property
+    def is_root(self) -> bool:
+        """是否为持有处理器树的根记录器"""
+        return self._root is self
+    
+    def _setup_child(self, name: str):
+        """设置子日志记录器，子记录器不创建任何处理器"""
+        self._root = CCTBLogger(ROOT_LOGGER_NAME)
+        self._logger = logging.getLogger(name)
+        if not name.startswith(ROOT_LOGGER_NAME + "."):
+            # 不在CCTB层级下的记录器（如第三方库）直接挂上共享的分发管线
+            self.attach_pipeline()
+    
+    @handle_exception(LoggerError, default_return=False)
+    def attach_pipeline(self) -> bool:
+        """
+        把根记录器的分发管线挂到当前记录器上（重复调用不会重复添加）
+        
+        Returns:
+            新挂上返回True，已存在返回False
+        """
+        pipeline = self._root._pipeline
+        if pipeline in self._logger.handlers:
+            return False
+        self._logger.addHandler(pipeline)
+        self._logger.propagate = False
+        return True
+    
     @handle_exception(LoggerError, default_return=None)
     def _setup_logger(self):
         """设置日志记录器"""
@@ -65,6 +121,14 @@ class CCTBLogger:
 
         # 设置全局变量log_file
         global log_file
+        
+        # 预编译各级别的前缀模板，控制台和文件格式化器共用
+        self._templates = LevelTemplates()
+        self._ring_buffer = None
+        self._level_gate = None
+        self._console_handler = None
+        self._file_handler = None
+        self._error_recorder = None
 
         # 创建日志记录器
         self._logger = logging.getLogger("CCTB")
@@ -73,23 +137,34 @@ class CCTBLogger:
         # 清除现有处理器
         self._logger.handlers.clear()
         
-        # 获取配置
-        log_level = config.get("log_level", "INFO").upper()
-        log_file = config.get("log_file", None)
-        log_format = config.get("log_format", "colored")
-        enable_console = config.get("enable_console", True)
-        enable_file = config.get("enable_file", True)
-        console_level = config.get("console_level", "INFO").upper()
-        file_level = config.get("file_level", "DEBUG").upper()
-        max_file_size = config.get("max_file_size", 10*1024*1024)
-        backup_count = config.get("backup_count", 5)
-        debug = config.get("debug", False)
+        # 获取配置（类型和默认值由ConfigValues声明并在加载时校验）
+        values = config.values
+        log_level = values.log_level.upper()
+        log_file = values.log_file
+        log_format = values.log_format
+        enable_console = values.enable_console
+        enable_file = values.enable_file
+        console_level = values.console_level.upper()
+        file_level = values.file_level.upper()
+        max_file_size = values.max_file_size
+        backup_count = values.backup_count
+        debug = values.debug
+        async_config = values.async_logging
+        ring_config = values.ring_buffer
+        json_sink_config = values.json_sink
+        store_config = values.store
+        multiprocess_config = values.multiprocess
+        error_db_config = values.error_db
         
         # 设置日志级别
         if debug:
-            self._logger.setLevel(logging.DEBUG)
+            level = logging.DEBUG
         else:
-            self._logger.setLevel(getattr(logging, log_level, logging.INFO))
+            level = getattr(logging, log_level, logging.INFO)
+        self._logger.setLevel(level)
+        
+        # 所有输出处理器都挂在同一个分发管线之后
+        targets = []
         
         # 创建控制台处理器
         if enable_console:
@@ -97,7 +172,8 @@ class CCTBLogger:
             console_handler.setLevel(getattr(logging, console_level, logging.INFO))
             console_formatter = self._get_formatter(LogFormat.COLORED if log_format == "colored" else LogFormat.SIMPLE)
             console_handler.setFormatter(console_formatter)
-            self._logger.addHandler(console_handler)
+            targets.append(console_handler)
+            self._console_handler = console_handler
         
         # 如果指定了日志文件，创建文件处理器
         if log_file and enable_file:
@@ -107,26 +183,126 @@ class CCTBLogger:
                 if log_dir and not os.path.exists(log_dir):
                     os.makedirs(log_dir)
                 
-                # 创建文件处理器，支持日志轮转
-                file_handler = logging.handlers.RotatingFileHandler(
-                    log_file, 
-                    maxBytes=max_file_size,
-                    backupCount=backup_count,
-                    encoding='utf-8'
-                )
+                if multiprocess_config.get("enabled", False):
+                    # 多个进程共享同一个日志文件：属主进程负责写入和轮转，其他进程把记录发给属主
+                    file_handler = create_shared_file_sink(
+                        log_file,
+                        multiprocess_config,
+                        values.file_sink,
+                        values.rotation,
+                        max_file_size,
+                        backup_count
+                    )
+                else:
+                    # 创建日志轮转器，启用会话轮转时先把上一次运行的日志归档
+                    rotator = create_rotator(values.rotation, max_file_size, backup_count)
+                    rotator.start_session(log_file)
+                    
+                    # 创建批量写入的文件处理器，由轮转器负责轮转和归档
+                    file_handler = create_file_sink(
+                        log_file,
+                        values.file_sink,
+                        rotator=rotator
+                    )
                 file_handler.setLevel(getattr(logging, file_level, logging.DEBUG))
                 
                 # 使用自定义文件格式化器
                 if log_format == "colored":
                     file_formatter = self._get_file_formatter()
+                elif log_format == "json":
+                    file_formatter = self._get_formatter(LogFormat.JSON)
                 else:
                     file_formatter = self._get_formatter(LogFormat.DETAILED)
                 
                 file_handler.setFormatter(file_formatter)
-                self._logger.addHandler(file_handler)
+                targets.append(file_handler)
+                self._file_handler = file_handler
             except Exception as e:
                 # 如果无法创建文件处理器，记录错误但不中断程序
                 self._logger.error(f"Failed to create file handler: {str(e)}")
+        
+        # JSON输出与控制台、文本日志并存，每行一条JSON记录，便于程序解析
+        if json_sink_config.get("enabled", False) and json_sink_config.get("file"):
+            try:
+                json_file = json_sink_config["file"]
+                json_rotator = create_rotator(values.rotation, max_file_size, backup_count)
+                json_rotator.start_session(json_file)
+                json_handler = create_file_sink(json_file, values.file_sink, rotator=json_rotator)
+                json_handler.setLevel(getattr(logging, str(json_sink_config.get("level", file_level)).upper(), logging.DEBUG))
+                json_handler.setFormatter(self._get_formatter(LogFormat.JSON))
+                targets.append(json_handler)
+            except Exception as e:
+                self._logger.error(f"Failed to create JSON log handler: {str(e)}")
+        
+        # 带索引的分段存储，支持按时间和级别范围查询（python -m utils.impl.LogStore）
+        if store_config.get("enabled", False):
+            try:
+                store_handler = create_store_sink(store_config)
+                store_handler.setLevel(getattr(logging, str(store_config.get("level", file_level)).upper(), logging.DEBUG))
+                store_handler.setFormatter(self._get_formatter(LogFormat.JSON))
+                targets.append(store_handler)
+            except Exception as e:
+                self._logger.error(f"Failed to create log store handler: {str(e)}")
+        
+        # 创建分发管线（同步或异步），调用线程只与管线交互
+        self._pipeline = create_pipeline(targets, async_config)
+        self._logger.addHandler(self._pipeline)
+        
+        # 环形缓冲在内存中保留最近的记录（默认DEBUG），缓冲级别更低时根记录器降到缓冲级别，
+        # 原本的级别改由管线上的闸门执行，控制台和文件的输出保持不变
+        self._ring_buffer = create_ring_buffer(ring_config)
+        self._crash_dir = ring_config.get("crash_dir", "logs")
+        if self._ring_buffer is not None:
+            self._level_gate = LevelGateFilter(self._logger, level)
+            self._pipeline.addFilter(self._level_gate)
+            self._logger.addHandler(self._ring_buffer)
+            self._logger.setLevel(min(level, self._ring_buffer.level))
+            register_crash_hook(self._dump_on_crash)
+            # 内存紧张时最后才丢弃最旧的缓冲记录
+            cache_registry.register("log.ring_buffer", self._ring_buffer.estimate_size, self._ring_buffer.shrink,
+                                    PRIORITY_DIAGNOSTIC)
+        
+        # 在管线上安装重复消息合并、限流和脱敏过滤器，每条记录在分发前只过滤一次
+        self._filters = install_filters(
+            self._pipeline,
+            values.dedup,
+            values.rate_limits,
+            values.filters
+        )
+        # 环形缓冲不经过管线上的过滤器，导出时用同一套规则脱敏
+        if self._ring_buffer is not None:
+            self._ring_buffer.set_redaction(self._filters.get("redaction"))
+        
+        # 合并摘要定时输出，不必等下一条记录触发清理
+        dedup = self._filters.get("dedup")
+        self._dedup_task = scheduler.schedule_periodic("log.dedup", dedup.sweep, dedup.window) if dedup else None
+        
+        # 捕获到的异常按指纹累计到错误数据库（python -m utils.impl.ErrorStore top）
+        try:
+            self._error_recorder = create_error_recorder(error_db_config, self._filters.get("redaction"))
+            set_error_recorder(self._error_recorder)
+        except Exception as e:
+            self._logger.error(f"Failed to open error database: {str(e)}")
+        
+        # 配置热加载后调整级别，不需要重启
+        config.subscribe(self._on_config_change, ("debug", "log_level", "console_level", "file_level"))
+    
+    def _on_config_change(self, changed: frozenset, snapshot):
+        """配置变化回调：调整根记录器、控制台和文件输出的级别"""
+        if "debug" in changed or "log_level" in changed:
+            if snapshot.get("debug", False):
+                level = logging.DEBUG
+            else:
+                level = getattr(logging, str(snapshot.get("log_level", "INFO")).upper(), logging.INFO)
+            self._set_logger_level(level)
+        if "console_level" in changed and self._console_handler is not None:
+            self._console_handler.setLevel(getattr(logging, str(snapshot.get("console_level", "INFO")).upper(), logging.INFO))
+        if "file_level" in changed and self._file_handler is not None:
+            self._file_handler.setLevel(getattr(logging, str(snapshot.get("file_level", "DEBUG")).upper(), logging.DEBUG))
+    
+    def _iter_handlers(self):
+        """遍历分发管线之后的所有输出处理器"""
+        return list(self._root._pipeline.targets)
     
     @handle_exception(LoggerError, default_return=None)
     def _get_file_formatter(self):
@@ -136,35 +312,7 @@ class CCTBLogger:
         Returns:
             文件格式化器实例
         """
-        class FileFormatter(logging.Formatter):
-            """文件日志格式化器 - Codexus样式（无颜色）"""
-            
-            def format(self, record):
-                # 获取原始格式化消息
-                message = record.getMessage()
-                
-                # 获取当前时间
-                from utils.impl.GetTime import gettime
-                current_time = gettime()
-                
-                # 根据日志级别设置不同的格式
-                if record.levelname == 'INFO':
-                    # INFO级别日志格式
-                    return f"[{current_time} INF] {message}"
-                elif record.levelname == 'WARNING':
-                    # WARN级别日志格式
-                    return f"[{current_time} WRN] * {message}"
-                elif record.levelname == 'ERROR':
-                    # ERROR级别日志格式
-                    return f"[{current_time} ERR] * {message}"
-                elif record.levelname == 'DEBUG':
-                    # DEBUG级别日志格式
-                    return f"[{current_time} DBG] {message}"
-                else:
-                    # 其他级别默认格式
-                    return f"[{current_time} {record.levelname}] {message}"
-        
-        return FileFormatter()
+        return FileFormatter(self._root._templates)
     
     @handle_exception(LoggerError, default_return=None)
     def _get_formatter(self, format_type: LogFormat) -> logging.Formatter:
@@ -186,72 +334,12 @@ class CCTBLogger:
             )
         
         elif format_type == LogFormat.COLORED:
-            # 自定义彩色格式化器
-            class ColoredFormatter(logging.Formatter):
-                """彩色日志格式化器 - Codexus样式"""
-                
-                def format(self, record):
-                    # 获取原始格式化消息
-                    message = record.getMessage()
-                    
-                    # 获取当前时间
-                    from utils.impl.GetTime import gettime
-                    current_time = gettime()
-                    
-                    # 根据日志级别设置不同的格式
-                    if record.levelname == 'INFO':
-                        # INFO级别日志格式
-                        console_output = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}{current_time}{Style.BRIGHT}{Fore.LIGHTWHITE_EX} INF{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}{message}"
-                        file_output = f"[{current_time} INF] {message}"
-                    elif record.levelname == 'WARNING':
-                        # WARN级别日志格式
-                        console_output = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}{current_time}{Style.BRIGHT}{Fore.LIGHTYELLOW_EX} WRN{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}* {message}"
-                        file_output = f"[{current_time} WRN] * {message}"
-                    elif record.levelname == 'ERROR':
-                        # ERROR级别日志格式
-                        console_output = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}{current_time} {Back.RED}{Style.BRIGHT}{Fore.LIGHTWHITE_EX}ERR{Back.RESET}{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}* {message}"
-                        file_output = f"[{current_time} ERR] * {message}"
-                    elif record.levelname == 'DEBUG':
-                        # DEBUG级别日志格式
-                        console_output = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}{current_time}{Style.BRIGHT}{Fore.LIGHTCYAN_EX} DBG{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}{message}"
-                        file_output = f"[{current_time} DBG] {message}"
-                    else:
-                        # 其他级别默认格式
-                        console_output = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}{current_time}{Style.BRIGHT}{Fore.LIGHTMAGENTA_EX} {record.levelname}{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}{message}"
-                        file_output = f"[{current_time} {record.levelname}] {message}"
-                    
-                    # 将文件输出保存到记录的属性中，以便文件处理器使用
-                    record.file_output = file_output
-                    
-                    return console_output
-            
-            return ColoredFormatter("%(message)s")
+            # 彩色格式化器，同时生成文件输出
+            return ColoredFormatter(self._root._templates)
         
         elif format_type == LogFormat.JSON:
-            # JSON格式化器
-            import json
-            
-            class JsonFormatter(logging.Formatter):
-                """JSON格式化器"""
-                
-                def format(self, record):
-                    log_entry = {
-                        'timestamp': datetime.fromtimestamp(record.created).isoformat(),
-                        'level': record.levelname,
-                        'logger': record.name,
-                        'message': record.getMessage(),
-                        'module': record.module,
-                        'function': record.funcName,
-                        'line': record.lineno
-                    }
-                    
-                    # 添加异常信息（如果有）
-                    if record.exc_info:
-                        log_entry['exception'] = self.formatException(record.exc_info)
-                    
-                    return json.dumps(log_entry, ensure_ascii=False)
-            
-            return JsonFormatter()
+            # JSONL格式化器，字段列表等取自logging.json中custom_formatters的json节
+            return create_json_formatter(config.values.custom_formatters.get("json", {}))
         
         # 默认返回简单格式化器
         return logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
@@ -318,21 +406,35 @@ class CCTBLogger:
         elif isinstance(level, LogLevel):
             level = level.value
         
-        self._logger.setLevel(level)
+        # 只有根记录器的级别会同步到共享的处理器，子记录器只修改自己的级别
+        if self.is_root:
+            for handler in self._iter_handlers():
+                handler.setLevel(level)
         
-        # 更新所有处理器的级别
-        for handler in self._logger.handlers:
-            handler.setLevel(level)
+        self._set_logger_level(level)
+    
+    def _set_logger_level(self, level: int):
+        """
+        只设置记录器自身的级别，不修改共享处理器的级别
+        根记录器启用环形缓冲时，新级别交给管线闸门，记录器本身保持在缓冲级别以下
+        """
+        if self.is_root and self._ring_buffer is not None:
+            self._level_gate.level = level
+            level = min(level, self._ring_buffer.level)
+        self._logger.setLevel(level)
     
     @handle_exception(LoggerError, default_return=False)
     def add_file_handler(self, file_path: str, level: Union[int, str, LogLevel] = None):
         """
-        添加文件处理器
+        添加文件处理器（同一路径只会添加一次）
         
         Args:
             file_path: 日志文件路径
             level: 日志级别，如果为None则使用记录器的级别
         """
+        if self.has_file_handler(file_path):
+            return True
+        
         if level is None:
             level = self._logger.level
         elif isinstance(level, str):
@@ -346,13 +448,13 @@ class CCTBLogger:
             if log_dir and not os.path.exists(log_dir):
                 os.makedirs(log_dir)
             
-            # 创建文件处理器
-            file_handler = logging.FileHandler(file_path, encoding='utf-8')
+            # 创建批量写入的文件处理器
+            file_handler = create_file_sink(file_path, config.values.file_sink)
             file_handler.setLevel(level)
             
             # 检查当前日志格式是否为彩色格式
             config.load_logging_config()
-            log_format = config.get("log_format", "colored")
+            log_format = config.values.log_format
             
             # 使用相应的格式化器
             if log_format == "colored":
@@ -361,13 +463,27 @@ class CCTBLogger:
                 file_formatter = self._get_formatter(LogFormat.DETAILED)
             
             file_handler.setFormatter(file_formatter)
-            self._logger.addHandler(file_handler)
+            self._root._pipeline.add_target(file_handler)
             
             return True
         except Exception as e:
             self.error(f"Failed to add file handler: {str(e)}")
             return False
     
+    @handle_exception(LoggerError, default_return=False)
+    def has_file_handler(self, file_path: str) -> bool:
+        """
+        检查共享的处理器树中是否已有指定路径的文件处理器
+        
+        Args:
+            file_path: 日志文件路径
+        """
+        target = os.path.abspath(file_path)
+        for handler in self._iter_handlers():
+            if getattr(handler, "baseFilename", None) == target:
+                return True
+        return False
+    
     @handle_exception(LoggerError, default_return=False)
     def remove_file_handler(self, file_path: str):
         """
@@ -376,19 +492,98 @@ class CCTBLogger:
         Args:
             file_path: 日志文件路径
         """
-        for handler in self._logger.handlers[:]:
-            if isinstance(handler, (logging.FileHandler, logging.handlers.RotatingFileHandler)):
+        for handler in self._iter_handlers():
+            if isinstance(handler, (logging.FileHandler, BatchingFileHandler)):
                 if handler.baseFilename == os.path.abspath(file_path):
-                    self._logger.removeHandler(handler)
+                    self._root._pipeline.remove_target(handler)
                     handler.close()
                     return True
         
         return False
+    
+    @handle_exception(LoggerError, default_return={})
+    def get_stats(self) -> dict:
+        """
+        获取日志管线统计信息（队列深度、丢弃记录数、写入字节数、批次数和写入耗时等）
+        
+        Returns:
+            统计信息字典
+        """
+        return {
+            "pipeline": self._root._pipeline.get_stats(),
+            "sinks": [handler.get_stats() for handler in self._iter_handlers() if hasattr(handler, "get_stats")],
+            "filters": {name: log_filter.get_stats() for name, log_filter in self._root._filters.items()},
+            "ring_buffer": self._root._ring_buffer.get_stats() if self._root._ring_buffer is not None else None,
+            "error_db": self._root._error_recorder.get_stats() if self._root._error_recorder is not None else None
+        }
+    
+    @handle_exception(LoggerError, default_return=None)
+    def dump_ring_buffer(self, reason: str = "manual", exc_info=None):
+        """
+        把环形缓冲中的记录和性能统计快照导出到崩溃日志文件
+        
+        Args:
+            reason: 导出原因
+            exc_info: 触发导出的异常信息(type, value, traceback)
+            
+        Returns:
+            导出文件路径，未启用环形缓冲时返回None
+        """
+        root = self._root
+        if root._ring_buffer is None:
+            return None
+        
+        # 延迟导入，避免与性能监控模块循环依赖
+        try:
+            from utils.impl.Performance import get_performance_stats
+            performance_stats = get_performance_stats()
+        except Exception as e:
+            performance_stats = {"error": f"Failed to collect performance stats: {e}"}
+        
+        path = crash_file_path(root._crash_dir)
+        return root._ring_buffer.dump(path, reason, exc_info, performance_stats)
+    
+    def _dump_on_crash(self, exc_type, exc_value, exc_traceback):
+        """崩溃钩子：未处理异常发生时导出环形缓冲"""
+        path = self.dump_ring_buffer("unhandled exception", (exc_type, exc_value, exc_traceback))
+        if path:
+            print(f"ERROR: Crash dump written to {path}")
+    
+    @handle_exception(LoggerError, default_return=None)
+    def flush(self):
+        """输出待合并的重复消息摘要，等待异步队列写空并刷新所有输出处理器"""
+        self._flush_filters()
+        self._root._pipeline.flush()
+    
+    def _flush_filters(self):
+        """输出过滤器中尚未输出的内容（如重复消息的合并摘要）"""
+        for log_filter in self._root._filters.values():
+            if hasattr(log_filter, "flush"):
+                log_filter.flush()
+    
+    @handle_exception(LoggerError, default_return=None)
+    def shutdown(self):
+        """写出剩余日志并关闭分发管线，程序退出前调用"""
+        scheduler.cancel(self._root._dedup_task, wait=True)
+        self._flush_filters()
+        self._root._pipeline.flush()
+        # 停止后管线改为在调用线程直写，退出阶段的日志仍然可以输出
+        self._root._pipeline.stop()
+        # 写入剩余的错误指纹，之后捕获的异常只输出日志
+        if self._root._error_recorder is not None:
+            set_error_recorder(None)
+            self._root._error_recorder.close()
 
 
 # 创建全局日志记录器实例
 logger = CCTBLogger()
 
+
+def shutdown_logging():
+    """写出所有待处理的日志并关闭日志管线"""
+    logger.shutdown()
+
+
 # 为了向后兼容，提供与旧Log模块相同的接口
 @handle_exception(default_return=None, error_message="Failed to write info log")
 def info(text):
@@ -0,0 +1,195 @@
+"""
+缓存注册表
+进程内的各种缓存（记忆化结果、日志环形缓冲、性能历史等）登记自己的大小估算函数和收缩回调，
+内存超过阈值（config.json中的memory_threshold_mb）时，资源优化器按优先级从低到高依次收缩缓存，
+直到回收的字节数足够，并报告每个缓存回收的字节数
+
+优先级越小越先被收缩：可以随时重新计算的结果优先，诊断用的日志缓冲最后
+"""
+import sys
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+# 常用优先级
+PRIORITY_RECOMPUTABLE = 10   # 可以重新计算的结果（记忆化缓存、指纹缓存）
+PRIORITY_HISTORY = 30        # 历史数据（性能指标历史）
+PRIORITY_DIAGNOSTIC = 50     # 诊断数据（日志环形缓冲）
+
+# 估算对象大小时每个容器最多抽样的元素数
+SAMPLE_SIZE = 32
+
+_logger = logging.getLogger("CCTB.Caches")
+
+
+def deep_sizeof(obj: Any, depth: int = 3) -> int:
+    """
+    估算对象及其引用对象占用的字节数，容器只抽样前SAMPLE_SIZE个元素再按数量放大
+
+    Args:
+        obj: 对象
+        depth: 递归深度
+
+    Returns:
+        估算的字节数
+    """
+    size = sys.getsizeof(obj, 0)
+    if depth <= 0 or isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+
+    if isinstance(obj, dict):
+        items = obj.items()
+        count = len(obj)
+        sampled = 0
+        total = 0
+        for key, value in items:
+            total += deep_sizeof(key, depth - 1) + deep_sizeof(value, depth - 1)
+            sampled += 1
+            if sampled >= SAMPLE_SIZE:
+                break
+        return size + (total * count // sampled if sampled else 0)
+
+    if isinstance(obj, (list, tuple, set, frozenset, deque)):
+        count = len(obj)
+        sampled = 0
+        total = 0
+        for item in obj:
+            total += deep_sizeof(item, depth - 1)
+            sampled += 1
+            if sampled >= SAMPLE_SIZE:
+                break
+        return size + (total * count // sampled if sampled else 0)
+
+    attributes = getattr(obj, "__dict__", None)
+    if attributes is not None:
+        return size + deep_sizeof(attributes, depth - 1)
+    return size
+
+
+class RegisteredCache:
+    """注册表中的一个缓存"""
+
+    __slots__ = ("name", "size", "shrink", "priority", "shrinks", "bytes_reclaimed", "last_shrink")
+
+    def __init__(self, name: str, size: Callable[[], int], shrink: Callable[[int], Any], priority: int):
+        self.name = name
+        self.size = size
+        self.shrink = shrink
+        self.priority = priority
+        self.shrinks = 0
+        self.bytes_reclaimed = 0
+        self.last_shrink = 0.0
+
+
+class CacheRegistry:
+    """缓存注册表"""
+
+    def __init__(self):
+        self._caches: Dict[str, RegisteredCache] = {}
+        self._lock = threading.Lock()
+        self._reclaims = 0
+        self._bytes_reclaimed = 0
+
+    def register(self, name: str, size: Callable[[], int], shrink: Callable[[int], Any],
+                 priority: int = PRIORITY_RECOMPUTABLE):
+        """
+        登记缓存，同名缓存会被替换
+
+        Args:
+            name: 缓存名称
+            size: 返回缓存当前估算字节数的函数
+            shrink: 收缩回调，参数为收缩后的目标字节数，缓存应淘汰条目直到不超过该大小
+            priority: 优先级，越小越先被收缩
+        """
+        with self._lock:
+            self._caches[name] = RegisteredCache(name, size, shrink, priority)
+
+    def unregister(self, name: str):
+        """注销缓存"""
+        with self._lock:
+            self._caches.pop(name, None)
+
+    def _ordered(self) -> List[RegisteredCache]:
+        with self._lock:
+            return sorted(self._caches.values(), key=lambda cache: cache.priority)
+
+    @staticmethod
+    def _measure(cache: RegisteredCache) -> int:
+        try:
+            return max(0, int(cache.size()))
+        except Exception as e:
+            _logger.warning("Failed to measure cache %s: %s", cache.name, e)
+            return 0
+
+    def sizes(self) -> Dict[str, int]:
+        """
+        获取各缓存的估算大小
+
+        Returns:
+            缓存名称 -> 字节数
+        """
+        return {cache.name: self._measure(cache) for cache in self._ordered()}
+
+    def reclaim(self, needed_bytes: int) -> Dict[str, int]:
+        """
+        按优先级依次收缩缓存，直到回收的字节数达到needed_bytes
+
+        Args:
+            needed_bytes: 需要回收的字节数
+
+        Returns:
+            缓存名称 -> 回收的字节数（只包含回收了内存的缓存）
+        """
+        reclaimed = {}
+        remaining = needed_bytes
+        for cache in self._ordered():
+            if remaining <= 0:
+                break
+            before = self._measure(cache)
+            if before <= 0:
+                continue
+            try:
+                cache.shrink(max(0, before - remaining))
+            except Exception as e:
+                _logger.warning("Failed to shrink cache %s: %s", cache.name, e)
+                continue
+            freed = max(0, before - self._measure(cache))
+            cache.shrinks += 1
+            cache.last_shrink = time.time()
+            if freed:
+                cache.bytes_reclaimed += freed
+                reclaimed[cache.name] = freed
+                remaining -= freed
+
+        self._reclaims += 1
+        self._bytes_reclaimed += sum(reclaimed.values())
+        return reclaimed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取注册表统计信息
+
+        Returns:
+            统计信息字典
+        """
+        caches = {}
+        for cache in self._ordered():
+            caches[cache.name] = {
+                "priority": cache.priority,
+                "bytes": self._measure(cache),
+                "shrinks": cache.shrinks,
+                "bytes_reclaimed": cache.bytes_reclaimed,
+                "last_shrink": cache.last_shrink
+            }
+        return {
+            "total_bytes": sum(item["bytes"] for item in caches.values()),
+            "reclaims": self._reclaims,
+            "bytes_reclaimed": self._bytes_reclaimed,
+            "caches": caches
+        }
+
+
+# 全局缓存注册表
+cache_registry = CacheRegistry()
@@ -1,11 +1,24 @@
 """
 配置管理模块
-集中管理应用程序的全局配置和状态，减少全局变量的使用
+集中管理应用程序的全局配置和状态，减少全局变量的使用。
+配置由默认值、config.json、logging.json、环境变量、命令行和运行时修改逐层合并，并记录每个值的来源。
+配置以不可变快照的形式发布：每次修改都生成新的快照并一次性替换引用，读取方不加锁，
+也不会看到只应用了一半的更新；ConfigWatcher在后台轮询配置文件，变化后重新解析、校验并发布，
+订阅者会收到发生变化的键
 """
 
 import os
-from typing import Dict, Any
+import sys
+import json
+import hashlib
+import logging
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
+from types import MappingProxyType
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple, Union, get_args, get_origin, get_type_hints
 from utils.impl.ErrorHandler import handle_exception, CCTBException
+from utils.impl.Scheduler import scheduler
 
 
 class ConfigError(CCTBException):
@@ -13,12 +26,267 @@ class ConfigError(CCTBException):
     pass
 
 
+# 配置文件目录（项目根目录下的config）
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "config")
+
+_LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "WARN", "ERROR", "CRITICAL")
+
+
+def _check(predicate: Callable[[Any], bool], requirement: str) -> Dict[str, Any]:
+    """字段的附加校验（放在dataclass字段的metadata中）"""
+    return {"check": predicate, "requirement": requirement}
+
+
+_POSITIVE = _check(lambda v: v > 0, "positive")
+_NON_NEGATIVE = _check(lambda v: v >= 0, "non-negative")
+_LEVEL_NAME = _check(lambda v: v.upper() in _LOG_LEVELS, "a log level name")
+
+
+def _section():
+    """嵌套配置节的默认值（空的只读映射）"""
+    return MappingProxyType({})
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigValues:
+    """
+    类型化的配置快照，字段即配置项的声明（名称、类型、默认值、附加校验）
+    读取直接使用属性访问，如config.values.timeout
+    """
+    # 应用程序基本配置
+    debug: bool = False
+
+    # 网络配置
+    target_port: int = field(default=4705, metadata=_check(lambda v: 0 < v < 65536, "a port number"))
+    timeout: float = field(default=5, metadata=_POSITIVE)
+
+    # 系统配置
+    min_python_version: Tuple[int, ...] = (3, 11)
+    supported_platforms: Tuple[str, ...] = ("win32",)
+
+    # 日志配置
+    log_level: str = field(default="INFO", metadata=_LEVEL_NAME)
+    log_file: Optional[str] = None
+    log_format: str = "colored"
+    max_file_size: int = field(default=10485760, metadata=_NON_NEGATIVE)
+    backup_count: int = field(default=5, metadata=_NON_NEGATIVE)
+    enable_console: bool = True
+    enable_file: bool = True
+    console_level: str = field(default="INFO", metadata=_LEVEL_NAME)
+    file_level: str = field(default="DEBUG", metadata=_LEVEL_NAME)
+    async_logging: Mapping[str, Any] = field(default_factory=_section)
+    loggers: Mapping[str, Any] = field(default_factory=_section)
+    file_sink: Mapping[str, Any] = field(default_factory=_section)
+    rotation: Mapping[str, Any] = field(default_factory=_section)
+    dedup: Mapping[str, Any] = field(default_factory=_section)
+    rate_limits: Mapping[str, Any] = field(default_factory=_section)
+    ring_buffer: Mapping[str, Any] = field(default_factory=_section)
+    filters: Mapping[str, Any] = field(default_factory=_section)
+    json_sink: Mapping[str, Any] = field(default_factory=_section)
+    store: Mapping[str, Any] = field(default_factory=_section)
+    multiprocess: Mapping[str, Any] = field(default_factory=_section)
+    error_db: Mapping[str, Any] = field(default_factory=_section)
+    custom_formatters: Mapping[str, Any] = field(default_factory=_section)
+
+    # 性能监控配置
+    performance_monitoring: bool = True
+    performance_monitor_interval: float = field(default=5.0, metadata=_POSITIVE)
+    performance_adaptive_sampling: bool = True
+    performance_monitor_min_interval: float = field(default=0.5, metadata=_POSITIVE)
+    performance_monitor_max_interval: float = field(default=30.0, metadata=_POSITIVE)
+    performance_monitor_cpu_budget: float = field(default=0.5, metadata=_check(lambda v: 0 < v <= 100, "a percentage"))
+    performance_auto_optimize: bool = True
+    performance_optimize_interval: float = field(default=30.0, metadata=_POSITIVE)
+    performance_history_size: int = field(default=3600, metadata=_POSITIVE)
+    max_scan_workers: int = field(default=500, metadata=_POSITIVE)
+    memory_threshold_mb: float = field(default=200, metadata=_POSITIVE)
+    cpu_threshold_percent: float = field(default=80, metadata=_check(lambda v: 0 < v <= 100, "a percentage"))
+    optimization_rules: Tuple[Mapping[str, Any], ...] = ()
+
+    # 其他配置
+    max_message_length: int = field(default=954, metadata=_POSITIVE)
+    max_path_length: int = field(default=906, metadata=_POSITIVE)
+
+
+def _runtime_types(annotation: Any) -> Tuple[type, ...]:
+    """把字段注解转换为isinstance可用的类型元组"""
+    if annotation is float:
+        # JSON中的整数也是合法的浮点配置
+        return (int, float)
+    origin = get_origin(annotation)
+    if origin is Union:
+        return tuple(t for arg in get_args(annotation) for t in _runtime_types(arg))
+    if origin is not None:
+        return (origin,)
+    return (annotation,)
+
+
+# 校验失败时提示使用的类型名称（JSON中的叫法）
+_MISSING = object()
+
+_TYPE_NAMES = {bool: "a boolean", int: "an integer", float: "a number", str: "a string",
+               tuple: "a list", Mapping: "an object", type(None): "null"}
+
+
+def _compile_schema() -> Dict[str, Tuple[Tuple[type, ...], Optional[Callable[[Any], bool]], str]]:
+    """
+    把ConfigValues的字段声明编译为校验表（只在导入时执行一次）
+
+    Returns:
+        字段名 -> (允许的类型, 附加校验, 要求说明)
+    """
+    hints = get_type_hints(ConfigValues)
+    schema = {}
+    for item in fields(ConfigValues):
+        types = _runtime_types(hints[item.name])
+        requirement = " or ".join(_TYPE_NAMES.get(t, t.__name__) for t in types if not (t is int and float in types))
+        if "requirement" in item.metadata:
+            requirement += f" ({item.metadata['requirement']})"
+        schema[item.name] = (types, item.metadata.get("check"), requirement)
+    return schema
+
+
+SCHEMA = _compile_schema()
+FIELD_NAMES = tuple(SCHEMA)
+
+
+def validate_config(values: Mapping[str, Any]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    按声明的字段校验配置值（列表按元组、对象按只读映射校验）
+
+    Args:
+        values: 待校验的配置
+
+    Returns:
+        (键 -> 类型或取值错误的描述, 未声明的键列表)
+    """
+    errors = {}
+    unknown = []
+    for key, value in values.items():
+        spec = SCHEMA.get(key)
+        if spec is None:
+            unknown.append(key)
+            continue
+        value = freeze(value)
+        types, check, requirement = spec
+        # bool是int的子类，整数字段不接受true/false
+        valid = isinstance(value, types) and not (isinstance(value, bool) and bool not in types)
+        if valid and check is not None:
+            try:
+                valid = bool(check(value))
+            except Exception:
+                valid = False
+        if not valid:
+            errors[key] = f"{key} must be {requirement}, got {thaw(value)!r}"
+    return errors, unknown
+
+
+def freeze(value: Any) -> Any:
+    """把配置值转换为不可变形式（dict -> 只读映射，list -> 元组）"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """把只读映射还原为普通的dict（用于保存和导出，元组保持不变）"""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return tuple(thaw(item) for item in value)
+    return value
+
+
+# logging.json中属于全局配置的键
+LOGGING_KEYS = (
+    "log_level", "log_file", "log_format", "max_file_size", "backup_count",
+    "enable_console", "enable_file", "console_level", "file_level",
+    "async_logging", "loggers", "file_sink", "rotation", "dedup", "rate_limits",
+    "ring_buffer", "filters", "json_sink", "store", "multiprocess", "error_db",
+    "custom_formatters"
+)
+
+# 环境变量覆盖的前缀，如CCTB_TARGET_PORT=7600、CCTB_DEBUG=true
+ENV_PREFIX = "CCTB_"
+
+
+def extract_logging_config(logging_config: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    从logging.json的内容中取出日志相关配置（文件中没有写的键使用ConfigValues中的默认值）
+
+    Args:
+        logging_config: logging.json解析后的内容
+
+    Returns:
+        写入全局配置的日志配置项
+    """
+    return {key: logging_config[key] for key in LOGGING_KEYS if key in logging_config}
+
+
+def _parse_override(raw: str) -> Any:
+    """解析环境变量或命令行中的覆盖值：能按JSON解析的按JSON（数字、布尔、对象），否则作为字符串"""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def parse_env_overrides(environ: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    读取CCTB_前缀的环境变量
+
+    Args:
+        environ: 环境变量
+
+    Returns:
+        配置键 -> 覆盖值
+    """
+    return {name[len(ENV_PREFIX):].lower(): _parse_override(raw)
+            for name, raw in environ.items() if name.startswith(ENV_PREFIX) and len(name) > len(ENV_PREFIX)}
+
+
+def parse_cli_overrides(argv: Iterable[str]) -> Dict[str, Any]:
+    """
+    读取命令行中的--set key=value（可以重复），其他参数忽略
+
+    Args:
+        argv: 命令行参数（不含程序名）
+
+    Returns:
+        配置键 -> 覆盖值
+    """
+    overrides = {}
+    args = list(argv)
+    for index, arg in enumerate(args):
+        if arg == "--set" and index + 1 < len(args):
+            item = args[index + 1]
+        elif arg.startswith("--set="):
+            item = arg[len("--set="):]
+        else:
+            continue
+        key, sep, raw = item.partition("=")
+        if sep and key:
+            overrides[key.strip()] = _parse_override(raw)
+    return overrides
+
+
 class ConfigManager:
-    """配置管理器，集中管理应用程序配置"""
+    """
+    配置管理器，集中管理应用程序配置
+    配置按层合并，后面的层覆盖前面的层：
+    default（ConfigValues中的默认值） < config.json < logging.json < env（CCTB_*环境变量）
+    < cli（--set key=value） < runtime（运行时调用set/update）
+    每个值都记录来自哪一层；配置文件按mtime、大小和内容哈希缓存解析结果，重复加载只需要一次stat
+    """
     
     _instance = None
     _initialized = False
     
+    # 配置层的顺序（后面的覆盖前面的）
+    LAYERS = ("default", "config.json", "logging.json", "env", "cli", "runtime")
+    
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(ConfigManager, cls).__new__(cls)
@@ -26,28 +294,318 @@ class ConfigManager:
     
     def __init__(self):
         if not self._initialized:
-            self._config = {
-                # 应用程序基本配置
-                "debug": False,
-                
-                # 网络配置
-                "target_port": 4705,
-                "timeout": 5,
-                
-                # 系统配置
-                "min_python_version": (3, 11),
-                "supported_platforms": ["win32"],
-                
-                # 日志配置
-                "log_level": "INFO",
-                "log_file": None,
-                
-                # 其他配置
-                "max_message_length": 954,
-                "max_path_length": 906
+            defaults = ConfigValues()
+            self._defaults = {name: getattr(defaults, name) for name in FIELD_NAMES}
+            # 类型化快照，热路径直接读取属性（如config.values.timeout），随配置一起整体替换
+            self.values = defaults
+            # 映射形式的快照，供get()和需要按名称访问的代码使用
+            self._config = MappingProxyType(dict(self._defaults))
+            # 每个键的来源层
+            self._sources: Mapping[str, str] = MappingProxyType({name: "default" for name in FIELD_NAMES})
+            # 写入方之间互斥，读取方直接读取当前快照
+            self._write_lock = threading.Lock()
+            # 重新合并各层时互斥
+            self._load_lock = threading.RLock()
+            self._subscribers: List[Tuple[Callable[[frozenset, Mapping[str, Any]], None], Optional[frozenset]]] = []
+            self._version = 0
+            self._watcher = None
+            # 已经报告过的配置问题，同一个问题只报告一次
+            self._reported = set()
+            
+            # 文件层：层名 -> (文件路径, 解析函数)
+            self._files: Dict[str, Tuple[str, Callable[[Mapping[str, Any]], Dict[str, Any]]]] = {
+                "config.json": (os.path.join(CONFIG_DIR, "config.json"), dict),
+                "logging.json": (os.path.join(CONFIG_DIR, "logging.json"), extract_logging_config)
             }
+            # 文件解析缓存：路径 -> (签名(mtime_ns, size), 内容哈希, 已接受的配置项)
+            self._file_cache: Dict[str, Tuple[Tuple[int, int], str, Dict[str, Any]]] = {}
+            # 被拒绝的文件：路径 -> (签名, 内容哈希)，同一份内容不重复解析和报告
+            self._rejected: Dict[str, Tuple[Tuple[int, int], str]] = {}
+            self._env_layer: Dict[str, Any] = {}
+            self._cli_layer: Dict[str, Any] = {}
+            self._runtime_layer: Dict[str, Any] = {}
+            self._loaded = False
+            # 上一次合并时各文件层的签名
+            self._merged_signatures = None
+            
+            self.file_loads = 0
+            self.file_cache_hits = 0
+            self.rejections = 0
             self._initialized = True
     
+    def _report(self, message: str):
+        """报告配置问题（每条只报告一次）"""
+        if message not in self._reported:
+            self._reported.add(message)
+            logging.getLogger("CCTB.Config").warning(message)
+    
+    def _publish(self, changes: Mapping[str, Any], strict: bool = True) -> frozenset:
+        """
+        在当前快照的基础上应用修改，生成新快照并替换，然后通知订阅者
+        
+        Args:
+            changes: 要修改的配置项
+            strict: 为True时有类型错误的修改整体失败（抛出ConfigError）；
+                    为False时报告错误并跳过不合格的项
+            
+        Returns:
+            实际发生变化的键
+        """
+        errors, unknown = validate_config(changes)
+        if errors:
+            if strict:
+                raise ConfigError("Invalid config: " + "; ".join(errors.values()))
+            for message in errors.values():
+                self._report(f"Ignoring invalid config value: {message}")
+        for key in unknown:
+            self._report(f"Unknown config key: {key}")
+        
+        with self._write_lock:
+            current = self._config
+            updated = dict(current)
+            changed = []
+            for key, value in changes.items():
+                if key in errors:
+                    continue
+                value = freeze(value)
+                if current.get(key, _MISSING) != value:
+                    updated[key] = value
+                    changed.append(key)
+            if not changed:
+                return frozenset()
+            snapshot = MappingProxyType(updated)
+            if any(key in SCHEMA for key in changed):
+                self.values = ConfigValues(**{name: updated[name] for name in FIELD_NAMES})
+            # 一次引用替换，读取方要么看到旧快照，要么看到新快照
+            self._config = snapshot
+            self._version += 1
+            subscribers = list(self._subscribers)
+        
+        changed = frozenset(changed)
+        for callback, keys in subscribers:
+            relevant = changed if keys is None else changed & keys
+            if not relevant:
+                continue
+            try:
+                callback(relevant, snapshot)
+            except Exception as e:
+                logging.getLogger("CCTB.Config").error(f"Config subscriber {getattr(callback, '__qualname__', callback)} failed: {e}")
+        return changed
+    
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, int]]:
+        """文件签名（mtime_ns, size），文件不存在时返回None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _read_layer_file(self, path: str, parse: Callable[[Mapping[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        读取文件层（带缓存）
+        签名未变时直接返回缓存；签名变了但内容哈希相同时只更新签名；
+        首次加载时跳过不合格的项，之后的重新加载遇到无法解析或不合格的内容时整个文件被拒绝，保留上一次接受的内容
+        
+        Args:
+            path: 文件路径
+            parse: 把文件内容转换为配置项的函数
+            
+        Returns:
+            该层的配置项
+        """
+        cached = self._file_cache.get(path)
+        signature = self._signature(path)
+        if signature is None:
+            self._file_cache.pop(path, None)
+            return {}
+        if cached is not None and signature == cached[0]:
+            self.file_cache_hits += 1
+            return cached[2]
+        rejected = self._rejected.get(path)
+        if rejected is not None and signature == rejected[0]:
+            return cached[2] if cached is not None else {}
+        
+        name = os.path.basename(path)
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except OSError as e:
+            self._report(f"Cannot read config {name}: {e}")
+            return cached[2] if cached is not None else {}
+        digest = hashlib.sha1(raw).hexdigest()
+        if cached is not None and digest == cached[1]:
+            # 只是被touch或重新保存，内容没有变化
+            self._file_cache[path] = (signature, digest, cached[2])
+            self.file_cache_hits += 1
+            return cached[2]
+        if rejected is not None and digest == rejected[1]:
+            self._rejected[path] = (signature, digest)
+            return cached[2] if cached is not None else {}
+        
+        self.file_loads += 1
+        try:
+            values = parse(json.loads(raw.decode("utf-8")))
+        except (ValueError, UnicodeDecodeError) as e:
+            # 文件可能正在被编辑器写入，保留旧配置，文件再次变化后重试
+            self._rejected[path] = (signature, digest)
+            self.rejections += 1
+            logging.getLogger("CCTB.Config").warning(f"Ignoring unreadable config {name}: {e}")
+            return cached[2] if cached is not None else {}
+        
+        errors, _ = validate_config(values)
+        if errors:
+            if cached is not None:
+                self._rejected[path] = (signature, digest)
+                self.rejections += 1
+                logging.getLogger("CCTB.Config").warning(f"Rejected config {name}: {'; '.join(errors.values())}")
+                return cached[2]
+            for message in errors.values():
+                self._report(f"Ignoring invalid config value in {name}: {message}")
+            values = {key: value for key, value in values.items() if key not in errors}
+        
+        self._rejected.pop(path, None)
+        self._file_cache[path] = (signature, digest, values)
+        return values
+    
+    def _build_layers(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """按顺序生成所有配置层"""
+        layers = [("default", self._defaults)]
+        for name, (path, parse) in self._files.items():
+            layers.append((name, self._read_layer_file(path, parse)))
+        layers.append(("env", self._env_layer))
+        layers.append(("cli", self._cli_layer))
+        layers.append(("runtime", self._runtime_layer))
+        return layers
+    
+    @handle_exception(ConfigError, default_return=frozenset())
+    def reload(self, force: bool = False) -> frozenset:
+        """
+        重新合并所有配置层并发布（文件都没有变化时只需要stat，直接返回）
+        
+        Args:
+            force: 即使文件没有变化也重新合并（非文件层被修改时使用）
+            
+        Returns:
+            发生变化的键
+        """
+        with self._load_lock:
+            signatures = tuple(self._signature(path) for path, _ in self._files.values())
+            if not force and signatures == self._merged_signatures:
+                return frozenset()
+            self._merged_signatures = signatures
+            merged = {}
+            sources = {}
+            for layer, values in self._build_layers():
+                errors, _ = validate_config(values) if layer in ("env", "cli") else ({}, [])
+                for message in errors.values():
+                    self._report(f"Ignoring invalid {layer} override: {message}")
+                for key, value in values.items():
+                    if key not in errors:
+                        merged[key] = value
+                        sources[key] = layer
+            self._sources = MappingProxyType(sources)
+            return self._publish(merged, strict=False)
+    
+    @handle_exception(ConfigError, default_return=False)
+    def load_layers(self, argv: Optional[Iterable[str]] = None, environ: Optional[Mapping[str, str]] = None) -> bool:
+        """
+        读取环境变量和命令行覆盖，合并所有配置层（启动时调用一次）
+        
+        Args:
+            argv: 命令行参数（不含程序名），默认sys.argv[1:]
+            environ: 环境变量，默认os.environ
+            
+        Returns:
+            加载成功返回True
+        """
+        with self._load_lock:
+            self._env_layer = parse_env_overrides(os.environ if environ is None else environ)
+            self._cli_layer = parse_cli_overrides(sys.argv[1:] if argv is None else argv)
+            self._loaded = True
+            self.reload(force=True)
+        return True
+    
+    def ensure_loaded(self):
+        """尚未加载过配置层时加载一次"""
+        if not self._loaded:
+            self.load_layers()
+    
+    def get_source(self, key: str) -> Optional[str]:
+        """
+        获取配置值的来源层
+        
+        Args:
+            key: 配置键
+            
+        Returns:
+            来源层名称，键不存在时返回None
+        """
+        return self._sources.get(key)
+    
+    def describe(self) -> List[Tuple[str, Any, str]]:
+        """
+        列出所有生效的配置值及其来源
+        
+        Returns:
+            (键, 值, 来源层) 列表，声明的字段在前
+        """
+        snapshot = self._config
+        sources = self._sources
+        keys = list(FIELD_NAMES) + sorted(key for key in snapshot if key not in SCHEMA)
+        return [(key, thaw(snapshot[key]), sources.get(key, "runtime")) for key in keys if key in snapshot]
+    
+    def format_config(self) -> str:
+        """
+        生成--print-config输出的文本
+        
+        Returns:
+            每行一个配置项：键、来源层、JSON格式的值
+        """
+        rows = self.describe()
+        key_width = max(len(key) for key, _, _ in rows)
+        source_width = max(len(layer) for layer in self.LAYERS)
+        lines = [f"{'key':<{key_width}}  {'source':<{source_width}}  value"]
+        for key, value, source in rows:
+            lines.append(f"{key:<{key_width}}  {source:<{source_width}}  {json.dumps(value, ensure_ascii=False, default=str)}")
+        return "\n".join(lines)
+    
+    def snapshot(self) -> Mapping[str, Any]:
+        """
+        获取当前配置快照（只读，之后的修改不会影响已经取得的快照）
+        
+        Returns:
+            只读配置映射
+        """
+        return self._config
+    
+    @property
+    def version(self) -> int:
+        """配置版本号，每发布一次新快照加1"""
+        return self._version
+    
+    def subscribe(self, callback: Callable[[frozenset, Mapping[str, Any]], None],
+                  keys: Optional[Iterable[str]] = None):
+        """
+        订阅配置变化
+        
+        Args:
+            callback: 回调函数，接收发生变化的键集合和新快照
+            keys: 只关心的键，None表示所有键
+        """
+        with self._write_lock:
+            self._subscribers.append((callback, frozenset(keys) if keys is not None else None))
+    
+    def unsubscribe(self, callback: Callable[[frozenset, Mapping[str, Any]], None]):
+        """
+        取消订阅配置变化
+        
+        Args:
+            callback: 订阅时使用的回调函数
+        """
+        with self._write_lock:
+            self._subscribers = [item for item in self._subscribers if item[0] != callback]
+    
     @handle_exception(ConfigError, default_return=None)
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -65,7 +623,7 @@ class ConfigManager:
     @handle_exception(ConfigError, default_return=False)
     def set(self, key: str, value: Any) -> bool:
         """
-        设置配置值
+        设置配置值（写入runtime层，配置文件重新加载后仍然生效）
         
         Args:
             key: 配置键
@@ -74,13 +632,12 @@ class ConfigManager:
         Returns:
             设置成功返回True，失败返回False
         """
-        self._config[key] = value
-        return True
+        return self.update({key: value})
     
     @handle_exception(ConfigError, default_return=False)
     def update(self, config_dict: Dict[str, Any]) -> bool:
         """
-        批量更新配置
+        批量更新配置（写入runtime层）
         
         Args:
             config_dict: 配置字典
@@ -88,7 +645,12 @@ class ConfigManager:
         Returns:
             更新成功返回True，失败返回False
         """
-        self._config.update(config_dict)
+        errors, _ = validate_config(config_dict)
+        if errors:
+            raise ConfigError("Invalid config: " + "; ".join(errors.values()))
+        with self._load_lock:
+            self._runtime_layer.update(config_dict)
+            self.reload(force=True)
         return True
     
     @handle_exception(ConfigError, default_return=None)
@@ -99,12 +661,12 @@ class ConfigManager:
         Returns:
             配置字典
         """
-        return self._config.copy()
+        return thaw(self._config)
     
     @handle_exception(ConfigError, default_return=False)
     def load_from_file(self, file_path: str) -> bool:
         """
-        从文件加载配置
+        从文件加载配置，文件作为一个配置层加在logging.json之后、环境变量之前
         
         Args:
             file_path: 配置文件路径
@@ -112,14 +674,15 @@ class ConfigManager:
         Returns:
             加载成功返回True，失败返回False
         """
-        try:
-            import json
-            with open(file_path, 'r', encoding='utf-8') as f:
-                config_data = json.load(f)
-                self._config.update(config_data)
-            return True
-        except Exception as e:
-            raise ConfigError(f"Failed to load config from {file_path}: {str(e)}")
+        path = os.path.abspath(file_path)
+        if not os.path.exists(path):
+            raise ConfigError(f"Failed to load config from {file_path}: file not found")
+        with self._load_lock:
+            if path not in (item[0] for item in self._files.values()):
+                self._files[os.path.basename(path)] = (path, dict)
+            self._loaded = True
+            self.reload(force=True)
+        return True
     
     @handle_exception(ConfigError, default_return=False)
     def save_to_file(self, file_path: str) -> bool:
@@ -133,9 +696,8 @@ class ConfigManager:
             保存成功返回True，失败返回False
         """
         try:
-            import json
             with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self._config, f, indent=2, ensure_ascii=False)
+                json.dump(thaw(self._config), f, indent=2, ensure_ascii=False)
             return True
         except Exception as e:
             raise ConfigError(f"Failed to save config to {file_path}: {str(e)}")
@@ -143,7 +705,7 @@ class ConfigManager:
     @handle_exception(ConfigError, default_return=False)
     def load_logging_config(self, config_path: str = None) -> bool:
         """
-        加载日志配置
+        加载日志配置（首次调用时合并所有配置层，之后只在文件变化时重新解析）
         
         Args:
             config_path: 日志配置文件路径，如果为None则使用默认路径
@@ -151,41 +713,96 @@ class ConfigManager:
         Returns:
             加载成功返回True，失败返回False
         """
-        if config_path is None:
-            # 默认日志配置文件路径
-            config_path = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-                "config",
-                "logging.json"
-            )
+        with self._load_lock:
+            if config_path is not None:
+                self._files["logging.json"] = (os.path.abspath(config_path), extract_logging_config)
+            if self._loaded:
+                self.reload(force=config_path is not None)
+            else:
+                self.load_layers()
+        return os.path.exists(self._files["logging.json"][0])
+    
+    def layer_files(self) -> List[str]:
+        """
+        获取所有文件层的路径
+        
+        Returns:
+            文件路径列表
+        """
+        return [path for path, _ in self._files.values()]
+    
+    @handle_exception(ConfigError, default_return=False)
+    def start_watching(self, interval: float = 1.0) -> bool:
+        """
+        启动配置文件监视，任意文件层变化后自动重新合并
+        
+        Args:
+            interval: 轮询间隔（秒）
+            
+        Returns:
+            启动成功返回True，已在运行时返回False
+        """
+        if self._watcher is not None:
+            return False
+        self._watcher = ConfigWatcher(self, interval)
+        self._watcher.start()
+        return True
+    
+    @handle_exception(ConfigError, default_return=None)
+    def stop_watching(self):
+        """停止配置文件监视"""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+
+class ConfigWatcher:
+    """配置文件监视器：在全局调度器上按mtime和大小轮询所有文件层，变化后让配置管理器重新合并并发布新快照"""
+    
+    def __init__(self, manager: ConfigManager, interval: float = 1.0):
+        """
+        初始化配置文件监视器
         
+        Args:
+            manager: 配置管理器
+            interval: 轮询间隔（秒）
+        """
+        self.manager = manager
+        self.interval = interval
+        self._signatures = {path: ConfigManager._signature(path) for path in manager.layer_files()}
+        self._task = None
+        self.reloads = 0
+    
+    def start(self):
+        self._task = scheduler.schedule_periodic("config.watcher", self._poll, self.interval)
+    
+    def stop(self):
+        scheduler.cancel(self._task, wait=True)
+        self._task = None
+    
+    def _poll(self):
         try:
-            import json
-            if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    logging_config = json.load(f)
-                
-                # 更新日志相关配置
-                log_config = {
-                    "log_level": logging_config.get("log_level", "INFO"),
-                    "log_file": logging_config.get("log_file"),
-                    "log_format": logging_config.get("log_format", "colored"),
-                    "max_file_size": logging_config.get("max_file_size", 10485760),
-                    "backup_count": logging_config.get("backup_count", 5),
-                    "enable_console": logging_config.get("enable_console", True),
-                    "enable_file": logging_config.get("enable_file", True),
-                    "console_level": logging_config.get("console_level", "INFO"),
-                    "file_level": logging_config.get("file_level", "DEBUG")
-                }
-                
-                self._config.update(log_config)
-                return True
-            else:
-                # 如果配置文件不存在，使用默认配置
-                return False
+            self.check()
         except Exception as e:
-            raise ConfigError(f"Failed to load logging config from {config_path}: {str(e)}")
+            logging.getLogger("CCTB.Config").error(f"Config watcher error: {e}")
+    
+    def check(self) -> frozenset:
+        """
+        检查所有文件层，有变化时重新合并
+        
+        Returns:
+            本次重新加载后发生变化的键
+        """
+        signatures = {path: ConfigManager._signature(path) for path in self.manager.layer_files()}
+        if signatures == self._signatures:
+            return frozenset()
+        self._signatures = signatures
+        changed = self.manager.reload()
+        self.reloads += 1
+        if changed:
+            logging.getLogger("CCTB.Config").info(f"Reloaded config: {', '.join(sorted(changed))}")
+        return changed
 
 
 # 创建全局配置管理器实例
-config = ConfigManager()
\ No newline at end of file
+config = ConfigManager()
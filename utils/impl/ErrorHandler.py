@@ -1,11 +1,18 @@
 """
 统一错误处理模块
-提供应用程序的统一错误处理机制，包括异常捕获、日志记录和错误恢复
+提供应用程序的统一错误处理机制，包括异常捕获、日志记录和错误恢复。
+捕获到的异常作为一条日志记录交给日志管线（CCTB.Errors），消息和堆栈都在输出时才格式化；
+每个调用点只在第一次以及之后每TRACEBACK_EVERY次附带完整堆栈，并统计出错次数和错误路径耗时；
+安装错误指纹记录器后，异常还会按指纹累计到错误数据库（见ErrorStore）
 """
 
 import sys
+import time
+import logging
+import itertools
+import threading
 import traceback
-from typing import Any, Callable, Optional, Type, Union
+from typing import Any, Callable, Dict, Optional, Type, Union
 from functools import wraps
 
 
@@ -43,6 +50,142 @@ class UserInputError(CCTBException):
     pass
 
 
+# 每个调用点第一次出错时附带完整堆栈，之后每TRACEBACK_EVERY次附带一次
+TRACEBACK_EVERY = 100
+
+_error_logger = logging.getLogger("CCTB.Errors")
+# 错误指纹记录器（ErrorStore.ErrorRecorder），由日志系统根据配置安装
+_error_recorder = None
+# 正在输出错误时再次出错（如日志系统本身出错）改用print，避免递归
+_reporting = threading.local()
+
+
+class ErrorSite:
+    """一个被装饰函数（调用点）的错误统计"""
+
+    __slots__ = ("name", "_counter", "caught", "tracebacks", "time_total", "time_max", "last_error", "last_time")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._counter = itertools.count(1)
+        self.caught = 0
+        self.tracebacks = 0
+        self.time_total = 0.0
+        self.time_max = 0.0
+        self.last_error = None
+        self.last_time = 0.0
+
+    def report(self, error: BaseException, log_error: bool, error_code: Optional[str],
+               message: str, *args):
+        """
+        记录一次捕获到的异常
+
+        Args:
+            error: 异常对象
+            log_error: 是否输出日志
+            error_code: 错误代码
+            message: 日志消息模板（%格式，输出时才格式化）
+            args: 消息参数
+        """
+        start = time.perf_counter()
+        occurrence = next(self._counter)
+        self.caught = occurrence
+        self.last_error = error.__class__.__name__
+        self.last_time = time.time()
+        if log_error:
+            with_traceback = occurrence == 1 or occurrence % TRACEBACK_EVERY == 0
+            if with_traceback:
+                self.tracebacks += 1
+            _emit_error(self, error, with_traceback, occurrence, error_code, message, args)
+        recorder = _error_recorder
+        if recorder is not None:
+            _record_error(recorder, error, error_code, self.name)
+        elapsed = time.perf_counter() - start
+        self.time_total += elapsed
+        if elapsed > self.time_max:
+            self.time_max = elapsed
+
+
+# 所有调用点：名称 -> ErrorSite
+_error_sites: Dict[str, ErrorSite] = {}
+
+
+def _get_site(name: str) -> ErrorSite:
+    site = _error_sites.get(name)
+    if site is None:
+        site = _error_sites.setdefault(name, ErrorSite(name))
+    return site
+
+
+def _emit_error(site: ErrorSite, error: BaseException, with_traceback: bool, occurrence: int,
+                error_code: Optional[str], message: str, args: tuple):
+    """把错误事件交给日志管线，异常对象随记录传递，堆栈在输出时才格式化"""
+    code = error_code or getattr(error, "error_code", None) or "UNKNOWN"
+    if getattr(_reporting, "active", False):
+        print(f"ERROR: {message % args if args else message} (Error code: {code})")
+        return
+    _reporting.active = True
+    try:
+        _error_logger.error(
+            message + " (Error code: %s)", *args, code,
+            exc_info=(error.__class__, error, error.__traceback__) if with_traceback else None,
+            extra={"error_site": site.name, "error_code": code, "occurrence": occurrence}
+        )
+    except Exception:
+        print(f"ERROR: {message % args if args else message} (Error code: {code})")
+        if with_traceback:
+            print(f"ERROR: Traceback: {''.join(traceback.format_exception(error.__class__, error, error.__traceback__))}")
+    finally:
+        _reporting.active = False
+
+
+def _record_error(recorder, error: BaseException, error_code: Optional[str], site: Optional[str]):
+    """把异常交给错误指纹记录器，记录器出错不影响调用方"""
+    try:
+        recorder.record(error, error_code, site)
+    except Exception as e:
+        print(f"ERROR: Failed to record error fingerprint: {e}")
+
+
+def set_error_recorder(recorder) -> None:
+    """
+    安装错误指纹记录器，之后捕获到的异常都会按指纹写入错误数据库
+
+    Args:
+        recorder: 提供record(error, error_code, site)和flush()的记录器，None表示卸载
+    """
+    global _error_recorder
+    _error_recorder = recorder
+
+
+def get_error_recorder():
+    """获取当前安装的错误指纹记录器"""
+    return _error_recorder
+
+
+def get_error_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    获取各调用点捕获异常的统计（按出错次数降序）
+
+    Returns:
+        调用点名称 -> 统计信息
+    """
+    stats = {}
+    for site in sorted(list(_error_sites.values()), key=lambda item: item.caught, reverse=True):
+        if not site.caught:
+            continue
+        stats[site.name] = {
+            "caught": site.caught,
+            "tracebacks": site.tracebacks,
+            "last_error": site.last_error,
+            "last_time": site.last_time,
+            "error_path_ms": site.time_total * 1000,
+            "avg_error_path_ms": site.time_total / site.caught * 1000,
+            "max_error_path_ms": site.time_max * 1000
+        }
+    return stats
+
+
 def handle_exception(
     exception_type: Type[BaseException] = Exception,
     default_return: Any = None,
@@ -63,19 +206,19 @@ def handle_exception(
         error_code: 自定义错误代码
     """
     def decorator(func: Callable) -> Callable:
+        site = _get_site(f"{func.__module__}.{func.__qualname__}")
+        name = func.__name__
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
             try:
                 return func(*args, **kwargs)
             except exception_type as e:
-                # 构建错误消息
-                msg = error_message or f"Error in {func.__name__}: {str(e)}"
-                
-                # 记录错误日志
-                if log_error:
-                    print(f"ERROR: {msg} (Error code: {error_code or 'UNKNOWN'})")
-                    # 记录详细的堆栈跟踪
-                    print(f"ERROR: Traceback: {traceback.format_exc()}")
+                # 错误消息在输出时才格式化
+                if error_message:
+                    site.report(e, log_error, error_code, "%s", error_message)
+                else:
+                    site.report(e, log_error, error_code, "Error in %s: %s", name, e)
                 
                 # 如果需要重新抛出异常
                 if reraise:
@@ -115,12 +258,11 @@ def safe_execute(
     try:
         return func(*args, **kwargs)
     except Exception as e:
-        msg = error_message or f"Error executing {func.__name__}: {str(e)}"
-        
-        if log_error:
-            print(f"ERROR: {msg}")
-            print(f"ERROR: Traceback: {traceback.format_exc()}")
-            
+        site = _get_site(f"{getattr(func, '__module__', None)}.{getattr(func, '__qualname__', repr(func))}")
+        if error_message:
+            site.report(e, log_error, None, "%s", error_message)
+        else:
+            site.report(e, log_error, None, "Error executing %s: %s", getattr(func, "__name__", func), e)
         return default_return
 
 
@@ -225,6 +367,32 @@ handle_validation_error = create_error_handler(
 )
 
 
+# 未处理异常发生时依次调用的崩溃钩子，如导出环形缓冲日志
+_crash_hooks = []
+
+
+def register_crash_hook(hook: Callable) -> None:
+    """
+    注册崩溃钩子，全局异常处理器捕获到未处理异常时调用
+    
+    Args:
+        hook: 钩子函数，接受(exc_type, exc_value, exc_traceback)三个参数
+    """
+    if hook not in _crash_hooks:
+        _crash_hooks.append(hook)
+
+
+def unregister_crash_hook(hook: Callable) -> None:
+    """
+    注销崩溃钩子
+    
+    Args:
+        hook: 之前注册的钩子函数
+    """
+    if hook in _crash_hooks:
+        _crash_hooks.remove(hook)
+
+
 def setup_global_exception_handler():
     """设置全局异常处理器，捕获未处理的异常"""
     def handle_unhandled_exception(exc_type, exc_value, exc_traceback):
@@ -244,6 +412,22 @@ def setup_global_exception_handler():
             for sub_line in line.split('\n'):
                 if sub_line:  # 跳过空行
                     print(f"ERROR: {sub_line}")
+        
+        # 未处理异常也写入错误数据库，进程即将退出，立即写入
+        recorder = _error_recorder
+        if recorder is not None:
+            _record_error(recorder, exc_value, None, "<unhandled>")
+            try:
+                recorder.flush()
+            except Exception as e:
+                print(f"ERROR: Failed to write error fingerprints: {e}")
+        
+        # 调用崩溃钩子，单个钩子失败不影响其他钩子
+        for hook in list(_crash_hooks):
+            try:
+                hook(exc_type, exc_value, exc_traceback)
+            except Exception as e:
+                print(f"ERROR: Crash hook {getattr(hook, '__name__', hook)} failed: {e}")
     
     # 设置全局异常处理器
     sys.excepthook = handle_unhandled_exception
\ No newline at end of file
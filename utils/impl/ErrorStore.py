@@ -0,0 +1,521 @@
+"""
+错误指纹数据库
+handle_exception等错误路径捕获到的异常按指纹（异常类型、归一化后的消息、最内层几帧的函数）归并，
+写入本地SQLite数据库，跨多次运行累计首次出现时间、最近出现时间、次数、一份样例堆栈、错误代码和CCTB异常分类。
+调用线程只计算指纹并在内存中合并计数，写入由后台线程按批次完成；
+同一个指纹在每个进程中只格式化一次样例堆栈，样例堆栈和消息写入前按日志的脱敏规则处理
+
+命令行用法（在项目根目录）：
+python -m utils.impl.ErrorStore top --limit 10
+python -m utils.impl.ErrorStore top --since 10:00 --by last
+python -m utils.impl.ErrorStore show 3f2a9c
+python -m utils.impl.ErrorStore stats
+"""
+import os
+import re
+import sys
+import json
+import time
+import logging
+import sqlite3
+import hashlib
+import argparse
+import threading
+import traceback
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from utils.impl.ErrorHandler import CCTBException
+from utils.impl.LogStore import parse_time
+from utils.impl.CacheRegistry import cache_registry, deep_sizeof, PRIORITY_RECOMPUTABLE
+
+SCHEMA_VERSION = 1
+
+_logger = logging.getLogger("CCTB.Errors")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS errors (
+    fingerprint TEXT PRIMARY KEY,
+    exc_type TEXT NOT NULL,
+    category TEXT,
+    message TEXT,
+    frames TEXT,
+    site TEXT,
+    error_code TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    count INTEGER NOT NULL,
+    traceback TEXT
+);
+CREATE INDEX IF NOT EXISTS errors_count ON errors(count DESC);
+CREATE INDEX IF NOT EXISTS errors_last_seen ON errors(last_seen DESC);
+"""
+
+# 已存在的指纹只累加次数、更新最近出现时间，样例堆栈保留第一份
+_UPSERT = """
+INSERT INTO errors (fingerprint, exc_type, category, message, frames, site, error_code,
+                    first_seen, last_seen, count, traceback)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(fingerprint) DO UPDATE SET
+    count = count + excluded.count,
+    first_seen = min(first_seen, excluded.first_seen),
+    last_seen = max(last_seen, excluded.last_seen),
+    site = excluded.site,
+    error_code = coalesce(excluded.error_code, error_code),
+    traceback = coalesce(traceback, excluded.traceback)
+"""
+
+_COLUMNS = ("fingerprint", "exc_type", "category", "message", "frames", "site", "error_code",
+            "first_seen", "last_seen", "count", "traceback")
+
+# 归一化消息：引号中的内容、十六进制地址和数字都视为可变部分
+_QUOTED = re.compile(r"'[^']*'|\"[^\"]*\"")
+_HEX = re.compile(r"0x[0-9a-fA-F]+")
+_NUMBER = re.compile(r"\d+")
+MAX_MESSAGE_LENGTH = 200
+
+
+def normalize_message(message: str) -> str:
+    """
+    归一化异常消息，如"invalid literal for int() with base 10: 'port-3'"
+    和"...: 'port-17'"归并为同一条
+
+    Args:
+        message: 原始消息
+
+    Returns:
+        归一化后的消息
+    """
+    message = _QUOTED.sub("<str>", message)
+    message = _HEX.sub("<addr>", message)
+    message = _NUMBER.sub("<n>", message)
+    return message[:MAX_MESSAGE_LENGTH]
+
+
+def error_category(exc_type: type) -> Optional[str]:
+    """获取异常所属的CCTB异常分类（直接继承CCTBException的类，如NetworkError），非CCTB异常返回None"""
+    if not issubclass(exc_type, CCTBException):
+        return None
+    for cls in exc_type.__mro__:
+        if CCTBException in cls.__bases__:
+            return cls.__name__
+    return CCTBException.__name__
+
+
+def _type_name(exc_type: type) -> str:
+    module = exc_type.__module__
+    return exc_type.__qualname__ if module == "builtins" else f"{module}.{exc_type.__qualname__}"
+
+
+# 代码对象 -> "文件名:函数名"，代码对象数量有限，不需要淘汰
+_frame_labels: Dict[Any, str] = {}
+# (异常类, 原始消息, 最内层帧) -> 指纹结果，同一个异常反复出现时跳过归一化和哈希
+_fingerprints: Dict[tuple, Tuple[str, str, str, Tuple[str, ...]]] = {}
+MAX_CACHED_FINGERPRINTS = 4096
+
+
+def _fingerprint_cache_size() -> int:
+    # 复制一份再估算，避免其他线程写入时遍历出错
+    return deep_sizeof(_fingerprints.copy())
+
+
+def _shrink_fingerprints(target_bytes: int):
+    """缓存注册表的收缩回调：指纹缓存可以随时重新计算，直接清空"""
+    if target_bytes < _fingerprint_cache_size():
+        _fingerprints.clear()
+
+
+cache_registry.register("errors.fingerprints", _fingerprint_cache_size, _shrink_fingerprints, PRIORITY_RECOMPUTABLE)
+
+
+def _frame_label(code) -> str:
+    label = _frame_labels.get(code)
+    if label is None:
+        label = _frame_labels[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+    return label
+
+
+def _top_frames(error: BaseException, depth: int) -> Tuple[str, ...]:
+    """最内层depth帧的"文件名:函数名"，不含行号，修改代码后指纹保持不变"""
+    codes = []
+    tb = error.__traceback__
+    while tb is not None:
+        codes.append(tb.tb_frame.f_code)
+        tb = tb.tb_next
+    return tuple(_frame_label(code) for code in codes[-depth:]) if depth else ()
+
+
+def fingerprint(error: BaseException, depth: int = 3) -> Tuple[str, str, str, Tuple[str, ...]]:
+    """
+    计算异常的指纹
+
+    Args:
+        error: 异常对象
+        depth: 参与指纹计算的最内层帧数
+
+    Returns:
+        (指纹, 异常类型名, 归一化消息, 最内层帧)
+    """
+    raw_message = str(error)
+    frames = _top_frames(error, depth)
+    key = (error.__class__, raw_message, frames)
+    result = _fingerprints.get(key)
+    if result is not None:
+        return result
+
+    type_name = _type_name(error.__class__)
+    message = normalize_message(raw_message)
+    digest = hashlib.sha1("\0".join((type_name, message) + frames).encode("utf-8", errors="replace")).hexdigest()
+    result = (digest[:16], type_name, message, frames)
+    if len(_fingerprints) >= MAX_CACHED_FINGERPRINTS:
+        _fingerprints.clear()
+    _fingerprints[key] = result
+    return result
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """打开数据库并确保表结构存在"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=5.0)
+    # WAL模式下查询不阻塞写入，多个进程可以共用一个数据库
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        connection.executescript(_SCHEMA)
+        connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        connection.commit()
+    return connection
+
+
+class ErrorRecorder:
+    """错误指纹记录器，调用线程合并计数，后台线程批量写入数据库"""
+
+    def __init__(self, path: str = "logs/errors.db", flush_interval: float = 2.0,
+                 max_pending: int = 256, frames: int = 3, redaction=None):
+        """
+        初始化错误指纹记录器
+
+        Args:
+            path: 数据库文件路径
+            flush_interval: 后台线程写入间隔（秒）
+            max_pending: 内存中待写入的不同指纹数量达到该值时提前写入
+            frames: 参与指纹计算的最内层帧数
+            redaction: 脱敏过滤器（LogFilters.RedactionFilter），样例堆栈和消息写入前用它处理
+        """
+        self.path = os.path.abspath(path)
+        self.flush_interval = flush_interval
+        self.max_pending = max(1, int(max_pending))
+        self.frames = max(0, int(frames))
+        self.redaction = redaction
+
+        # 指纹 -> 待写入的行（列顺序同_COLUMNS）
+        self._pending: Dict[str, list] = {}
+        # 本进程中已经格式化过样例堆栈的指纹
+        self._sampled = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+
+        # 统计计数器
+        self._recorded = 0
+        self._rows_written = 0
+        self._batches = 0
+        self._write_errors = 0
+        self._write_time = 0.0
+
+        # 先在调用线程中打开一次数据库，路径不可用时立即报错
+        _connect(self.path).close()
+        self._thread = threading.Thread(target=self._writer_loop, name="CCTB-ErrorStore", daemon=True)
+        self._thread.start()
+
+    def set_redaction(self, redaction):
+        """
+        设置脱敏过滤器
+
+        Args:
+            redaction: 脱敏过滤器，None表示不脱敏
+        """
+        self.redaction = redaction
+
+    def _redact(self, text: Optional[str]) -> Optional[str]:
+        redaction = self.redaction
+        if redaction is None or not text:
+            return text
+        return redaction.redact(text)[0]
+
+    def record(self, error: BaseException, error_code: Optional[str] = None, site: Optional[str] = None):
+        """
+        记录一次异常（只在内存中合并，由后台线程写入）
+
+        Args:
+            error: 异常对象
+            error_code: 错误代码
+            site: 捕获异常的调用点
+        """
+        now = time.time()
+        digest, type_name, message, frames = fingerprint(error, self.frames)
+        code = error_code or getattr(error, "error_code", None)
+
+        with self._lock:
+            first = digest not in self._sampled
+            if first:
+                self._sampled.add(digest)
+        sample = None
+        if first:
+            # 在锁外格式化，只有认领到该指纹的线程会执行
+            sample = self._redact("".join(traceback.format_exception(error.__class__, error, error.__traceback__)))
+
+        with self._lock:
+            self._recorded += 1
+            row = self._pending.get(digest)
+            if row is None:
+                self._pending[digest] = [
+                    digest, type_name, error_category(error.__class__), self._redact(message), "\n".join(frames),
+                    site, code, now, now, 1, sample
+                ]
+                if len(self._pending) >= self.max_pending:
+                    self._wake.set()
+            else:
+                row[5] = site
+                if code:
+                    row[6] = code
+                row[8] = now
+                row[9] += 1
+                if sample is not None:
+                    row[10] = sample
+
+    def _take_pending(self) -> List[list]:
+        with self._lock:
+            rows = list(self._pending.values())
+            self._pending = {}
+        return rows
+
+    def _write(self, connection: sqlite3.Connection, rows: List[list]):
+        """在一个事务中写入一批指纹"""
+        start = time.perf_counter()
+        try:
+            with connection:
+                connection.executemany(_UPSERT, rows)
+            self._rows_written += len(rows)
+            self._batches += 1
+        except sqlite3.Error as e:
+            self._write_errors += 1
+            if self._stopping:
+                # 关闭时日志管线已经停止
+                print(f"ERROR: Failed to write error fingerprints: {e}", file=sys.stderr)
+            else:
+                _logger.error(f"Failed to write error fingerprints: {e}")
+        self._write_time += time.perf_counter() - start
+
+    def _writer_loop(self):
+        """后台写入循环"""
+        connection = _connect(self.path)
+        try:
+            while True:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                rows = self._take_pending()
+                if rows:
+                    self._write(connection, rows)
+                if self._stopping:
+                    return
+        finally:
+            connection.close()
+
+    def flush(self, timeout: float = 5.0):
+        """
+        立即写入内存中的指纹（在调用线程中写入，不等待后台线程）
+
+        Args:
+            timeout: 数据库忙时的等待时间（秒）
+        """
+        rows = self._take_pending()
+        if not rows:
+            return
+        connection = sqlite3.connect(self.path, timeout=timeout)
+        try:
+            self._write(connection, rows)
+        finally:
+            connection.close()
+
+    def close(self, timeout: float = 5.0):
+        """停止后台线程并写入剩余的指纹"""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout)
+        self.flush(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取记录器统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "path": self.path,
+            "recorded": self._recorded,
+            "pending": pending,
+            "fingerprints_seen": len(self._sampled),
+            "rows_written": self._rows_written,
+            "batches": self._batches,
+            "write_errors": self._write_errors,
+            "write_time_ms": self._write_time * 1000
+        }
+
+
+class ErrorStore:
+    """错误指纹数据库的查询接口"""
+
+    def __init__(self, path: str = "logs/errors.db"):
+        """
+        初始化查询接口
+
+        Args:
+            path: 数据库文件路径
+        """
+        self.path = os.path.abspath(path)
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        connection = _connect(self.path)
+        try:
+            connection.row_factory = sqlite3.Row
+            return [dict(row) for row in connection.execute(sql, params)]
+        finally:
+            connection.close()
+
+    def top(self, limit: int = 10, since: Optional[float] = None, by: str = "count") -> List[Dict[str, Any]]:
+        """
+        列出出现次数最多（或最近出现）的错误
+
+        Args:
+            limit: 最多返回的条数
+            since: 只包含最近出现时间不早于该时间戳的错误
+            by: 排序方式，count（次数）或last（最近出现时间）
+
+        Returns:
+            错误列表（不含样例堆栈）
+        """
+        order = "last_seen DESC" if by == "last" else "count DESC"
+        columns = ", ".join(column for column in _COLUMNS if column != "traceback")
+        if since is None:
+            return self._query(f"SELECT {columns} FROM errors ORDER BY {order} LIMIT ?", (limit,))
+        return self._query(f"SELECT {columns} FROM errors WHERE last_seen >= ? ORDER BY {order} LIMIT ?",
+                           (since, limit))
+
+    def get(self, prefix: str) -> List[Dict[str, Any]]:
+        """
+        按指纹前缀查询错误的完整信息（含样例堆栈）
+
+        Args:
+            prefix: 指纹或指纹前缀
+
+        Returns:
+            匹配的错误列表
+        """
+        return self._query("SELECT * FROM errors WHERE fingerprint LIKE ? ORDER BY count DESC", (prefix + "%",))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取数据库概况
+
+        Returns:
+            指纹数量、总次数和时间范围
+        """
+        rows = self._query("SELECT count(*) AS fingerprints, sum(count) AS occurrences, "
+                           "min(first_seen) AS first, max(last_seen) AS last FROM errors")
+        summary = rows[0] if rows else {"fingerprints": 0, "occurrences": 0, "first": None, "last": None}
+        return {
+            "path": self.path,
+            "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "fingerprints": summary["fingerprints"],
+            "occurrences": summary["occurrences"] or 0,
+            "first": datetime.fromtimestamp(summary["first"]).isoformat() if summary["first"] else None,
+            "last": datetime.fromtimestamp(summary["last"]).isoformat() if summary["last"] else None
+        }
+
+
+def create_error_recorder(db_config: Optional[Dict[str, Any]] = None, redaction=None) -> Optional[ErrorRecorder]:
+    """
+    根据配置创建错误指纹记录器
+
+    Args:
+        db_config: 错误数据库配置（logging.json中的error_db节）
+        redaction: 脱敏过滤器，样例堆栈和消息写入前用它处理
+
+    Returns:
+        错误指纹记录器，未启用时返回None
+    """
+    db_config = db_config or {}
+    if not db_config.get("enabled", False):
+        return None
+    return ErrorRecorder(
+        db_config.get("path", "logs/errors.db"),
+        flush_interval=db_config.get("flush_interval", 2.0),
+        max_pending=db_config.get("max_pending", 256),
+        frames=db_config.get("frames", 3),
+        redaction=redaction
+    )
+
+
+def _stamp(value: Optional[float]) -> str:
+    return datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S") if value else "-"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.impl.ErrorStore", description="CCTB error fingerprint database")
+    parser.add_argument("--db", default="logs/errors.db", help="database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    top = commands.add_parser("top", help="list the most frequent errors")
+    top.add_argument("--limit", type=int, default=10, help="number of errors")
+    top.add_argument("--since", type=parse_time, help="only errors seen after this time, e.g. 10:00")
+    top.add_argument("--by", choices=("count", "last"), default="count", help="sort by count or last seen")
+    top.add_argument("--json", action="store_true", help="print JSON")
+
+    show = commands.add_parser("show", help="show one error with its sample traceback")
+    show.add_argument("fingerprint", help="fingerprint or prefix")
+
+    commands.add_parser("stats", help="show database summary")
+
+    args = parser.parse_args(argv)
+    store = ErrorStore(args.db)
+
+    if args.command == "stats":
+        print(json.dumps(store.stats(), indent=2, ensure_ascii=False))
+        return 0
+
+    started = time.perf_counter()
+    if args.command == "top":
+        rows = store.top(args.limit, args.since, args.by)
+        if args.json:
+            print(json.dumps(rows, indent=2, ensure_ascii=False))
+        else:
+            for row in rows:
+                code = f" [{row['error_code']}]" if row["error_code"] else ""
+                print(f"{row['count']:>8}  {row['fingerprint']}  {_stamp(row['last_seen'])}  {row['exc_type']}{code}: {row['message']}")
+                print(f"{'':>10}{row['site'] or '-'}  first {_stamp(row['first_seen'])}")
+    else:
+        rows = store.get(args.fingerprint)
+        for row in rows:
+            print(f"fingerprint: {row['fingerprint']}")
+            print(f"type:        {row['exc_type']} ({row['category'] or 'not a CCTB error'})")
+            print(f"error code:  {row['error_code'] or '-'}")
+            print(f"message:     {row['message']}")
+            print(f"site:        {row['site'] or '-'}")
+            print(f"count:       {row['count']}  first {_stamp(row['first_seen'])}  last {_stamp(row['last_seen'])}")
+            print(f"frames:      {' <- '.join(reversed(row['frames'].splitlines())) if row['frames'] else '-'}")
+            print(row["traceback"] or "(no sample traceback)")
+    print(f"-- {len(rows)} errors in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,16 @@
 """
 时间获取模块
 用于获取当前日期和时间信息
+结果缓存到下一个整秒（日期缓存到零点），同一秒内的多次调用不再重复格式化
 """
 
 import datetime
 from utils.impl.ErrorHandler import handle_exception, SystemError
+from utils.impl.Memoize import memoize, until_next_second, until_midnight
 
 
 @handle_exception(SystemError, default_return="1970-01-01", error_message="Failed to get current date")
+@memoize(ttl=until_midnight, maxsize=1)
 def getdate():
     """
     获取当前日期
@@ -25,6 +28,7 @@ def getdate():
 
 
 @handle_exception(SystemError, default_return="00:00:00", error_message="Failed to get current time")
+@memoize(ttl=until_next_second, maxsize=1)
 def gettime():
     """
     获取当前时间
@@ -42,6 +46,7 @@ def gettime():
 
 
 @handle_exception(SystemError, default_return="1970-01-01 00:00:00", error_message="Failed to get current date and time")
+@memoize(ttl=until_next_second, maxsize=1)
 def getdatetime():
     """
     获取当前日期和时间
@@ -0,0 +1,483 @@
+"""
+文本日志分析工具
+分析FileFormatter输出的日志（[HH:MM:SS INF] 消息 / [HH:MM:SS WRN] * 消息 / [HH:MM:SS ERR] * 消息），
+包括logs/latest.log以及归档目录中的历史日志（含.gz）：
+- summary: 按分钟统计各级别的数量、出现最多的消息（数字归一化后）和错误突发
+- tail: 用mmap从文件末尾反向查找最后N行，不需要读取整个文件
+- follow: 类似tail -f持续输出新写入的行，检测到轮转后自动重新打开
+
+日志行只有时分秒，日期由文件的结束时间确定：归档文件取文件名中的轮转时间（latest-20240101-120000.log），
+其他文件取修改时间；文件内时间倒退超过1小时视为跨过午夜，从文件末尾的日期往前推算每条记录的日期
+
+文件按块读取（默认8MB），每块只做几次以"\n["开头的正则findall，计数全部交给Counter在C中完成，
+内存占用与文件大小无关
+
+命令行用法（在项目根目录）：
+python -m utils.impl.LogAnalyzer summary
+python -m utils.impl.LogAnalyzer tail -n 50 --level ERR
+python -m utils.impl.LogAnalyzer follow
+"""
+import os
+import re
+import sys
+import gzip
+import glob
+import mmap
+import time
+import argparse
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, IO, Iterator, List, Optional, Tuple
+
+# 行格式：[HH:MM:SS LVL] 消息，WRN和ERR的消息前面还有"* "
+# 以下模式都以换行符开头（块前面补一个换行符），正则引擎可以直接按字面量前缀查找，比re.M的^快一倍以上
+LINE_PATTERN = re.compile(rb"\n\[(\d\d:\d\d:\d\d) ([A-Z]+)\] (?:\* )?([^\n]*)")
+# (HH:MM, 级别)
+MINUTE_PATTERN = re.compile(rb"\n\[(\d\d:\d\d):\d\d ([A-Z]+)\]")
+# 数字已被替换为#的块中的(级别, 消息)
+MESSAGE_PATTERN = re.compile(rb"\n\[##:##:## ([A-Z]+)\] (?:\* )?([^\n]*)")
+# 错误行的HH:MM:SS
+ERROR_PATTERN = re.compile(rb"\n\[(\d\d:\d\d:\d\d) (?:ERR|CRITICAL)\]")
+# (HH:MM:SS, 级别)，用于单行匹配
+STAMP_PATTERN = re.compile(rb"\n\[(\d\d:\d\d:\d\d) ([A-Z]+)\]")
+# 归档文件名中的轮转时间
+ARCHIVE_STAMP_PATTERN = re.compile(r"-(\d{8}-\d{6})(?:-\d+)?\.log(?:\.gz)?$")
+LEVELS = (b"DBG", b"INF", b"WRN", b"ERR")
+ERROR_LEVELS = (b"ERR", b"CRITICAL")
+
+CHUNK_SIZE = 8 * 1024 * 1024
+# 归一化消息时把数字替换为#，如"Sent to 192.168.1.5"和"Sent to 192.168.10.6"视为同一条消息
+_DIGITS_TO_HASH = bytes.maketrans(b"0123456789", b"##########")
+# 连续的#再合并为一个（只对每块中不同的消息做一次）
+_HASH_RUN = re.compile(rb"#{2,}")
+
+
+def discover_files(log_file: str = "logs/latest.log", archive_dir: Optional[str] = "logs/archive") -> List[str]:
+    """
+    按时间顺序列出日志文件：归档目录中的历史日志、旧式编号备份，最后是当前日志
+
+    Args:
+        log_file: 当前日志文件
+        archive_dir: 归档目录，None表示不包含归档
+
+    Returns:
+        文件路径列表（从旧到新）
+    """
+    files = []
+    stem = os.path.splitext(os.path.basename(log_file))[0]
+    if archive_dir and os.path.isdir(archive_dir):
+        archived = glob.glob(os.path.join(archive_dir, f"{stem}-*.log")) + \
+                   glob.glob(os.path.join(archive_dir, f"{stem}-*.log.gz"))
+        # 归档文件名中的时间戳按字典序即为时间顺序
+        files.extend(sorted(archived, key=lambda path: os.path.basename(path).replace(".gz", "")))
+
+    backups = []
+    for path in glob.glob(log_file + ".*"):
+        suffix = path[len(log_file) + 1:]
+        if suffix.isdigit():
+            backups.append((int(suffix), path))
+    files.extend(path for _, path in sorted(backups, reverse=True))
+
+    if os.path.exists(log_file):
+        files.append(log_file)
+    return files
+
+
+def file_end_time(path: str) -> datetime:
+    """
+    获取日志文件中最后一条记录大致的时间：归档文件取文件名中的轮转时间，其他文件取修改时间
+
+    Args:
+        path: 日志文件路径
+
+    Returns:
+        结束时间
+    """
+    match = ARCHIVE_STAMP_PATTERN.search(os.path.basename(path))
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d-%H%M%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(path))
+
+
+def _open(path: str) -> IO[bytes]:
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def iter_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """按块读取文件，每块都在换行处截断，跨块的行拼接到下一块"""
+    with _open(path) as f:
+        remainder = b""
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            data = remainder + data
+            cut = data.rfind(b"\n")
+            if cut == -1:
+                remainder = data
+                continue
+            remainder = data[cut + 1:]
+            yield data[:cut + 1]
+        if remainder:
+            yield remainder
+
+
+def _last_stamp(data: bytes) -> bytes:
+    """块中最后一条记录的时间（跳过末尾的堆栈跟踪等非记录行）"""
+    end = len(data)
+    while end > 0:
+        start = data.rfind(b"\n[", 0, end)
+        if start == -1:
+            break
+        match = STAMP_PATTERN.match(data, start)
+        if match:
+            return match.group(1)
+        end = start
+    return b"00:00:00"
+
+
+def _seconds(stamp: bytes) -> int:
+    return int(stamp[0:2]) * 3600 + int(stamp[3:5]) * 60 + int(stamp[6:8])
+
+
+class LogSummary:
+    """流式统计：每块只做一次findall，计数用Counter在C中累加"""
+
+    def __init__(self, top_capacity: int = 1000):
+        """
+        初始化统计
+
+        Args:
+            top_capacity: 消息计数表的容量上限，不同消息超过上限时只保留计数最多的部分（计数为近似值）
+        """
+        self.top_capacity = top_capacity
+        self.lines = 0
+        self.records = 0
+        self.files: List[str] = []
+        # (日期序号, "HH:MM", 级别) -> 数量，日期序号为date.toordinal()
+        self.per_minute: Counter = Counter()
+        # (级别, 归一化消息) -> 数量
+        self.messages: Counter = Counter()
+        self.truncated = False
+        # (日期序号, "HH:MM:SS") -> 错误数量
+        self.error_seconds: Counter = Counter()
+        # 当前文件内跨过午夜的次数和最后一条记录的时间（秒）
+        self._day = 0
+        self._last_seconds = None
+
+    def add_file(self, path: str, chunk_size: int = CHUNK_SIZE, end: Optional[datetime] = None):
+        """
+        统计一个文件
+
+        Args:
+            path: 日志文件路径
+            chunk_size: 每次读取的字节数
+            end: 文件中最后一条记录大致的时间，默认由file_end_time()确定
+        """
+        self.files.append(path)
+        end = end or file_end_time(path)
+        self._day = 0
+        self._last_seconds = None
+        # 文件内先按相对天序号统计，读完后才知道跨过了几次午夜，再换算为日期
+        per_minute, error_seconds = self.per_minute, self.error_seconds
+        self.per_minute, self.error_seconds = Counter(), Counter()
+        try:
+            for chunk in iter_chunks(path, chunk_size):
+                self.add_chunk(chunk)
+        finally:
+            file_minutes, file_errors = self.per_minute, self.error_seconds
+            self.per_minute, self.error_seconds = per_minute, error_seconds
+
+        last_date = end.date()
+        if self._last_seconds is not None and self._last_seconds > end.hour * 3600 + end.minute * 60 + end.second:
+            # 最后一条记录的时刻晚于结束时间，说明它在结束时间的前一天（如午夜刚过时轮转）
+            last_date -= timedelta(days=1)
+        base = last_date.toordinal() - self._day
+        for (day, minute, level), count in file_minutes.items():
+            self.per_minute[(base + day, minute, level)] += count
+        for (day, stamp), count in file_errors.items():
+            self.error_seconds[(base + day, stamp)] += count
+
+    def add_chunk(self, chunk: bytes):
+        """统计一块完整的行（由add_file()调用，天序号是相对文件开头的）"""
+        data = b"\n" + chunk
+        self.lines += chunk.count(b"\n")
+        first_match = STAMP_PATTERN.search(data)
+        if first_match is None:
+            return
+
+        first = _seconds(first_match.group(1))
+        last = _seconds(_last_stamp(data))
+        if (self._last_seconds is not None and first < self._last_seconds - 3600) or last < first - 3600:
+            # 日志跨过午夜：逐行确定天序号（极少发生）
+            self._add_wrapped(LINE_PATTERN.findall(data))
+            return
+
+        day = self._day
+        self._last_seconds = last
+        minutes = Counter(MINUTE_PATTERN.findall(data))
+        for (minute, level), count in minutes.items():
+            self.per_minute[(day, minute, level)] += count
+            self.records += count
+        messages = self.messages
+        for (level, message), count in Counter(MESSAGE_PATTERN.findall(data.translate(_DIGITS_TO_HASH))).items():
+            key = (level, _HASH_RUN.sub(b"#", message))
+            messages[key] = messages.get(key, 0) + count
+        for stamp, count in Counter(ERROR_PATTERN.findall(data)).items():
+            self.error_seconds[(day, stamp)] += count
+        self._bound_messages()
+
+    def _add_wrapped(self, matches: List[Tuple[bytes, bytes, bytes]]):
+        self.records += len(matches)
+        for stamp, level, message in matches:
+            seconds = _seconds(stamp)
+            if self._last_seconds is not None and seconds < self._last_seconds - 3600:
+                self._day += 1
+            self._last_seconds = seconds
+            self.per_minute[(self._day, stamp[:5], level)] += 1
+            self.messages[(level, _HASH_RUN.sub(b"#", message.translate(_DIGITS_TO_HASH)))] += 1
+            if level in ERROR_LEVELS:
+                self.error_seconds[(self._day, stamp)] += 1
+        self._bound_messages()
+
+    def _bound_messages(self):
+        """不同消息数量超过上限时只保留计数最多的部分，保证内存有界"""
+        if len(self.messages) > self.top_capacity * 2:
+            self.messages = Counter(dict(self.messages.most_common(self.top_capacity)))
+            self.truncated = True
+
+    def minute_rows(self) -> List[Tuple[str, Dict[bytes, int]]]:
+        """按时间顺序返回每分钟各级别的数量"""
+        rows: Dict[Tuple[int, bytes], Dict[bytes, int]] = {}
+        for (day, minute, level), count in self.per_minute.items():
+            rows.setdefault((day, minute), {})[level] = count
+        result = []
+        for (day, minute), counts in sorted(rows.items()):
+            result.append((f"{date.fromordinal(day).isoformat()} {minute.decode()}", counts))
+        return result
+
+    def top_messages(self, count: int = 10, level: Optional[bytes] = None) -> List[Tuple[int, str, str]]:
+        """出现最多的消息（数字已归一化为#）"""
+        items = self.messages.items() if level is None else \
+            ((key, value) for key, value in self.messages.items() if key[0] == level)
+        ranked = sorted(items, key=lambda item: item[1], reverse=True)[:count]
+        return [(value, key[0].decode(errors="replace"), key[1].decode("utf-8", errors="replace").rstrip("\r"))
+                for key, value in ranked]
+
+    def bursts(self, window: int = 10, threshold: int = 20) -> List[Tuple[str, str, int]]:
+        """
+        查找错误突发：任意window秒内错误数达到threshold的时间段（相邻的时间段会合并）
+
+        Returns:
+            [(开始时间, 结束时间, 错误数)]
+        """
+        points = sorted((day * 86400 + _seconds(stamp), count) for (day, stamp), count in self.error_seconds.items())
+        bursts = []
+        left = 0
+        in_window = 0
+        current = None
+        for right in range(len(points)):
+            in_window += points[right][1]
+            while points[right][0] - points[left][0] >= window:
+                in_window -= points[left][1]
+                left += 1
+            if in_window >= threshold:
+                start, end = points[left][0], points[right][0]
+                if current is not None and start <= current[1] + window:
+                    current[1] = end
+                else:
+                    if current is not None:
+                        bursts.append(current)
+                    current = [start, end, 0]
+        if current is not None:
+            bursts.append(current)
+
+        # 用前缀和统计每个突发时间段内的错误总数
+        seconds = [second for second, _ in points]
+        prefix = [0]
+        for _, count in points:
+            prefix.append(prefix[-1] + count)
+        result = []
+        for start, end, _ in bursts:
+            total = prefix[bisect_right(seconds, end)] - prefix[bisect_left(seconds, start)]
+            result.append((_format_seconds(start), _format_seconds(end), total))
+        return result
+
+
+def _format_seconds(value: int) -> str:
+    day, seconds = divmod(value, 86400)
+    return f"{date.fromordinal(day).isoformat()} {seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _level_of(line: bytes) -> Optional[bytes]:
+    match = STAMP_PATTERN.match(b"\n" + line)
+    return match.group(2) if match else None
+
+
+def tail_lines(path: str, count: int, level: Optional[bytes] = None) -> List[bytes]:
+    """
+    用mmap从文件末尾反向查找最后count行（指定级别时只统计该级别的行）
+
+    Args:
+        path: 日志文件路径（不支持.gz）
+        count: 行数
+        level: 级别标签，如b"ERR"
+
+    Returns:
+        行列表（从旧到新，不含换行符）
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or count <= 0:
+            return []
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as data:
+            lines = []
+            end = size
+            if data[end - 1:end] == b"\n":
+                end -= 1
+            while end > 0 and len(lines) < count:
+                start = data.rfind(b"\n", 0, end) + 1
+                line = data[start:end]
+                if level is None or _level_of(line) == level:
+                    lines.append(line.rstrip(b"\r"))
+                end = start - 1
+            lines.reverse()
+            return lines
+
+
+def follow(path: str, level: Optional[bytes] = None, interval: float = 0.5,
+           output: IO[bytes] = None, from_start: bool = False, stop_after: Optional[float] = None):
+    """
+    持续输出新写入的行（类似tail -f），文件被轮转或截断后从新文件开头继续
+
+    Args:
+        path: 日志文件路径
+        level: 只输出该级别的行
+        interval: 轮询间隔（秒）
+        output: 输出流，默认标准输出
+        from_start: 是否从文件开头开始
+        stop_after: 运行指定秒数后返回（None表示一直运行）
+    """
+    output = output or sys.stdout.buffer
+    deadline = time.monotonic() + stop_after if stop_after is not None else None
+    f = None
+    identity = None
+    remainder = b""
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            if f is None:
+                try:
+                    f = open(path, "rb")
+                except FileNotFoundError:
+                    time.sleep(interval)
+                    continue
+                stat = os.fstat(f.fileno())
+                identity = (stat.st_dev, stat.st_ino)
+                if not from_start:
+                    f.seek(0, os.SEEK_END)
+                from_start = True  # 轮转后的新文件从头读取
+                remainder = b""
+
+            data = f.read(CHUNK_SIZE)
+            if data:
+                data = remainder + data
+                cut = data.rfind(b"\n")
+                if cut == -1:
+                    remainder = data
+                    continue
+                remainder = data[cut + 1:]
+                for line in data[:cut].split(b"\n"):
+                    if level is None or _level_of(line) == level:
+                        output.write(line.rstrip(b"\r") + b"\n")
+                output.flush()
+                continue
+
+            # 没有新数据：检查文件是否被轮转（改名或截断）
+            try:
+                stat = os.stat(path)
+                rotated = (stat.st_dev, stat.st_ino) != identity or stat.st_size < f.tell()
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                f.close()
+                f = None
+                continue
+            time.sleep(interval)
+    finally:
+        if f is not None:
+            f.close()
+
+
+def print_summary(summary: LogSummary, top: int, window: int, threshold: int, elapsed: float):
+    """输出统计结果"""
+    print(f"Files: {len(summary.files)}  Lines: {summary.lines:,}  Records: {summary.records:,}  ({elapsed:.2f}s)")
+    for path in summary.files:
+        print(f"  {path}")
+
+    print("\nPer-minute rates:")
+    print(f"{'minute':<18}" + "".join(f"{level.decode():>8}" for level in LEVELS) + f"{'other':>8}")
+    for label, counts in summary.minute_rows():
+        other = sum(count for level, count in counts.items() if level not in LEVELS)
+        print(f"{label:<18}" + "".join(f"{counts.get(level, 0):>8}" for level in LEVELS) + f"{other:>8}")
+
+    print(f"\nTop {top} messages" + (" (approximate)" if summary.truncated else "") + ":")
+    for count, level, message in summary.top_messages(top):
+        print(f"{count:>10}  {level}  {message[:160]}")
+
+    bursts = summary.bursts(window, threshold)
+    print(f"\nError bursts (>= {threshold} errors within {window}s): {len(bursts)}")
+    for start, end, total in bursts:
+        print(f"  {start} - {end}  {total} errors")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.impl.LogAnalyzer", description="CCTB text log analyzer")
+    parser.add_argument("--log", default="logs/latest.log", help="current log file")
+    parser.add_argument("--archive", default="logs/archive", help="archive directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = commands.add_parser("summary", help="per-minute rates, top messages and error bursts")
+    summary_parser.add_argument("files", nargs="*", help="log files (default: archives + current log)")
+    summary_parser.add_argument("--no-archives", action="store_true", help="only analyze the current log")
+    summary_parser.add_argument("--top", type=int, default=10, help="number of top messages")
+    summary_parser.add_argument("--burst-window", type=int, default=10, help="burst window in seconds")
+    summary_parser.add_argument("--burst-threshold", type=int, default=20, help="errors per window to count as a burst")
+
+    tail_parser = commands.add_parser("tail", help="print the last N lines")
+    tail_parser.add_argument("-n", type=int, default=20, help="number of lines")
+    tail_parser.add_argument("--level", help="only lines of this level tag (DBG/INF/WRN/ERR)")
+
+    follow_parser = commands.add_parser("follow", help="follow the log like tail -f")
+    follow_parser.add_argument("--level", help="only lines of this level tag (DBG/INF/WRN/ERR)")
+    follow_parser.add_argument("--interval", type=float, default=0.5, help="poll interval in seconds")
+
+    args = parser.parse_args(argv)
+    level = args.level.upper().encode() if getattr(args, "level", None) else None
+
+    try:
+        if args.command == "summary":
+            files = args.files or discover_files(args.log, None if args.no_archives else args.archive)
+            if not files:
+                print(f"No log files found for {args.log}")
+                return 1
+            started = time.perf_counter()
+            summary = LogSummary()
+            for path in files:
+                summary.add_file(path)
+            print_summary(summary, args.top, args.burst_window, args.burst_threshold, time.perf_counter() - started)
+        elif args.command == "tail":
+            for line in tail_lines(args.log, args.n, level):
+                sys.stdout.buffer.write(line + b"\n")
+        elif args.command == "follow":
+            follow(args.log, level, args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,476 @@
+"""
+日志过滤器
+挂在CCTB日志分发管线上的过滤阶段，每条记录在分发给各个输出处理器之前只经过一次：
+- DedupFilter: 把时间窗口内重复的相同消息合并为一行"... repeated N times"
+- RateLimitFilter: 按级别和记录器名称的令牌桶限流
+- RedactionFilter: 按logging.json中filters节的配置脱敏敏感数据
+"""
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+
+class DedupFilter(logging.Filter):
+    """重复消息合并过滤器"""
+
+    def __init__(self, emit: Callable[[logging.LogRecord], None], window: float = 5.0, max_keys: int = 1024):
+        """
+        初始化重复消息合并过滤器
+
+        Args:
+            emit: 输出合并摘要记录的函数（绕过过滤器直接写出）
+            window: 合并窗口（秒），窗口内的相同消息只输出第一条
+            max_keys: 同时跟踪的不同消息数量上限
+        """
+        super().__init__()
+        self.emit = emit
+        self.window = window
+        self.max_keys = max_keys
+        # 摘要绕过管线上的过滤器直接输出，由这里脱敏
+        self.redaction = None
+        self._lock = threading.Lock()
+        # key -> [窗口开始时间, 被合并的次数, 第一条记录]
+        self._entries: "OrderedDict[Tuple, list]" = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self._suppressed = 0
+        self._summaries = 0
+
+    @staticmethod
+    def _key(record: logging.LogRecord) -> Optional[Tuple]:
+        """生成记录的比较键，直接比较消息模板和参数，不需要格式化消息"""
+        key = (record.name, record.levelno, record.msg, record.args)
+        try:
+            hash(key)
+        except TypeError:
+            # 参数不可哈希（如字典参数）时退化为比较repr
+            try:
+                key = (record.name, record.levelno, str(record.msg), repr(record.args))
+            except Exception:
+                return None
+        return key
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        now = time.monotonic()
+        key = self._key(record)
+        if key is None:
+            return True
+
+        summaries = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.window:
+                entry[1] += 1
+                self._suppressed += 1
+                return False
+
+            sample = self._sample(record)
+            if entry is not None:
+                # 窗口已过期：先输出上一窗口的合并摘要，再开始新窗口
+                if entry[1]:
+                    summaries.append((entry[2], entry[1]))
+                entry[0], entry[1], entry[2] = now, 0, sample
+                self._entries.move_to_end(key)
+            else:
+                self._entries[key] = [now, 0, sample]
+                if len(self._entries) > self.max_keys:
+                    _, (_, count, sample) = self._entries.popitem(last=False)
+                    if count:
+                        summaries.append((sample, count))
+
+            if now - self._last_sweep >= self.window:
+                summaries.extend(self._sweep(now))
+
+        for sample, count in summaries:
+            self._emit_summary(sample, count)
+        return True
+
+    @staticmethod
+    def _sample(record: logging.LogRecord) -> logging.LogRecord:
+        """
+        生成保存在窗口中的样本记录，只用于之后生成合并摘要；
+        带异常信息的记录保存一份去掉exc_info的副本，避免traceback和栈帧在窗口内一直存活
+        """
+        if not record.exc_info:
+            return record
+        sample = logging.makeLogRecord(record.__dict__)
+        sample.exc_info = None
+        return sample
+
+    def set_redaction(self, redaction):
+        """
+        设置脱敏过滤器
+        样本可能没有经过脱敏（带异常信息的记录保存的是副本，第一条记录也可能在脱敏之前被限流丢弃），
+        合并摘要绕过过滤器输出，因此输出前在这里脱敏
+
+        Args:
+            redaction: 脱敏过滤器，None表示不脱敏
+        """
+        self.redaction = redaction
+
+    def sweep(self):
+        """输出已过期窗口的合并摘要（由调度器定时调用，不依赖后续记录触发）"""
+        with self._lock:
+            summaries = self._sweep(time.monotonic())
+        for sample, count in summaries:
+            self._emit_summary(sample, count)
+
+    def _sweep(self, now: float):
+        """清理已过期的窗口并收集需要输出的合并摘要（调用时已持有锁）"""
+        self._last_sweep = now
+        expired = [key for key, entry in self._entries.items() if now - entry[0] >= self.window]
+        summaries = []
+        for key in expired:
+            _, count, sample = self._entries.pop(key)
+            if count:
+                summaries.append((sample, count))
+        return summaries
+
+    def _emit_summary(self, sample: logging.LogRecord, count: int):
+        """输出一条合并摘要记录"""
+        summary = logging.makeLogRecord(sample.__dict__)
+        message = f"{sample.getMessage()} ... repeated {count} times"
+        redaction = self.redaction
+        if redaction is not None:
+            message = redaction.redact(message)[0]
+        summary.msg = message
+        summary.args = None
+        summary.exc_info = None
+        summary.exc_text = None
+        summary.created = time.time()
+        summary.__dict__.pop("file_output", None)
+        with self._lock:
+            self._summaries += 1
+        self.emit(summary)
+
+    def flush(self):
+        """输出所有尚未输出的合并摘要"""
+        with self._lock:
+            summaries = self._sweep(float("inf"))
+        for sample, count in summaries:
+            self._emit_summary(sample, count)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "window": self.window,
+                "tracked": len(self._entries),
+                "suppressed": self._suppressed,
+                "summaries": self._summaries
+            }
+
+
+class TokenBucket:
+    """令牌桶"""
+
+    __slots__ = ("rate", "burst", "tokens", "last")
+
+    def __init__(self, rate: float, burst: float):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量（允许的突发数量）
+        """
+        self.rate = float(rate)
+        self.burst = float(max(burst, 1))
+        self.tokens = self.burst
+        self.last = time.monotonic()
+
+    def take(self, now: float) -> bool:
+        """尝试取出一个令牌，成功返回True"""
+        elapsed = now - self.last
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.last = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class RateLimitFilter(logging.Filter):
+    """按级别和记录器名称限流的过滤器，记录需要同时通过两类令牌桶"""
+
+    def __init__(self, levels: Optional[Dict[str, Dict[str, float]]] = None,
+                 loggers: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        初始化限流过滤器
+
+        Args:
+            levels: 按级别的限流配置，如{"DEBUG": {"rate": 200, "burst": 400}}
+            loggers: 按记录器名称的限流配置，子记录器使用最近一级已配置父记录器的限额（各自独立计数）
+        """
+        super().__init__()
+        self._lock = threading.Lock()
+        self._level_buckets: Dict[int, TokenBucket] = {}
+        for level_name, limit in (levels or {}).items():
+            levelno = logging.getLevelName(str(level_name).upper())
+            if isinstance(levelno, int):
+                self._level_buckets[levelno] = TokenBucket(limit.get("rate", 100), limit.get("burst", 100))
+        self._logger_limits = dict(loggers or {})
+        # 记录器名称 -> 令牌桶（没有限额时为None），按名称缓存
+        self._logger_buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._suppressed_by_level: Dict[str, int] = {}
+        self._suppressed_by_logger: Dict[str, int] = {}
+        self._suppressed = 0
+
+    def _logger_bucket(self, name: str) -> Optional[TokenBucket]:
+        """获取记录器对应的令牌桶（调用时已持有锁）"""
+        try:
+            return self._logger_buckets[name]
+        except KeyError:
+            pass
+        bucket = None
+        current = name
+        while current:
+            limit = self._logger_limits.get(current)
+            if limit is not None:
+                bucket = TokenBucket(limit.get("rate", 100), limit.get("burst", 100))
+                break
+            current = current.rpartition(".")[0]
+        self._logger_buckets[name] = bucket
+        return bucket
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._level_buckets.get(record.levelno)
+            if bucket is not None and not bucket.take(now):
+                self._count(record)
+                return False
+            if self._logger_limits:
+                bucket = self._logger_bucket(record.name)
+                if bucket is not None and not bucket.take(now):
+                    self._count(record)
+                    return False
+        return True
+
+    def _count(self, record: logging.LogRecord):
+        """记录一次限流（调用时已持有锁）"""
+        self._suppressed += 1
+        self._suppressed_by_level[record.levelname] = self._suppressed_by_level.get(record.levelname, 0) + 1
+        self._suppressed_by_logger[record.name] = self._suppressed_by_logger.get(record.name, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "suppressed": self._suppressed,
+                "suppressed_by_level": dict(self._suppressed_by_level),
+                "suppressed_by_logger": dict(self._suppressed_by_logger)
+            }
+
+
+class RedactionFilter(logging.Filter):
+    """
+    敏感数据脱敏过滤器
+    所有配置的规则合并为一个预编译的正则表达式，每条记录只扫描一次；
+    规则全部由字面量组成时先做不区分大小写的子串检查，不可能命中的记录直接跳过正则，
+    需要扫描时在小写副本上使用区分大小写的正则（比IGNORECASE快一个数量级），再按位置替换原文
+    """
+
+    # value模式下敏感键后面的值：到空白、引号或常见分隔符为止
+    VALUE_PATTERN = r"""[^\s"',;&]+"""
+
+    def __init__(self, rules: List[Tuple[str, str, str]]):
+        """
+        初始化脱敏过滤器
+
+        Args:
+            rules: 规则列表，每条规则为(正则表达式, 替换文本, 模式)
+                   模式为"value"时正则匹配敏感键名，替换键名后面的值（如password=xxx）；
+                   为"match"时替换正则匹配到的全部内容
+        """
+        super().__init__()
+        self._replacements: Dict[str, Tuple[str, str]] = {}
+        literals = []
+        for index, (pattern, replacement, mode) in enumerate(rules):
+            self._replacements[f"r{index}"] = (mode, replacement)
+            literals.append(self._literal_alternatives(pattern))
+
+        self._regex = re.compile(self._build_pattern(rules), re.IGNORECASE)
+        # 任一规则不是纯字面量时无法预过滤，只能每条都走不区分大小写的正则
+        self._literals: Optional[Tuple[str, ...]] = None
+        self._lower_regex = None
+        if all(item is not None for item in literals):
+            self._literals = tuple(sorted({literal for item in literals for literal in item}))
+            lowered_rules = [(pattern.lower(), replacement, mode) for pattern, replacement, mode in rules]
+            self._lower_regex = re.compile(self._build_pattern(lowered_rules))
+
+        # 统计计数器（只在管线线程中累加，不加锁）
+        self._checked = 0
+        self._prefiltered = 0
+        self._redacted = 0
+        self._replaced = 0
+
+    @classmethod
+    def _build_pattern(cls, rules: List[Tuple[str, str, str]]) -> str:
+        """把所有规则合并为一个带命名分组的正则表达式，分组名r0、r1...对应规则序号"""
+        branches = []
+        for index, (pattern, _, mode) in enumerate(rules):
+            group = f"r{index}"
+            if mode == "value":
+                branches.append(f"(?P<{group}>(?:{pattern})\\w*[\"']?\\s*[:=]\\s*[\"']?){cls.VALUE_PATTERN}")
+            else:
+                branches.append(f"(?P<{group}>{pattern})")
+        return "|".join(branches)
+
+    @staticmethod
+    def _literal_alternatives(pattern: str) -> Optional[Tuple[str, ...]]:
+        """把形如a|b|c的纯字面量规则拆成小写字面量，含有正则元字符时返回None"""
+        alternatives = pattern.split("|")
+        if not all(alternatives) or any(re.escape(item) != item for item in alternatives):
+            return None
+        return tuple(item.lower() for item in alternatives)
+
+    def _replace(self, match: "re.Match") -> str:
+        mode, replacement = self._replacements[match.lastgroup]
+        if mode == "value":
+            return match.group(match.lastgroup) + replacement
+        return replacement
+
+    def _redact_lowered(self, message: str, lowered: str) -> Tuple[str, int]:
+        """在小写副本上查找匹配，按相同位置替换原文（两者长度相同时才可使用）"""
+        pieces = []
+        last = 0
+        count = 0
+        for match in self._lower_regex.finditer(lowered):
+            group = match.lastgroup
+            mode, replacement = self._replacements[group]
+            start, end = match.span()
+            pieces.append(message[last:start])
+            if mode == "value":
+                pieces.append(message[start:match.end(group)])
+            pieces.append(replacement)
+            last = end
+            count += 1
+        if not count:
+            return message, 0
+        pieces.append(message[last:])
+        return "".join(pieces), count
+
+    def redact(self, message: str) -> Tuple[str, int]:
+        """
+        脱敏一段文本
+
+        Args:
+            message: 原始文本
+
+        Returns:
+            (脱敏后的文本, 替换次数)
+        """
+        if self._literals is None:
+            return self._regex.subn(self._replace, message)
+
+        # 预过滤：消息中不含任何字面量时不可能命中
+        lowered = message.lower()
+        for literal in self._literals:
+            if literal in lowered:
+                break
+        else:
+            self._prefiltered += 1
+            return message, 0
+
+        if len(lowered) != len(message):
+            # 少数Unicode字符小写后长度会变化，位置无法对应，退回不区分大小写的正则
+            return self._regex.subn(self._replace, message)
+        return self._redact_lowered(message, lowered)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        try:
+            message = record.getMessage()
+        except Exception:
+            # 格式化失败交给处理器报告
+            return True
+
+        self._checked += 1
+        redacted, count = self.redact(message)
+        if count:
+            # 直接替换为脱敏后的完整消息，管线之后的处理器都只能看到脱敏结果；
+            # 环形缓冲不经过管线（被闸门、合并或限流挡下的记录根本不会到这里），导出时自行脱敏
+            record.msg = redacted
+            record.args = None
+            self._redacted += 1
+            self._replaced += count
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "prefilter": self._literals is not None,
+            "checked": self._checked,
+            "prefiltered": self._prefiltered,
+            "redacted": self._redacted,
+            "replacements": self._replaced
+        }
+
+
+def create_redaction_filter(filters_config: Optional[Dict[str, Any]] = None) -> Optional[RedactionFilter]:
+    """
+    根据logging.json中的filters节创建脱敏过滤器
+
+    Args:
+        filters_config: 过滤器配置，如{"sensitive_data": {"pattern": "...", "replacement": "...", "mode": "value"}}
+
+    Returns:
+        脱敏过滤器，没有有效规则时返回None
+    """
+    rules = []
+    for name, rule in (filters_config or {}).items():
+        if not isinstance(rule, Mapping) or not rule.get("pattern") or not rule.get("enabled", True):
+            continue
+        pattern = rule["pattern"]
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            print(f"ERROR: Invalid redaction pattern for filter {name}: {e}")
+            continue
+        mode = rule.get("mode", "value")
+        if mode not in ("value", "match"):
+            mode = "value"
+        rules.append((pattern, rule.get("replacement", "***REDACTED***"), mode))
+    return RedactionFilter(rules) if rules else None
+
+
+def install_filters(pipeline, dedup_config: Optional[Dict[str, Any]] = None,
+                    rate_limit_config: Optional[Dict[str, Any]] = None,
+                    redaction_config: Optional[Dict[str, Any]] = None) -> Dict[str, logging.Filter]:
+    """
+    根据配置在分发管线上安装过滤器
+
+    Args:
+        pipeline: 分发管线（FanoutHandler）
+        dedup_config: 重复消息合并配置（logging.json中的dedup节）
+        rate_limit_config: 限流配置（logging.json中的rate_limits节）
+        redaction_config: 脱敏规则配置（logging.json中的filters节）
+
+    Returns:
+        名称到过滤器的字典
+    """
+    installed = {}
+    dedup_config = dedup_config or {}
+    rate_limit_config = rate_limit_config or {}
+
+    # 先合并重复消息，被合并的记录不消耗限流令牌
+    if dedup_config.get("enabled", False):
+        dedup = DedupFilter(pipeline.emit, dedup_config.get("window", 5.0), dedup_config.get("max_keys", 1024))
+        pipeline.addFilter(dedup)
+        installed["dedup"] = dedup
+
+    if rate_limit_config.get("enabled", False):
+        rate_limit = RateLimitFilter(rate_limit_config.get("levels", {}), rate_limit_config.get("loggers", {}))
+        pipeline.addFilter(rate_limit)
+        installed["rate_limit"] = rate_limit
+
+    # 脱敏放在最后，被合并或限流丢弃的记录不需要格式化和扫描
+    redaction = create_redaction_filter(redaction_config)
+    if redaction is not None:
+        pipeline.addFilter(redaction)
+        installed["redaction"] = redaction
+        if "dedup" in installed:
+            installed["dedup"].set_redaction(redaction)
+
+    return installed
@@ -0,0 +1,177 @@
+"""
+预编译日志格式化器
+在初始化时为每个日志级别生成好前缀模板，时间戳取自record.created并按秒缓存，
+控制台输出和文件输出在一次格式化中同时生成（文件输出保存在record.file_output中）
+
+与旧版格式化器的输出有两处不同，其余逐字节相同：
+- 带异常信息的记录会在消息后附加堆栈（旧版直接丢弃exc_info，handle_exception的采样堆栈需要它）
+- 时间戳是记录创建的时间而不是格式化的时间（异步模式下两者可能相差一个写入批次）
+"""
+import time
+import logging
+from typing import Dict, Tuple
+from colorama import Fore, Style, Back
+
+
+class TimestampCache:
+    """按秒缓存的时间戳渲染器，同一秒内的记录复用同一个字符串"""
+
+    def __init__(self, fmt: str = "%H:%M:%S"):
+        """
+        初始化时间戳缓存
+
+        Args:
+            fmt: time.strftime格式
+        """
+        self.fmt = fmt
+        # (秒, 渲染结果) 作为一个整体替换，多线程读取时不会读到不一致的组合
+        self._cached: Tuple[int, str] = (-1, "")
+
+    def render(self, created: float) -> str:
+        """
+        渲染时间戳
+
+        Args:
+            created: 时间戳（秒），通常为record.created
+
+        Returns:
+            格式化后的时间字符串
+        """
+        second = int(created)
+        cached = self._cached
+        if cached[0] == second:
+            return cached[1]
+        text = time.strftime(self.fmt, time.localtime(second))
+        self._cached = (second, text)
+        return text
+
+
+# 各级别的显示样式：(标签, 控制台标签部分, 文件分隔符)
+_LEVEL_STYLES = {
+    logging.DEBUG: (
+        "DBG",
+        f"{Style.BRIGHT}{Fore.LIGHTCYAN_EX} DBG{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}",
+        "] "
+    ),
+    logging.INFO: (
+        "INF",
+        f"{Style.BRIGHT}{Fore.LIGHTWHITE_EX} INF{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}",
+        "] "
+    ),
+    logging.WARNING: (
+        "WRN",
+        f"{Style.BRIGHT}{Fore.LIGHTYELLOW_EX} WRN{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}* ",
+        "] * "
+    ),
+    logging.ERROR: (
+        "ERR",
+        f" {Back.RED}{Style.BRIGHT}{Fore.LIGHTWHITE_EX}ERR{Back.RESET}{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}* ",
+        "] * "
+    ),
+}
+
+_CONSOLE_HEAD = f"{Fore.LIGHTBLACK_EX}[{Fore.WHITE}"
+
+
+class LevelTemplates:
+    """
+    预编译的级别前缀模板
+    每个级别的模板只在初始化（或第一次遇到未知级别）时构建一次，
+    每个级别还缓存了当前秒的完整前缀
+    """
+
+    def __init__(self, timestamps: TimestampCache = None):
+        """
+        初始化级别模板
+
+        Args:
+            timestamps: 时间戳缓存，默认使用"%H:%M:%S"格式
+        """
+        self.timestamps = timestamps or TimestampCache()
+        # levelno -> (控制台时间戳之后的部分, 文件时间戳之后的部分)
+        self._templates: Dict[int, Tuple[str, str]] = {}
+        # levelno -> (秒, 控制台前缀, 文件前缀)
+        self._prefixes: Dict[int, Tuple[int, str, str]] = {}
+        for levelno in _LEVEL_STYLES:
+            self._compile(levelno, logging.getLevelName(levelno))
+
+    def _compile(self, levelno: int, levelname: str) -> Tuple[str, str]:
+        """构建指定级别的模板"""
+        style = _LEVEL_STYLES.get(levelno)
+        if style is not None:
+            label, console_tail, file_sep = style
+            template = (console_tail, f" {label}{file_sep}")
+        else:
+            # 其他级别（如CRITICAL）使用级别名称
+            template = (
+                f"{Style.BRIGHT}{Fore.LIGHTMAGENTA_EX} {levelname}{Fore.RESET}{Fore.LIGHTBLACK_EX}] {Fore.LIGHTWHITE_EX}",
+                f" {levelname}] "
+            )
+        self._templates[levelno] = template
+        return template
+
+    def prefixes(self, record: logging.LogRecord) -> Tuple[int, str, str]:
+        """
+        获取记录对应的控制台前缀和文件前缀
+
+        Args:
+            record: 日志记录
+
+        Returns:
+            (秒, 控制台前缀, 文件前缀)
+        """
+        levelno = record.levelno
+        second = int(record.created)
+        entry = self._prefixes.get(levelno)
+        if entry is not None and entry[0] == second:
+            return entry
+
+        template = self._templates.get(levelno)
+        if template is None:
+            template = self._compile(levelno, record.levelname)
+        current_time = self.timestamps.render(record.created)
+        entry = (second, _CONSOLE_HEAD + current_time + template[0], "[" + current_time + template[1])
+        self._prefixes[levelno] = entry
+        return entry
+
+
+def _record_text(formatter: logging.Formatter, record: logging.LogRecord) -> str:
+    """获取记录的消息文本，如有异常信息则附加在后面（旧版格式化器没有这一步）"""
+    message = record.getMessage()
+    if record.exc_info and not record.exc_text:
+        record.exc_text = formatter.formatException(record.exc_info)
+    if record.exc_text:
+        message = message + "\n" + record.exc_text
+    return message
+
+
+class ColoredFormatter(logging.Formatter):
+    """彩色日志格式化器 - Codexus样式，同时生成文件输出并保存到record.file_output"""
+
+    def __init__(self, templates: LevelTemplates = None):
+        super().__init__("%(message)s")
+        self.templates = templates or LevelTemplates()
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = _record_text(self, record)
+        _, console_prefix, file_prefix = self.templates.prefixes(record)
+        # 将文件输出保存到记录的属性中，以便文件处理器直接使用
+        record.file_output = file_prefix + message
+        return console_prefix + message
+
+
+class FileFormatter(logging.Formatter):
+    """文件日志格式化器 - Codexus样式（无颜色），优先复用ColoredFormatter已生成的文件输出"""
+
+    def __init__(self, templates: LevelTemplates = None):
+        super().__init__("%(message)s")
+        self.templates = templates or LevelTemplates()
+
+    def format(self, record: logging.LogRecord) -> str:
+        file_output = getattr(record, "file_output", None)
+        if file_output is not None:
+            return file_output
+        message = _record_text(self, record)
+        file_output = self.templates.prefixes(record)[2] + message
+        record.file_output = file_output
+        return file_output
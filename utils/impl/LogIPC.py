@@ -0,0 +1,657 @@
+"""
+多进程共享日志文件
+main.py提权重启或直接运行CommandUI.py时，多个进程会同时写logs/latest.log。
+启用multiprocess后，第一个占用本地端口的进程成为属主（owner），独占文件输出和轮转；
+其他进程作为客户端，把格式化好的行按批通过本地TCP连接发给属主写入，属主写入后逐批确认。
+属主不存在或连接断开时，客户端退回到锁文件协议：在跨进程锁内以追加模式写入整批数据，
+并定期重新连接，属主退出后由客户端接管属主身份（不再做会话轮转）
+
+- 鉴权：属主每次取得身份时生成随机令牌，写入只有当前用户可读的令牌文件；客户端连接后先发送令牌，
+  令牌不符的连接直接断开，本机其他用户的进程无法向日志中写入内容
+- 去重：每个客户端有随机ID，批次带递增序号。已经完整发出但没有收到确认的批次不会立即改写到本地，
+  而是保留下来，重新连上属主后用原序号重发，属主按(客户端ID, 序号)丢弃已经写入过的批次；
+  只有连不上任何属主（原属主已退出）时才把它写入本地
+- 发送在后台线程中进行，emit()只把行放入批次，不会因为属主卡住而阻塞调用方
+"""
+import os
+import hmac
+import socket
+import struct
+import threading
+import time
+import logging
+from typing import Dict, Any, Optional, Tuple
+from utils.impl.LogSink import create_file_sink
+from utils.impl.LogRotation import create_rotator
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# 帧头：数据长度、包含的记录数、批次序号（网络字节序）
+FRAME_HEADER = struct.Struct("!IIQ")
+# 属主写入一批数据后回复的确认字节
+ACK = b"\x06"
+# 连接后客户端先发送的握手：会话令牌和客户端ID
+TOKEN_SIZE = 16
+CLIENT_ID_SIZE = 16
+HELLO_SIZE = TOKEN_SIZE + CLIENT_ID_SIZE
+
+
+class InterProcessLock:
+    """基于锁文件的跨进程互斥锁（Windows使用msvcrt.locking，其他系统使用fcntl.flock）"""
+
+    def __init__(self, path: str):
+        """
+        初始化跨进程锁
+
+        Args:
+            path: 锁文件路径
+        """
+        self.path = os.path.abspath(path)
+        # 同一进程内的线程先在这里排队，文件锁只负责进程之间的互斥
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        try:
+            if self._file is None:
+                lock_dir = os.path.dirname(self.path)
+                if lock_dir and not os.path.exists(lock_dir):
+                    os.makedirs(lock_dir, exist_ok=True)
+                self._file = open(self.path, "a+b")
+            if msvcrt is not None:
+                self._file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK重试约10秒后仍拿不到锁会抛异常，继续等待
+                        continue
+            elif fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            if msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            elif fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+
+    def close(self):
+        with self._thread_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def bind_owner_socket(host: str, port: int) -> Optional[socket.socket]:
+    """
+    尝试占用属主端口，端口已被占用时返回None
+
+    Args:
+        host: 监听地址（只应使用本机地址）
+        port: 监听端口
+
+    Returns:
+        监听中的套接字，或None
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        if hasattr(socket, "SO_EXCLUSIVEADDRUSE"):
+            # Windows上的SO_REUSEADDR允许抢占端口，改用独占模式
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        else:
+            # 其他系统上允许复用TIME_WAIT状态的端口，但仍不能与正在监听的套接字共存
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(16)
+        return sock
+    except OSError:
+        sock.close()
+        return None
+
+
+def write_token(path: str) -> bytes:
+    """
+    生成新的会话令牌并写入令牌文件（只有当前用户可读写）
+
+    Args:
+        path: 令牌文件路径
+
+    Returns:
+        令牌
+    """
+    token = os.urandom(TOKEN_SIZE)
+    temp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token.hex())
+    os.replace(temp, path)
+    return token
+
+
+def read_token(path: str) -> Optional[bytes]:
+    """读取令牌文件，文件不存在或内容无效时返回None"""
+    try:
+        with open(path, "r") as f:
+            token = bytes.fromhex(f.read().strip())
+    except (OSError, ValueError):
+        return None
+    return token if len(token) == TOKEN_SIZE else None
+
+
+def _recv_exact(conn: socket.socket, size: int) -> Optional[bytes]:
+    """读取指定长度的数据，连接关闭时返回None"""
+    chunks = []
+    while size:
+        chunk = conn.recv(min(size, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class LogSinkServer:
+    """属主进程中的接收服务：每个客户端一个线程，收到的批次直接写入文件处理器"""
+
+    def __init__(self, server_socket: socket.socket, sink, token: bytes, encoding: str = "utf-8"):
+        """
+        初始化接收服务
+
+        Args:
+            server_socket: 已经在监听的套接字
+            sink: 批量文件处理器（BatchingFileHandler）
+            token: 会话令牌，握手时令牌不符的连接会被断开
+            encoding: 客户端发送数据使用的编码
+        """
+        self._socket = server_socket
+        self._sink = sink
+        self._token = token
+        self._encoding = encoding
+        self._stopping = threading.Event()
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._accept_thread = None
+        # 客户端ID -> 已写入的最大批次序号（跨连接保留，客户端重连后重发的批次据此去重）
+        self._applied: Dict[bytes, int] = {}
+
+        self.connections_total = 0
+        self.connections_rejected = 0
+        self.batches_received = 0
+        self.records_received = 0
+        self.duplicates_dropped = 0
+        self.frames_dropped = 0
+
+    def start(self):
+        self._accept_thread = threading.Thread(target=self._accept_loop, name="CCTB-LogSinkServer", daemon=True)
+        self._accept_thread.start()
+
+    def _accept_loop(self):
+        # 带超时的accept，关闭监听套接字不一定能唤醒阻塞中的accept
+        self._socket.settimeout(0.5)
+        while not self._stopping.is_set():
+            try:
+                conn, _ = self._socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            with self._lock:
+                self._connections.add(conn)
+                self.connections_total += 1
+            threading.Thread(target=self._serve, args=(conn,), name="CCTB-LogSinkConn", daemon=True).start()
+
+    def _handshake(self, conn: socket.socket) -> Optional[bytes]:
+        """校验客户端发送的令牌，通过时回复确认并返回客户端ID"""
+        conn.settimeout(5.0)
+        hello = _recv_exact(conn, HELLO_SIZE)
+        if hello is None or not hmac.compare_digest(hello[:TOKEN_SIZE], self._token):
+            with self._lock:
+                self.connections_rejected += 1
+            return None
+        conn.sendall(ACK)
+        return hello[TOKEN_SIZE:]
+
+    def _serve(self, conn: socket.socket):
+        """读取一个客户端的帧直到连接关闭；停止时在帧边界断开，未确认的批次由客户端重发或改走锁文件"""
+        try:
+            client_id = self._handshake(conn)
+            while client_id is not None and not self._stopping.is_set():
+                # 只在等待下一帧时允许超时，以便及时响应停止
+                conn.settimeout(0.5)
+                try:
+                    first = conn.recv(FRAME_HEADER.size)
+                except socket.timeout:
+                    continue
+                if not first:
+                    break
+                conn.settimeout(5.0)
+                header = first
+                if len(first) < FRAME_HEADER.size:
+                    rest = _recv_exact(conn, FRAME_HEADER.size - len(first))
+                    header = first + rest if rest is not None else None
+                payload = None
+                if header is not None:
+                    length, records, sequence = FRAME_HEADER.unpack(header)
+                    payload = _recv_exact(conn, length)
+                if payload is None:
+                    # 连接在帧中间断开，客户端没有发出完整的帧，会改写到锁文件，这里丢弃残帧
+                    self.frames_dropped += 1
+                    break
+                with self._lock:
+                    duplicate = sequence <= self._applied.get(client_id, 0)
+                    if not duplicate:
+                        self._applied[client_id] = sequence
+                if duplicate:
+                    # 上次写入后确认没有送达，客户端重发了同一批次
+                    self.duplicates_dropped += 1
+                else:
+                    self._sink.write_text(payload.decode(self._encoding, errors="replace"), records=records)
+                    self.batches_received += 1
+                    self.records_received += records
+                conn.sendall(ACK)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    def stop(self, timeout: float = 6.0):
+        """停止接收新连接，等待所有连接在帧边界断开"""
+        self._stopping.set()
+        if self._accept_thread is not None:
+            self._accept_thread.join(timeout=2.0)
+        try:
+            self._socket.close()
+        except OSError:
+            pass
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._connections:
+                    break
+            time.sleep(0.05)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = len(self._connections)
+        return {
+            "active_connections": active,
+            "connections_total": self.connections_total,
+            "connections_rejected": self.connections_rejected,
+            "batches_received": self.batches_received,
+            "records_received": self.records_received,
+            "duplicates_dropped": self.duplicates_dropped,
+            "frames_dropped": self.frames_dropped
+        }
+
+
+class SharedFileHandler(logging.Handler):
+    """多进程共享的文件处理器，按当前身份在属主写入、发送给属主、锁文件追加三种方式之间切换"""
+
+    ROLE_OWNER = "owner"
+    ROLE_CLIENT = "client"
+    ROLE_FALLBACK = "fallback"
+
+    def __init__(self, filename: str, sink_config: Optional[Dict[str, Any]] = None,
+                 ipc_config: Optional[Dict[str, Any]] = None, rotation_config: Optional[Dict[str, Any]] = None,
+                 max_bytes: int = 0, backup_count: int = 0, encoding: str = "utf-8"):
+        """
+        初始化共享文件处理器，能占用端口时成为属主（并执行会话轮转），否则作为客户端
+
+        Args:
+            filename: 日志文件路径
+            sink_config: 批量写入配置（logging.json中的file_sink节）
+            ipc_config: 多进程配置（logging.json中的multiprocess节）
+            rotation_config: 轮转配置（logging.json中的rotation节）
+            max_bytes: 单个文件最大字节数
+            backup_count: 保留的备份文件数量
+            encoding: 文件编码
+        """
+        super().__init__()
+        ipc_config = ipc_config or {}
+        self.baseFilename = os.path.abspath(filename)
+        self.encoding = encoding
+        self.host = ipc_config.get("host", "127.0.0.1")
+        self.port = int(ipc_config.get("port", 47391))
+        self.batch_size = max(1, int(ipc_config.get("batch_size", 32 * 1024)))
+        self.flush_interval = float(ipc_config.get("flush_interval", 0.2))
+        self.reconnect_interval = float(ipc_config.get("reconnect_interval", 2.0))
+        self.send_timeout = float(ipc_config.get("send_timeout", 2.0))
+        self.token_file = ipc_config.get("token_file") or self.baseFilename + ".token"
+        self._sink_config = sink_config or {}
+        self._rotation_config = rotation_config or {}
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+
+        self.process_lock = InterProcessLock(ipc_config.get("lock_file") or self.baseFilename + ".lock")
+        flush_level = logging.getLevelName(str(self._sink_config.get("flush_level", "ERROR")).upper())
+        self.flush_level = flush_level if isinstance(flush_level, int) else logging.ERROR
+
+        self.role = self.ROLE_CLIENT
+        self._sink = None
+        self._server = None
+        self._conn: Optional[socket.socket] = None
+        self._client_id = os.urandom(CLIENT_ID_SIZE)
+        self._sequence = 0
+        # 已经完整发出但没有收到确认的批次：(序号, 数据, 记录数)
+        self._unconfirmed: Optional[Tuple[int, bytes, int]] = None
+        # 批次由emit()在处理器锁内追加；连接、身份切换和发送由_send_lock串行化，发送时不持有处理器锁
+        self._batch = []
+        self._batch_chars = 0
+        self._batch_records = 0
+        self._send_lock = threading.Lock()
+        self._next_reconnect = 0.0
+        self._wakeup = threading.Event()
+        self._closed_event = threading.Event()
+
+        self.batches_sent = 0
+        self.records_sent = 0
+        self.batches_resent = 0
+        self.fallback_batches = 0
+        self.fallback_records = 0
+        self.reconnects = 0
+        self.promotions = 0
+
+        server_socket = bind_owner_socket(self.host, self.port)
+        if server_socket is not None:
+            self._become_owner(server_socket, start_session=True)
+        elif not self._connect():
+            self.role = self.ROLE_FALLBACK
+
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="CCTB-SharedLogFlusher", daemon=True)
+        self._flush_thread.start()
+
+    def _become_owner(self, server_socket: socket.socket, start_session: bool):
+        """成为属主：生成会话令牌，创建文件处理器和接收服务（调用时已持有_send_lock或尚未发布）"""
+        rotator = create_rotator(self._rotation_config, self._max_bytes, self._backup_count)
+        with self.process_lock:
+            if start_session:
+                # 只有第一个属主做会话轮转，接管的属主继续写同一个文件
+                rotator.start_session(self.baseFilename)
+            token = write_token(self.token_file)
+        self._sink = create_file_sink(self.baseFilename, self._sink_config, rotator=rotator)
+        self._sink.process_lock = self.process_lock
+        self._server = LogSinkServer(server_socket, self._sink, token, self.encoding)
+        self._server.start()
+        self.role = self.ROLE_OWNER
+
+    def _connect(self) -> bool:
+        """连接属主并完成令牌握手，成功返回True"""
+        token = read_token(self.token_file)
+        if token is None:
+            return False
+        try:
+            conn = socket.create_connection((self.host, self.port), timeout=self.send_timeout)
+        except OSError:
+            return False
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.sendall(token + self._client_id)
+            if conn.recv(1) != ACK:
+                raise ConnectionError("log owner rejected the session token")
+        except OSError:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def _disconnect(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            text = self.format(record) + "\n"
+        except Exception:
+            self.handleError(record)
+            return
+
+        try:
+            urgent = record.levelno >= self.flush_level
+            if self.role == self.ROLE_OWNER:
+                self._sink.write_text(text, urgent)
+                return
+            # 只放入批次，由后台线程发送，属主卡住时不会阻塞调用方
+            self._batch.append(text)
+            self._batch_chars += len(text)
+            self._batch_records += 1
+            if urgent or self._batch_chars >= self.batch_size:
+                self._wakeup.set()
+        except Exception:
+            self.handleError(record)
+
+    def _take_batch(self) -> Tuple[bytes, int]:
+        """取出当前批次"""
+        self.acquire()
+        try:
+            data = "".join(self._batch).encode(self.encoding, errors="replace")
+            records = self._batch_records
+            self._batch.clear()
+            self._batch_chars = 0
+            self._batch_records = 0
+            return data, records
+        finally:
+            self.release()
+
+    def _send_frame(self, sequence: int, data: bytes, records: int) -> Optional[bool]:
+        """
+        发送一批数据并等待确认（调用时已持有_send_lock）
+
+        Returns:
+            True表示已确认；False表示没有发出完整的帧（属主会丢弃残帧）；None表示已发出但没有收到确认
+        """
+        try:
+            self._conn.sendall(FRAME_HEADER.pack(len(data), records, sequence) + data)
+        except OSError:
+            self._lose_owner()
+            return False
+        try:
+            if self._conn.recv(1) != ACK:
+                raise ConnectionError("log owner closed the connection")
+        except OSError:
+            self._lose_owner()
+            return None
+        return True
+
+    def _lose_owner(self):
+        """放弃当前连接，之后的批次改走锁文件并尽快尝试恢复（调用时已持有_send_lock）"""
+        self._disconnect()
+        self.role = self.ROLE_FALLBACK
+        self._next_reconnect = 0.0
+
+    def _resend_unconfirmed(self):
+        """用原序号重发没有确认的批次，属主已经写入过时会丢弃（调用时已持有_send_lock且已连接）"""
+        sequence, data, records = self._unconfirmed
+        if self._send_frame(sequence, data, records):
+            self._unconfirmed = None
+            self.batches_resent += 1
+            self.batches_sent += 1
+            self.records_sent += records
+
+    def _send_batch(self):
+        """把缓冲的批次写入属主文件、发给属主或改用锁文件追加（调用时已持有_send_lock）"""
+        data, records = self._take_batch()
+        if self.role == self.ROLE_OWNER:
+            if data:
+                self._sink.write_text(data.decode(self.encoding, errors="replace"), records=records)
+            return
+        if self._conn is not None and self._unconfirmed is not None:
+            self._resend_unconfirmed()
+        if not data:
+            return
+
+        if self._conn is not None and self._unconfirmed is None:
+            self._sequence += 1
+            sent = self._send_frame(self._sequence, data, records)
+            if sent:
+                self.batches_sent += 1
+                self.records_sent += records
+                return
+            if sent is None:
+                # 属主可能已经写入，留到重连后按序号重发，不在本地重复写入
+                self._unconfirmed = (self._sequence, data, records)
+                return
+        self._write_locked(data, records)
+
+    def _write_locked(self, data: bytes, records: int):
+        """锁文件协议：在跨进程锁内以追加模式一次写入整批数据"""
+        with self.process_lock:
+            with open(self.baseFilename, "ab", buffering=0) as stream:
+                view = memoryview(data)
+                while view:
+                    written = stream.write(view)
+                    view = view[written:]
+        self.fallback_batches += 1
+        self.fallback_records += records
+
+    def _write_unconfirmed(self):
+        """
+        原属主已经退出时把没有确认的批次写入本地（调用时已持有_send_lock）
+        只有原属主写入了这批数据、在回复确认前退出且退出时写出了缓冲区，这里才会重复
+        """
+        if self._unconfirmed is None:
+            return
+        _, data, records = self._unconfirmed
+        self._unconfirmed = None
+        if self.role == self.ROLE_OWNER:
+            self._sink.write_text(data.decode(self.encoding, errors="replace"), records=records)
+        else:
+            self._write_locked(data, records)
+
+    def _recover(self, force: bool = False):
+        """降级状态下定期重新连接属主，连接不上时尝试接管属主身份（调用时已持有_send_lock）"""
+        now = time.monotonic()
+        if not force and now < self._next_reconnect:
+            return
+        self._next_reconnect = now + self.reconnect_interval
+        server_socket = bind_owner_socket(self.host, self.port)
+        if server_socket is not None:
+            # 原属主已经退出：先按顺序写出没有确认的批次和当前批次，再接管
+            self._write_unconfirmed()
+            self._send_batch()
+            self._become_owner(server_socket, start_session=False)
+            self.promotions += 1
+        elif self._connect():
+            self.role = self.ROLE_CLIENT
+            self.reconnects += 1
+            self._resend_unconfirmed()
+
+    def _flush_loop(self):
+        """后台线程：每隔flush_interval或批次已满、有紧急记录时发出批次，降级时尝试恢复"""
+        while not self._closed_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._closed_event.is_set():
+                break
+            with self._send_lock:
+                try:
+                    self._send_batch()
+                    if self.role == self.ROLE_FALLBACK:
+                        self._recover()
+                except Exception:
+                    pass
+
+    def flush(self):
+        with self._send_lock:
+            self._send_batch()
+            if self.role == self.ROLE_OWNER:
+                self._sink.flush()
+
+    def close(self):
+        self._closed_event.set()
+        self._wakeup.set()
+        # 后台线程可能正在等待属主确认
+        self._flush_thread.join(timeout=self.send_timeout + 1.0)
+        with self._send_lock:
+            self._send_batch()
+            if self._unconfirmed is not None:
+                # 最后一次重连重发，仍然失败时写入本地，宁可重复也不丢失
+                if self.role == self.ROLE_FALLBACK:
+                    self._recover(force=True)
+                if self._unconfirmed is not None:
+                    self._disconnect()
+                    self._write_unconfirmed()
+            if self.role == self.ROLE_OWNER:
+                # 先等所有连接在帧边界断开，再关闭文件
+                self._server.stop()
+                self._sink.close()
+            else:
+                self._disconnect()
+            self.process_lock.close()
+        super().close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取共享写入统计信息
+
+        Returns:
+            统计信息字典，属主额外包含文件写入和接收服务的统计
+        """
+        with self._send_lock:
+            stats = {
+                "path": self.baseFilename,
+                "role": self.role,
+                "port": self.port,
+                "batches_sent": self.batches_sent,
+                "records_sent": self.records_sent,
+                "batches_resent": self.batches_resent,
+                "unconfirmed_records": self._unconfirmed[2] if self._unconfirmed else 0,
+                "fallback_batches": self.fallback_batches,
+                "fallback_records": self.fallback_records,
+                "reconnects": self.reconnects,
+                "promotions": self.promotions
+            }
+            if self.role == self.ROLE_OWNER:
+                stats["sink"] = self._sink.get_stats()
+                stats["server"] = self._server.get_stats()
+            return stats
+
+
+def create_shared_file_sink(file_path: str, ipc_config: Dict[str, Any], sink_config: Optional[Dict[str, Any]] = None,
+                            rotation_config: Optional[Dict[str, Any]] = None, max_bytes: int = 0,
+                            backup_count: int = 0) -> SharedFileHandler:
+    """
+    根据配置创建多进程共享的文件处理器
+
+    Args:
+        file_path: 日志文件路径
+        ipc_config: 多进程配置（logging.json中的multiprocess节）
+        sink_config: 批量写入配置（logging.json中的file_sink节）
+        rotation_config: 轮转配置（logging.json中的rotation节）
+        max_bytes: 单个文件最大字节数
+        backup_count: 保留的备份文件数量
+
+    Returns:
+        共享文件处理器
+    """
+    return SharedFileHandler(file_path, sink_config, ipc_config, rotation_config, max_bytes, backup_count)
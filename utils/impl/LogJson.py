@@ -0,0 +1,175 @@
+"""
+结构化JSON日志编码器
+每条记录输出为一行JSON（JSONL）：静态字段在初始化时预先序列化，时间戳按秒缓存，
+所有字段的原始值由一次attrgetter调用取出；安装了orjson时用它一次性序列化，
+否则按预先写好字段名的模板拼接（字符串使用C实现的encode_basestring）
+"""
+import json
+import logging
+from json.encoder import encode_basestring
+from operator import attrgetter
+from typing import Dict, Any, Callable, List, Optional
+from utils.impl.LogFormatter import TimestampCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# 默认输出的字段
+DEFAULT_FIELDS = ["timestamp", "level", "logger", "message", "module", "function", "line"]
+
+
+def _stdlib_dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _orjson_dumps(value: Any) -> str:
+    return orjson.dumps(value, default=str).decode("utf-8")
+
+
+def get_backend() -> str:
+    """当前使用的JSON序列化后端名称"""
+    return "orjson" if orjson is not None else "json"
+
+
+# 通用值的序列化函数（用于静态字段和非字符串、非整数的字段值）
+dumps: Callable[[Any], str] = _orjson_dumps if orjson is not None else _stdlib_dumps
+
+
+class JsonFormatter(logging.Formatter):
+    """JSONL格式化器"""
+
+    # 支持的字段：字段名 -> 记录属性名（timestamp和message需要单独渲染）
+    FIELD_ATTRS = {
+        "timestamp": "created",
+        "level": "levelname",
+        "logger": "name",
+        "message": "msg",
+        "module": "module",
+        "function": "funcName",
+        "line": "lineno",
+        "thread": "threadName",
+        "process": "process",
+        "file": "pathname"
+    }
+
+    def __init__(self, fields: Optional[List[str]] = None, datefmt: str = "%Y-%m-%dT%H:%M:%S",
+                 static_fields: Optional[Dict[str, Any]] = None):
+        """
+        初始化JSON格式化器
+
+        Args:
+            fields: 输出的字段列表，可选timestamp、level、logger、message、module、function、
+                    line、thread、process、file，未知字段会被忽略
+            datefmt: 时间戳格式（秒级部分），后面会追加微秒
+            static_fields: 每条记录都带上的固定字段，如{"app": "CCTB"}
+        """
+        super().__init__()
+        self.fields = tuple(name for name in (DEFAULT_FIELDS if fields is None else fields) if name in self.FIELD_ATTRS)
+        self._timestamps = TimestampCache(datefmt)
+        # 一次C调用取出所有字段的原始值（只有一个字段时attrgetter不返回元组，需要包一层）
+        self._getter = attrgetter(*(self.FIELD_ATTRS[name] for name in self.fields)) if self.fields else None
+        if len(self.fields) == 1:
+            single = self._getter
+            self._getter = lambda record: (single(record),)
+        self._has_timestamp = "timestamp" in self.fields
+        self._has_message = "message" in self.fields
+        self._message_index = self.fields.index("message") if self._has_message else -1
+        self._timestamp_index = self.fields.index("timestamp") if self._has_timestamp else -1
+
+        # 静态字段预先序列化为 {"app":"CCTB", 这样的前缀
+        self._static = ",".join(f"{encode_basestring(str(key))}:{dumps(value)}"
+                                for key, value in (static_fields or {}).items())
+        self._head = "{" + self._static + ("," if self._static and self.fields else "")
+
+        # 标准库后端：字段名预先写入模板，每条记录只需编码字段值再做一次%格式化；
+        # 每个字段按类型选好C实现的编码函数，timestamp和message之后会被覆盖，用id占位（不会抛异常）；
+        # 整数字段用int.__repr__而不是str，值为None（如logging.logProcesses为False时的process）时抛TypeError，
+        # 改为逐个按实际类型编码输出null
+        self._value_encoders = tuple(
+            id if name in ("timestamp", "message") else int.__repr__ if name in ("line", "process") else encode_basestring
+            for name in self.fields
+        )
+        self._template = self._head + ",".join(f"{encode_basestring(name)}:%s" for name in self.fields) + "%s}"
+        self._exception_key = ('"exception":' if self._template == "{%s}" else ',"exception":')
+
+    def _render_timestamp(self, created: float) -> str:
+        """渲染ISO 8601时间戳（秒级部分按秒缓存，追加微秒）"""
+        return f"{self._timestamps.render(created)}.{int((created - int(created)) * 1000000):06d}"
+
+    def _encode_value(self, value: Any) -> str:
+        """编码单个字段值"""
+        if value.__class__ is str:
+            return encode_basestring(value)
+        if value.__class__ is int:
+            return str(value)
+        return dumps(value)
+
+    def _exception_text(self, record: logging.LogRecord) -> Optional[str]:
+        """获取（并缓存）记录的异常文本"""
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        return record.exc_text
+
+    def _format_orjson(self, record: logging.LogRecord) -> str:
+        """orjson后端：构造字典后一次性序列化"""
+        entry = dict(zip(self.fields, self._getter(record))) if self.fields else {}
+        if self._has_timestamp:
+            entry["timestamp"] = self._render_timestamp(record.created)
+        if self._has_message:
+            entry["message"] = record.getMessage()
+        exception = self._exception_text(record)
+        if exception:
+            entry["exception"] = exception
+        text = orjson.dumps(entry, default=str).decode("utf-8")
+        if not self._static:
+            return text
+        # 拼接预先序列化的静态字段
+        return "{" + self._static + "," + text[1:] if entry else "{" + self._static + "}"
+
+    def _format_stdlib(self, record: logging.LogRecord) -> str:
+        """标准库后端：按预先生成的模板拼接"""
+        if self.fields:
+            values = self._getter(record)
+            try:
+                encoded = [encode(value) for encode, value in zip(self._value_encoders, values)]
+            except TypeError:
+                # 字段值不是预期的类型（如funcName为None）时逐个按实际类型编码
+                encoded = [self._encode_value(value) for value in values]
+            if self._has_timestamp:
+                encoded[self._timestamp_index] = '"' + self._render_timestamp(record.created) + '"'
+            if self._has_message:
+                encoded[self._message_index] = encode_basestring(record.getMessage())
+        else:
+            encoded = []
+        exception = self._exception_text(record)
+        if exception:
+            encoded.append(self._exception_key + encode_basestring(exception))
+        else:
+            encoded.append("")
+        return self._template % tuple(encoded)
+
+    def format(self, record: logging.LogRecord) -> str:
+        if orjson is not None:
+            return self._format_orjson(record)
+        return self._format_stdlib(record)
+
+
+def create_json_formatter(json_config: Optional[Dict[str, Any]] = None) -> JsonFormatter:
+    """
+    根据配置创建JSON格式化器
+
+    Args:
+        json_config: JSON格式配置（logging.json中custom_formatters的json节）
+
+    Returns:
+        JSON格式化器
+    """
+    json_config = json_config or {}
+    return JsonFormatter(
+        fields=json_config.get("fields", DEFAULT_FIELDS),
+        datefmt=json_config.get("datefmt", "%Y-%m-%dT%H:%M:%S"),
+        static_fields=json_config.get("static_fields", {})
+    )
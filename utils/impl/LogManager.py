@@ -3,8 +3,9 @@
 提供统一的日志管理接口，支持日志记录器的创建、配置和管理
 """
 
+import logging
 from typing import Dict, Optional, Union, List
-from utils.impl.AdvancedLog import CCTBLogger, LogLevel, LogFormat
+from utils.impl.AdvancedLog import CCTBLogger, LogLevel, LogFormat, ROOT_LOGGER_NAME
 from utils.impl.ConfigManager import config
 from utils.impl.ErrorHandler import handle_exception, CCTBException
 
@@ -15,7 +16,11 @@ class LogManagerError(CCTBException):
 
 
 class LogManager:
-    """日志管理器，负责管理应用程序中的所有日志记录器"""
+    """
+    日志管理器，负责管理应用程序中的所有日志记录器
+    每个名称对应一个真正的logging子记录器，所有记录器共享根记录器（CCTB）的处理器树，
+    记录器的级别由logging.json中的loggers节决定
+    """
     
     _instance = None
     _initialized = False
@@ -29,8 +34,61 @@ class LogManager:
         if not self._initialized:
             self._loggers: Dict[str, CCTBLogger] = {}
             self._default_logger = None
+            # logging.json中loggers节的级别配置，以及按名称缓存的解析结果
+            self._level_config: Dict[str, int] = {}
+            self._level_cache: Dict[str, Optional[int]] = {}
+            self._load_level_config()
+            # logging.json的loggers节热加载后重新解析所有记录器的级别
+            config.subscribe(self._on_config_change, ("loggers",))
             self._initialized = True
     
+    def _on_config_change(self, changed: frozenset, snapshot):
+        """配置变化回调：按新的loggers节重新设置已创建记录器的级别（根记录器的级别由log_level决定，不在这里修改）"""
+        self._load_level_config()
+        for logger_name, logger in list(self._loggers.items()):
+            if logger_name == ROOT_LOGGER_NAME:
+                continue
+            level = self.resolve_level(logger_name)
+            if level is not None:
+                logger._set_logger_level(level)
+    
+    def _load_level_config(self):
+        """从配置中读取各记录器的级别并清空解析缓存"""
+        level_config = {}
+        for logger_name, logger_config in config.values.loggers.items():
+            level = logging.getLevelName(str(logger_config.get("level", "INFO")).upper())
+            if isinstance(level, int):
+                level_config[logger_name] = level
+        self._level_config = level_config
+        self._level_cache = {}
+    
+    def resolve_level(self, name: str) -> Optional[int]:
+        """
+        解析指定记录器在配置中的级别（按名称缓存）
+        没有直接配置的记录器使用最近一级已配置的父记录器的级别，例如CCTB.Performance使用CCTB的级别
+        
+        Args:
+            name: 日志记录器名称
+            
+        Returns:
+            日志级别，配置中找不到时返回None
+        """
+        try:
+            return self._level_cache[name]
+        except KeyError:
+            pass
+        
+        level = None
+        current = name
+        while current:
+            if current in self._level_config:
+                level = self._level_config[current]
+                break
+            current = current.rpartition(".")[0]
+        
+        self._level_cache[name] = level
+        return level
+    
     @handle_exception(LogManagerError, default_return=None)
     def get_logger(self, name: str = "CCTB", create_if_missing: bool = True) -> Optional[CCTBLogger]:
         """
@@ -69,11 +127,11 @@ class LogManager:
         if name in self._loggers:
             return self._loggers[name]
         
-        # 创建新的日志记录器
-        logger = CCTBLogger()
-        logger._logger.name = name
+        # 获取该名称对应的日志记录器（子记录器不创建处理器，共享根记录器的处理器树）
+        logger = CCTBLogger(name)
         
-        # 设置日志级别
+        # 设置日志级别：显式指定的级别优先，否则使用配置中的级别
+        # 根记录器的级别由log_level决定，只有configure_from_config会按loggers节修改它
         if level is not None:
             if isinstance(level, str):
                 level = LogLevel[level.upper()]
@@ -81,13 +139,17 @@ class LogManager:
                 level = LogLevel(level)
             
             logger.set_level(level)
+        elif name != ROOT_LOGGER_NAME:
+            configured_level = self.resolve_level(name)
+            if configured_level is not None:
+                logger._logger.setLevel(configured_level)
         
         # 设置日志格式
         if format_type is not None:
             # 这里可以扩展为支持不同的格式类型
             pass
         
-        # 添加文件处理器
+        # 添加文件处理器（同一路径只会添加一次）
         if log_file is not None:
             logger.add_file_handler(log_file)
         
@@ -171,32 +233,42 @@ class LogManager:
         try:
             # 加载日志配置
             config.load_logging_config()
+            self._load_level_config()
             
             # 获取日志配置
-            loggers_config = config.get("loggers", {})
+            loggers_config = config.values.loggers
+            log_file = config.values.log_file
+            enable_file = config.values.enable_file
             
             # 为每个配置的日志记录器创建或更新日志记录器
             for logger_name, logger_config in loggers_config.items():
-                level = logger_config.get("level", "INFO")
                 handlers = logger_config.get("handlers", [])
                 
                 # 获取或创建日志记录器
                 logger = self.get_logger(logger_name)
                 
                 if logger:
-                    # 设置日志级别
-                    logger.set_level(level)
+                    # 只设置记录器自身的级别，共享处理器的级别不受影响
+                    level = self.resolve_level(logger_name)
+                    if level is not None:
+                        logger._set_logger_level(level)
                     
                     # 配置处理器
-                    if "console" in handlers and not config.get("enable_console", True):
+                    if "console" in handlers and not config.values.enable_console:
                         # 如果配置了控制台处理器但全局禁用了控制台，则移除
                         pass  # 这里可以扩展为移除控制台处理器
                     
-                    if "file" in handlers and config.get("enable_file", True):
-                        # 如果配置了文件处理器且启用了文件日志
-                        log_file = config.get("log_file")
-                        if log_file:
-                            logger.add_file_handler(log_file)
+                    if "file" in handlers and enable_file and log_file:
+                        # 文件处理器挂在共享的处理器树上，重复配置不会重复添加
+                        logger.add_file_handler(log_file)
+            
+            # 已存在的其他记录器按新配置重新解析级别
+            for logger_name, logger in self._loggers.items():
+                if logger_name in loggers_config or logger_name == ROOT_LOGGER_NAME:
+                    continue
+                level = self.resolve_level(logger_name)
+                if level is not None:
+                    logger._logger.setLevel(level)
             
             return True
         except Exception as e:
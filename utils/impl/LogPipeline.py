@@ -0,0 +1,337 @@
+"""
+日志分发管线
+提供统一的日志分发处理器以及基于有界队列的异步日志处理器，
+异步模式下调用线程只需固定消息文本后将日志记录入队，格式化和控制台/磁盘I/O由单独的写入线程完成
+"""
+import threading
+import logging
+from collections import deque
+from enum import Enum
+from typing import Dict, Any, List, Optional, Iterable
+
+# 入队前渲染异常堆栈使用的格式化器
+_exception_formatter = logging.Formatter()
+
+
+class OverflowPolicy(Enum):
+    """队列溢出策略枚举"""
+    BLOCK = "block"              # 阻塞调用线程直到队列有空位
+    DROP_OLDEST = "drop_oldest"  # 丢弃队列中最旧的记录
+    DROP_DEBUG = "drop_debug"    # 优先丢弃DEBUG记录，没有DEBUG记录时丢弃最旧的记录
+
+
+class FanoutHandler(logging.Handler):
+    """
+    同步分发处理器
+    作为CCTB日志记录器上唯一的前端处理器，把每条记录依次分发给各个目标处理器，
+    过滤器挂在这里时每条记录只会被处理一次
+    """
+
+    def __init__(self, targets: Optional[Iterable[logging.Handler]] = None):
+        """
+        初始化分发处理器
+
+        Args:
+            targets: 目标处理器列表
+        """
+        super().__init__(logging.NOTSET)
+        self.targets: List[logging.Handler] = list(targets or [])
+
+    def add_target(self, handler: logging.Handler) -> bool:
+        """
+        添加目标处理器（重复添加同一个处理器不会生效）
+
+        Args:
+            handler: 目标处理器
+
+        Returns:
+            添加成功返回True，已存在返回False
+        """
+        if handler in self.targets:
+            return False
+        self.targets.append(handler)
+        return True
+
+    def remove_target(self, handler: logging.Handler) -> bool:
+        """
+        移除目标处理器
+
+        Args:
+            handler: 目标处理器
+
+        Returns:
+            移除成功返回True，不存在返回False
+        """
+        if handler not in self.targets:
+            return False
+        self.targets.remove(handler)
+        return True
+
+    def handle(self, record: logging.LogRecord):
+        # 分发本身不需要加锁，目标处理器各自持有自己的锁
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record: logging.LogRecord):
+        self.dispatch(record)
+
+    def dispatch(self, record: logging.LogRecord):
+        """把记录分发给所有级别满足条件的目标处理器"""
+        levelno = record.levelno
+        for target in self.targets:
+            if levelno >= target.level:
+                target.handle(record)
+
+    def flush(self):
+        for target in self.targets:
+            target.flush()
+
+    def stop(self):
+        """停止管线（同步管线无需停止）"""
+        pass
+
+    def close(self):
+        for target in self.targets:
+            target.close()
+        super().close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取管线统计信息
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            "mode": "sync",
+            "targets": len(self.targets)
+        }
+
+
+class AsyncLogHandler(FanoutHandler):
+    """
+    异步分发处理器
+    记录进入有界队列，由单个写入线程批量取出并分发给目标处理器
+    """
+
+    def __init__(self, targets: Optional[Iterable[logging.Handler]] = None, queue_size: int = 10000,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.DROP_DEBUG):
+        """
+        初始化异步分发处理器
+
+        Args:
+            targets: 目标处理器列表
+            queue_size: 队列最大长度
+            overflow_policy: 队列已满时的处理策略
+        """
+        super().__init__(targets)
+        self.queue_size = max(1, int(queue_size))
+        self.overflow_policy = overflow_policy
+
+        self._queue = deque()
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+        self._not_full = threading.Condition(self._mutex)
+        self._drained = threading.Condition(self._mutex)
+        self._debug_pending = 0
+        self._busy = False
+        self._running = True
+
+        # 统计计数器
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._dropped_by_level: Dict[str, int] = {}
+        self._blocked = 0
+        self._high_watermark = 0
+
+        self._thread = threading.Thread(target=self._writer_loop, name="CCTB-LogWriter", daemon=True)
+        self._thread.start()
+
+    def prepare(self, record: logging.LogRecord):
+        """
+        在调用线程中固定记录内容（与QueueHandler.prepare()相同）：
+        立即合并msg和args，避免可变参数在写出前被修改；渲染异常堆栈并释放exc_info，
+        避免队列中的记录让traceback和栈帧一直存活
+
+        Args:
+            record: 日志记录
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.prepare(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._mutex:
+            if self._running:
+                if len(self._queue) >= self.queue_size and not self._make_room(record):
+                    return
+                self._queue.append(record)
+                if record.levelno <= logging.DEBUG:
+                    self._debug_pending += 1
+                self._enqueued += 1
+                depth = len(self._queue)
+                if depth > self._high_watermark:
+                    self._high_watermark = depth
+                self._not_empty.notify()
+                return
+        # 写入线程已停止，直接在调用线程写出，避免丢失退出阶段的日志
+        self.dispatch(record)
+
+    def _make_room(self, record: logging.LogRecord) -> bool:
+        """
+        按溢出策略为新记录腾出空间（调用时已持有锁）
+
+        Returns:
+            新记录可以入队返回True，新记录被丢弃返回False
+        """
+        policy = self.overflow_policy
+        if policy == OverflowPolicy.BLOCK:
+            self._blocked += 1
+            while len(self._queue) >= self.queue_size and self._running:
+                self._not_full.wait()
+            if not self._running:
+                self._count_drop(record)
+                return False
+            return True
+
+        if policy == OverflowPolicy.DROP_DEBUG:
+            if record.levelno <= logging.DEBUG:
+                self._count_drop(record)
+                return False
+            if self._debug_pending:
+                for index, queued in enumerate(self._queue):
+                    if queued.levelno <= logging.DEBUG:
+                        del self._queue[index]
+                        self._debug_pending -= 1
+                        self._count_drop(queued)
+                        return True
+
+        # DROP_OLDEST，或DROP_DEBUG下队列中已没有DEBUG记录
+        oldest = self._queue.popleft()
+        if oldest.levelno <= logging.DEBUG:
+            self._debug_pending -= 1
+        self._count_drop(oldest)
+        return True
+
+    def _count_drop(self, record: logging.LogRecord):
+        """记录一次丢弃（调用时已持有锁）"""
+        self._dropped += 1
+        level_name = record.levelname
+        self._dropped_by_level[level_name] = self._dropped_by_level.get(level_name, 0) + 1
+
+    def _writer_loop(self):
+        """写入线程：批量取出队列中的记录并分发"""
+        while True:
+            with self._mutex:
+                while not self._queue and self._running:
+                    self._not_empty.wait()
+                if not self._queue:
+                    # 已停止且队列为空
+                    self._drained.notify_all()
+                    return
+                batch = list(self._queue)
+                self._queue.clear()
+                self._debug_pending = 0
+                self._busy = True
+                self._not_full.notify_all()
+
+            for record in batch:
+                try:
+                    self.dispatch(record)
+                except Exception:
+                    self.handleError(record)
+
+            with self._mutex:
+                self._written += len(batch)
+                self._busy = False
+                if not self._queue:
+                    self._drained.notify_all()
+
+    def flush(self, timeout: Optional[float] = 5.0):
+        """
+        等待队列中的记录全部写出，然后刷新目标处理器
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+        """
+        with self._mutex:
+            if self._thread.is_alive() and threading.current_thread() is not self._thread:
+                self._drained.wait_for(lambda: not self._queue and not self._busy, timeout)
+        super().flush()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """
+        停止写入线程，停止前会写出队列中剩余的记录
+
+        Args:
+            timeout: 等待写入线程结束的最长时间（秒）
+        """
+        with self._mutex:
+            if not self._running:
+                return
+            self._running = False
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+
+    def close(self):
+        self.stop()
+        super().close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._mutex:
+            return {
+                "mode": "async",
+                "targets": len(self.targets),
+                "queue_depth": len(self._queue),
+                "queue_size": self.queue_size,
+                "high_watermark": self._high_watermark,
+                "overflow_policy": self.overflow_policy.value,
+                "enqueued": self._enqueued,
+                "written": self._written,
+                "dropped": self._dropped,
+                "dropped_by_level": dict(self._dropped_by_level),
+                "blocked": self._blocked,
+                "running": self._running
+            }
+
+
+def create_pipeline(targets: Iterable[logging.Handler], async_config: Optional[Dict[str, Any]] = None) -> FanoutHandler:
+    """
+    根据配置创建日志分发管线
+
+    Args:
+        targets: 目标处理器列表
+        async_config: 异步配置（logging.json中的async_logging节）
+
+    Returns:
+        同步或异步的分发处理器
+    """
+    async_config = async_config or {}
+    if not async_config.get("enabled", False):
+        return FanoutHandler(targets)
+
+    try:
+        policy = OverflowPolicy(async_config.get("overflow_policy", OverflowPolicy.DROP_DEBUG.value))
+    except ValueError:
+        policy = OverflowPolicy.DROP_DEBUG
+
+    return AsyncLogHandler(
+        targets,
+        queue_size=async_config.get("queue_size", 10000),
+        overflow_policy=policy
+    )
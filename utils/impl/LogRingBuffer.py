@@ -0,0 +1,266 @@
+"""
+内存环形缓冲日志处理器
+在预分配的固定大小缓冲区中保留最近N条记录，发生未处理异常或在界面上手动触发时，
+可以把缓冲区连同性能统计一起导出到崩溃日志文件
+
+默认级别为DEBUG，即使控制台和文件只输出INFO也能保留DEBUG记录。根记录器要降到DEBUG，
+被管线闸门挡住的utils.debug()记录由capture直接写入缓冲，不创建LogRecord也不经过处理器链，
+导出时才还原为LogRecord（开销见python -m benchmarks.bench_facade）
+"""
+import os
+import sys
+import json
+import itertools
+import time
+import traceback
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from utils.impl.CacheRegistry import deep_sizeof, SAMPLE_SIZE
+
+
+class RingBufferHandler(logging.Handler):
+    """环形缓冲处理器，写入只是一次槽位赋值，不加锁、不格式化"""
+
+    def __init__(self, capacity: int = 2000, level: int = logging.DEBUG):
+        """
+        初始化环形缓冲处理器
+
+        Args:
+            capacity: 保留的记录条数
+            level: 记录的最低级别
+        """
+        super().__init__(level)
+        self.capacity = max(1, int(capacity))
+        # 预分配槽位，每个槽位保存(序号, 记录)
+        self._slots: List[Optional[tuple]] = [None] * self.capacity
+        # itertools.count的next()在GIL下是原子的，多线程写入不需要加锁
+        self._sequence = itertools.count()
+        self._formatter = logging.Formatter(
+            "%(asctime)s.%(msecs)03d [%(levelname)s] %(name)s (%(threadName)s) %(module)s:%(lineno)d - %(message)s",
+            "%Y-%m-%d %H:%M:%S"
+        )
+        # 导出时使用的脱敏过滤器：缓冲直接挂在记录器上，被级别闸门、合并或限流挡下的记录
+        # 不会经过管线上的脱敏，所以在导出时统一脱敏（写入路径保持不格式化）
+        self.redaction = None
+
+    def set_redaction(self, redaction):
+        """
+        设置导出时使用的脱敏过滤器
+
+        Args:
+            redaction: RedactionFilter，None表示不脱敏
+        """
+        self.redaction = redaction
+
+    def _redact(self, text: str) -> str:
+        redaction = self.redaction
+        if redaction is None:
+            return text
+        return redaction.redact(text)[0]
+
+    def handle(self, record: logging.LogRecord):
+        self.emit(record)
+        return True
+
+    def emit(self, record: logging.LogRecord):
+        sequence = next(self._sequence)
+        self._slots[sequence % self.capacity] = (sequence, record)
+
+    def capture(self, name: str, level: int, msg, args, frame):
+        """
+        直接写入一条只进入缓冲的记录（被管线闸门挡住的utils.debug()等）
+        只保存创建LogRecord所需的字段，导出时再还原
+
+        Args:
+            name: 记录器名称
+            level: 日志级别
+            msg: 日志消息
+            args: %风格的参数
+            frame: 调用方的栈帧
+        """
+        if level < self.level:
+            return
+        code = frame.f_code
+        sequence = next(self._sequence)
+        self._slots[sequence % self.capacity] = (sequence, (
+            time.time(), name, level, msg, args, code.co_filename, frame.f_lineno, code.co_name,
+            threading.current_thread().name
+        ))
+
+    @staticmethod
+    def _to_record(item) -> logging.LogRecord:
+        """把capture保存的字段还原为LogRecord"""
+        if not isinstance(item, tuple):
+            return item
+        created, name, level, msg, args, pathname, lineno, func, thread_name = item
+        record = logging.LogRecord(name, level, pathname, lineno, msg, args, None, func)
+        record.created = created
+        record.msecs = int((created - int(created)) * 1000) + 0.0
+        record.threadName = thread_name
+        return record
+
+    def snapshot(self) -> List[logging.LogRecord]:
+        """
+        按写入顺序获取缓冲区中的记录
+
+        Returns:
+            记录列表（从旧到新）
+        """
+        entries = [entry for entry in list(self._slots) if entry is not None]
+        entries.sort(key=lambda entry: entry[0])
+        return [self._to_record(item) for _, item in entries]
+
+    def clear(self):
+        """清空缓冲区"""
+        self._slots = [None] * self.capacity
+
+    def estimate_size(self) -> int:
+        """估算缓冲区中的记录占用的字节数（抽样估算）"""
+        filled = [entry for entry in list(self._slots) if entry is not None]
+        size = sys.getsizeof(self._slots)
+        if not filled:
+            return size
+        sample = filled[-SAMPLE_SIZE:]
+        return size + sum(deep_sizeof(record) for _, record in sample) * len(filled) // len(sample)
+
+    def shrink(self, target_bytes: int):
+        """
+        丢弃最旧的记录，直到估算大小不超过target_bytes（缓存注册表的收缩回调）
+
+        Args:
+            target_bytes: 收缩后的目标字节数
+        """
+        slots = self._slots
+        entries = sorted((entry for entry in list(slots) if entry is not None), key=lambda entry: entry[0])
+        if not entries:
+            return
+        size = self.estimate_size()
+        if size <= target_bytes:
+            return
+        per_record = max(1, (size - sys.getsizeof(slots)) // len(entries))
+        drop = min(len(entries), -(-(size - target_bytes) // per_record))
+        for entry in entries[:drop]:
+            index = entry[0] % self.capacity
+            # 写入不加锁，槽位已被新记录覆盖时保留新记录
+            if slots[index] is entry:
+                slots[index] = None
+
+    def format_records(self) -> List[str]:
+        """把缓冲区中的记录格式化为文本行"""
+        lines = []
+        for record in self.snapshot():
+            try:
+                line = self._formatter.format(record)
+            except Exception as e:
+                line = f"<unformattable record {record.msg!r}: {e}>"
+            lines.append(self._redact(line))
+        return lines
+
+    def dump(self, path: str, reason: str = "manual", exc_info=None,
+             performance_stats: Optional[Dict[str, Any]] = None) -> str:
+        """
+        把缓冲区导出到文件
+
+        Args:
+            path: 导出文件路径
+            reason: 导出原因
+            exc_info: 触发导出的异常信息(type, value, traceback)
+            performance_stats: 性能统计快照
+
+        Returns:
+            导出文件路径
+        """
+        log_dir = os.path.dirname(path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+        lines = self.format_records()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"CCTB crash dump - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"Reason: {reason}\n")
+            f.write(f"PID: {os.getpid()}\n")
+
+            if exc_info and exc_info[0] is not None:
+                f.write("\n===== Exception =====\n")
+                f.write(self._redact("".join(traceback.format_exception(*exc_info))))
+
+            f.write("\n===== Performance stats =====\n")
+            f.write(json.dumps(performance_stats or {}, indent=2, ensure_ascii=False, default=str))
+            f.write("\n")
+
+            f.write(f"\n===== Last {len(lines)} log records =====\n")
+            for line in lines:
+                f.write(line)
+                f.write("\n")
+        return path
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "level": logging.getLevelName(self.level),
+            "buffered": sum(1 for entry in self._slots if entry is not None)
+        }
+
+
+class LevelGateFilter(logging.Filter):
+    """
+    分发管线的级别闸门
+    环形缓冲需要根记录器降到DEBUG级别，闸门负责把根记录器原本级别以下的记录挡在控制台和文件之外，
+    单独设置了更低级别的子记录器不受影响
+    """
+
+    def __init__(self, root_logger: logging.Logger, level: int):
+        """
+        初始化级别闸门
+
+        Args:
+            root_logger: 根记录器（CCTB）
+            level: 根记录器原本的级别
+        """
+        super().__init__()
+        self.root_logger = root_logger
+        self.level = level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.level:
+            return True
+        # 只有低于闸门级别的记录才需要查找记录器自身设置的级别
+        current = logging.getLogger(record.name)
+        while current is not None and current is not self.root_logger and current.level == logging.NOTSET:
+            current = current.parent
+        if current is None or current is self.root_logger:
+            return False
+        return record.levelno >= current.level
+
+
+def crash_file_path(crash_dir: str) -> str:
+    """生成崩溃日志文件路径，如logs/crash-20240101-120000.log"""
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(crash_dir, f"crash-{stamp}.log")
+    index = 1
+    while os.path.exists(path):
+        path = os.path.join(crash_dir, f"crash-{stamp}-{index}.log")
+        index += 1
+    return path
+
+
+def create_ring_buffer(ring_config: Optional[Dict[str, Any]] = None) -> Optional[RingBufferHandler]:
+    """
+    根据配置创建环形缓冲处理器
+
+    Args:
+        ring_config: 环形缓冲配置（logging.json中的ring_buffer节）
+
+    Returns:
+        环形缓冲处理器，未启用时返回None
+    """
+    ring_config = ring_config or {}
+    if not ring_config.get("enabled", False):
+        return None
+
+    level = logging.getLevelName(str(ring_config.get("level", "DEBUG")).upper())
+    if not isinstance(level, int):
+        level = logging.DEBUG
+    return RingBufferHandler(ring_config.get("capacity", 2000), level)
@@ -0,0 +1,334 @@
+"""
+日志轮转引擎
+支持按大小、按天和按会话（每次启动）轮转，旧日志先改名移入归档目录，
+再由后台线程压缩为gzip并按磁盘预算清理，写入线程只承担一次改名的开销
+"""
+import os
+import gzip
+import time
+import queue
+import sys
+import shutil
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable
+
+# 归档目录中识别的日志文件后缀（文本日志和JSONL日志）
+ARCHIVE_SUFFIXES = (".log", ".jsonl")
+ARCHIVE_FILE_SUFFIXES = ARCHIVE_SUFFIXES + tuple(suffix + ".gz" for suffix in ARCHIVE_SUFFIXES)
+# 压缩时写入的临时文件后缀，以及超过多少秒未修改的临时文件视为中断后遗留的
+TEMP_SUFFIX = ".gz.tmp"
+STALE_TEMP_SECONDS = 60
+
+# 以管理员身份重新启动的进程带有这个参数，它延续父进程的会话，不再把父进程刚写的日志当作上一次运行归档
+CONTINUE_SESSION_FLAG = "--continue-session"
+
+# 正在压缩的归档文件，多个轮转器共用同一个归档目录时避免重复压缩同一个文件
+_compressing = set()
+_compressing_lock = threading.Lock()
+
+
+class LogRotator:
+    """日志轮转器，负责判断何时轮转以及归档、压缩和清理"""
+
+    def __init__(self, when: Iterable[str] = ("size", "session"), max_bytes: int = 0,
+                 archive_dir: str = "logs/archive", compress: bool = True, compress_level: int = 6,
+                 max_archive_bytes: int = 0, max_archives: int = 0):
+        """
+        初始化日志轮转器
+
+        Args:
+            when: 轮转条件，可包含"size"、"daily"、"session"
+            max_bytes: 按大小轮转时单个日志文件的最大字节数
+            archive_dir: 归档目录
+            compress: 是否把归档文件压缩为gzip
+            compress_level: gzip压缩级别（1-9）
+            max_archive_bytes: 归档目录的总磁盘预算（字节），0表示不限制
+            max_archives: 最多保留的归档文件数量，0表示不限制
+        """
+        self.when = set(when)
+        self.max_bytes = max_bytes if "size" in self.when else 0
+        self.archive_dir = os.path.abspath(archive_dir)
+        self.compress = compress
+        self.compress_level = compress_level
+        self.max_archive_bytes = max_archive_bytes
+        self.max_archives = max_archives
+
+        self._next_daily = self._compute_next_daily() if "daily" in self.when else None
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._worker = None
+
+        # 统计计数器
+        self._rollovers = 0
+        self._rotate_time_last = 0.0
+        self._rotate_time_max = 0.0
+        self._compressed = 0
+        self._compress_time_last = 0.0
+        self._compress_time_max = 0.0
+        self._bytes_before_compress = 0
+        self._bytes_after_compress = 0
+        self._deleted = 0
+        self._archive_bytes = 0
+        self._archive_files = 0
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self._remove_stale_temps()
+        # 上次退出时可能有尚未压缩的归档文件，启动时补上
+        for name in os.listdir(self.archive_dir):
+            if name.endswith(ARCHIVE_SUFFIXES):
+                self._submit(os.path.join(self.archive_dir, name))
+        self._submit(None)
+
+    def _remove_stale_temps(self):
+        """
+        删除压缩中断后遗留的临时文件（原归档文件仍在，会被重新压缩）；
+        最近还在修改的临时文件可能属于共用归档目录的其他进程，保留不动
+        """
+        now = time.time()
+        for entry in os.scandir(self.archive_dir):
+            if not entry.name.endswith(TEMP_SUFFIX):
+                continue
+            try:
+                if now - entry.stat().st_mtime > STALE_TEMP_SECONDS:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _compute_next_daily() -> float:
+        """计算下一个零点的时间戳"""
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+    def should_rollover(self, current_size: int, incoming: int) -> bool:
+        """
+        判断写入下一批数据前是否需要轮转
+
+        Args:
+            current_size: 当前文件大小（字节）
+            incoming: 即将写入的字节数
+
+        Returns:
+            需要轮转返回True
+        """
+        if self.max_bytes and current_size and current_size + incoming > self.max_bytes:
+            return True
+        if self._next_daily is not None and current_size and time.time() >= self._next_daily:
+            return True
+        return False
+
+    def rollover(self, path: str) -> Optional[str]:
+        """
+        把日志文件移入归档目录并交给后台线程压缩（调用前文件应已关闭）
+
+        Args:
+            path: 日志文件路径
+
+        Returns:
+            归档文件路径，文件不存在或为空时返回None
+        """
+        start = time.perf_counter()
+        if self._next_daily is not None:
+            self._next_daily = self._compute_next_daily()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+
+        archive_path = self._archive_name(path)
+        os.replace(path, archive_path)
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._rollovers += 1
+            self._rotate_time_last = elapsed
+            if elapsed > self._rotate_time_max:
+                self._rotate_time_max = elapsed
+        self._submit(archive_path)
+        return archive_path
+
+    def start_session(self, path: str) -> Optional[str]:
+        """
+        会话开始时调用，启用会话轮转时把上一次运行留下的日志归档
+
+        Args:
+            path: 日志文件路径
+
+        Returns:
+            归档文件路径，未轮转时返回None
+        """
+        if "session" not in self.when or continues_session():
+            return None
+        return self.rollover(path)
+
+    def _archive_name(self, path: str) -> str:
+        """生成不与已有文件冲突的归档文件名，保留原后缀，如latest-20240101-120000.log"""
+        stem, suffix = os.path.splitext(os.path.basename(path))
+        if suffix not in ARCHIVE_SUFFIXES:
+            suffix = ".log"
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        candidate = os.path.join(self.archive_dir, f"{stem}-{stamp}{suffix}")
+        index = 1
+        while os.path.exists(candidate) or os.path.exists(candidate + ".gz"):
+            candidate = os.path.join(self.archive_dir, f"{stem}-{stamp}-{index}{suffix}")
+            index += 1
+        return candidate
+
+    def _submit(self, archive_path: Optional[str]):
+        """提交后台任务（None表示只做磁盘预算清理），按需启动后台线程"""
+        self._pending.put(archive_path)
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._worker_loop, name="CCTB-LogArchiver", daemon=True)
+            self._worker.start()
+
+    def _worker_loop(self):
+        """后台线程：压缩归档文件并执行磁盘预算"""
+        while True:
+            archive_path = self._pending.get()
+            try:
+                if archive_path and self.compress:
+                    self._compress_once(archive_path)
+                self._enforce_budget()
+            except Exception as e:
+                print(f"ERROR: Log archive maintenance failed: {e}")
+            finally:
+                self._pending.task_done()
+
+    def _compress_once(self, archive_path: str):
+        """认领并压缩归档文件，已被其他轮转器认领或已不存在时跳过"""
+        with _compressing_lock:
+            if archive_path in _compressing:
+                return
+            _compressing.add(archive_path)
+        try:
+            if os.path.exists(archive_path):
+                self._compress(archive_path)
+        finally:
+            with _compressing_lock:
+                _compressing.discard(archive_path)
+
+    def _compress(self, archive_path: str):
+        """把归档文件压缩为.gz，先写临时文件再改名，中途退出不会留下损坏的压缩包"""
+        start = time.perf_counter()
+        target = archive_path + ".gz"
+        temp = archive_path + TEMP_SUFFIX
+        with open(archive_path, "rb") as source, gzip.open(temp, "wb", compresslevel=self.compress_level) as dest:
+            shutil.copyfileobj(source, dest, 1024 * 1024)
+        before = os.path.getsize(archive_path)
+        os.replace(temp, target)
+        os.remove(archive_path)
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._compressed += 1
+            self._compress_time_last = elapsed
+            if elapsed > self._compress_time_max:
+                self._compress_time_max = elapsed
+            self._bytes_before_compress += before
+            self._bytes_after_compress += os.path.getsize(target)
+
+    def _list_archives(self) -> List[os.DirEntry]:
+        """按修改时间从旧到新列出归档文件"""
+        entries = [entry for entry in os.scandir(self.archive_dir)
+                   if entry.is_file() and entry.name.endswith(ARCHIVE_FILE_SUFFIXES)]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        return entries
+
+    def _enforce_budget(self):
+        """删除最旧的归档文件，直到满足数量和磁盘预算限制"""
+        entries = self._list_archives()
+        sizes = [entry.stat().st_size for entry in entries]
+        total = sum(sizes)
+        deleted = 0
+        while entries and ((self.max_archives and len(entries) > self.max_archives)
+                           or (self.max_archive_bytes and total > self.max_archive_bytes)):
+            entry = entries.pop(0)
+            total -= sizes.pop(0)
+            try:
+                os.remove(entry.path)
+                deleted += 1
+            except OSError:
+                pass
+
+        with self._lock:
+            self._deleted += deleted
+            self._archive_bytes = total
+            self._archive_files = len(entries)
+
+    def wait_idle(self, timeout: float = 5.0) -> bool:
+        """
+        等待后台压缩任务完成
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            全部完成返回True，超时返回False
+        """
+        deadline = time.monotonic() + timeout
+        while self._pending.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取轮转统计信息
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "policy": sorted(self.when),
+                "archive_dir": self.archive_dir,
+                "rollovers": self._rollovers,
+                "last_rotate_ms": self._rotate_time_last * 1000,
+                "max_rotate_ms": self._rotate_time_max * 1000,
+                "compressed": self._compressed,
+                "pending_compress": self._pending.unfinished_tasks,
+                "last_compress_ms": self._compress_time_last * 1000,
+                "max_compress_ms": self._compress_time_max * 1000,
+                "compress_ratio": (self._bytes_after_compress / self._bytes_before_compress) if self._bytes_before_compress else 0.0,
+                "archive_bytes": self._archive_bytes,
+                "archive_files": self._archive_files,
+                "deleted": self._deleted
+            }
+
+
+def continues_session(argv: Optional[Iterable[str]] = None) -> bool:
+    """
+    判断当前进程是否延续父进程的会话（提权后重新启动的进程）
+
+    Args:
+        argv: 命令行参数（不含程序名），默认sys.argv[1:]
+
+    Returns:
+        延续会话返回True
+    """
+    return CONTINUE_SESSION_FLAG in (sys.argv[1:] if argv is None else argv)
+
+
+def create_rotator(rotation_config: Optional[Dict[str, Any]] = None, max_bytes: int = 0,
+                   backup_count: int = 0) -> LogRotator:
+    """
+    根据配置创建日志轮转器
+
+    Args:
+        rotation_config: 轮转配置（logging.json中的rotation节）
+        max_bytes: 单个日志文件最大字节数（max_file_size）
+        backup_count: 备份数量（backup_count），rotation节未指定max_archives时使用
+
+    Returns:
+        日志轮转器
+    """
+    rotation_config = rotation_config or {}
+    return LogRotator(
+        when=rotation_config.get("when", ["size", "session"]),
+        max_bytes=max_bytes,
+        archive_dir=rotation_config.get("archive_dir", "logs/archive"),
+        compress=rotation_config.get("compress", True),
+        compress_level=rotation_config.get("compress_level", 6),
+        max_archive_bytes=rotation_config.get("max_archive_bytes", 0),
+        max_archives=rotation_config.get("max_archives", backup_count)
+    )
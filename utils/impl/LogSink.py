@@ -0,0 +1,314 @@
+"""
+批量文件日志输出
+格式化后的记录先在内存中累积，达到大小或时间阈值时一次性写入文件，
+ERROR及以上级别的记录会立即触发写入，fsync策略可在logging.json中配置
+"""
+import os
+import sys
+import time
+import logging
+import traceback
+from enum import Enum
+from typing import Dict, Any, List, Optional
+from utils.impl.Scheduler import scheduler
+
+
+class FsyncPolicy(Enum):
+    """fsync策略枚举"""
+    NEVER = "never"          # 从不主动fsync，交给操作系统
+    ON_ROTATE = "on_rotate"  # 日志轮转和关闭时fsync
+    INTERVAL = "interval"    # 距离上次fsync超过指定间隔后的下一次写入时fsync
+
+
+class BatchingFileHandler(logging.Handler):
+    """批量写入的文件处理器，支持按大小轮转"""
+
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0, encoding: str = "utf-8",
+                 batch_size: int = 64 * 1024, flush_interval: float = 1.0, flush_level: int = logging.ERROR,
+                 fsync_policy: FsyncPolicy = FsyncPolicy.ON_ROTATE, fsync_interval: float = 5.0,
+                 rotator=None, process_lock=None):
+        """
+        初始化批量文件处理器
+
+        Args:
+            filename: 日志文件路径
+            max_bytes: 单个文件最大字节数，0表示不轮转
+            backup_count: 保留的备份文件数量
+            encoding: 文件编码
+            batch_size: 缓冲区达到该字节数时写入
+            flush_interval: 缓冲区中最早的记录等待超过该时间（秒）后写入
+            flush_level: 达到该级别的记录会立即写入
+            fsync_policy: fsync策略
+            fsync_interval: INTERVAL策略下两次fsync之间的最小间隔（秒）
+            rotator: 日志轮转器（LogRotator），指定后由它决定何时轮转并负责归档，
+                     max_bytes和backup_count不再生效
+            process_lock: 跨进程锁（提供acquire/release），指定后每批写入和轮转都在锁内进行，
+                          用于多个进程共享同一个日志文件
+        """
+        super().__init__()
+        self.baseFilename = os.path.abspath(filename)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.encoding = encoding
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.rotator = rotator
+        self.process_lock = process_lock
+
+        self._buffer: List[str] = []
+        self._buffered_chars = 0
+        self._first_buffered = 0.0
+        self._last_fsync = time.monotonic()
+        self._stream = None
+        self._size = 0
+
+        # 统计计数器
+        self._records = 0
+        self._bytes_written = 0
+        self._batches = 0
+        self._fsyncs = 0
+        self._rollovers = 0
+        self._flush_time_total = 0.0
+        self._flush_time_max = 0.0
+        self._flush_errors = 0
+
+        self._open()
+
+        # 空闲时按时间阈值写出缓冲区（调度器任务）
+        self._flush_task = None
+        if self.flush_interval and self.flush_interval > 0:
+            self._flush_task = scheduler.schedule_periodic(f"log.flush:{self.baseFilename}", self._flush_due,
+                                                           self.flush_interval)
+
+    def _open(self):
+        """以无缓冲的二进制追加模式打开文件，每批数据对应一次write调用"""
+        log_dir = os.path.dirname(self.baseFilename)
+        if log_dir and not os.path.exists(log_dir):
+            os.makedirs(log_dir, exist_ok=True)
+        self._stream = open(self.baseFilename, "ab", buffering=0)
+        self._size = os.fstat(self._stream.fileno()).st_size
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            text = self.format(record) + "\n"
+        except Exception:
+            self.handleError(record)
+            return
+
+        try:
+            self.write_text(text, record.levelno >= self.flush_level)
+        except Exception:
+            self.handleError(record)
+
+    def write_text(self, text: str, urgent: bool = False, records: int = 1):
+        """
+        写入已经格式化好的文本（可以包含多行）
+
+        Args:
+            text: 以换行符结尾的文本
+            urgent: 是否立即写入文件
+            records: 文本中包含的记录数，用于统计
+        """
+        self.acquire()
+        try:
+            if not self._buffer:
+                self._first_buffered = time.monotonic()
+            self._buffer.append(text)
+            self._buffered_chars += len(text)
+            self._records += records
+            if (urgent
+                    or self._buffered_chars >= self.batch_size
+                    or time.monotonic() - self._first_buffered >= self.flush_interval):
+                self._write_buffer()
+        finally:
+            self.release()
+
+    def _write_buffer(self):
+        """把缓冲区写入文件（调用时已持有锁），有跨进程锁时在锁内写入"""
+        if not self._buffer or self._stream is None:
+            return
+        if self.process_lock is None:
+            self._write_buffer_locked()
+            return
+        self.process_lock.acquire()
+        try:
+            # 其他进程可能也追加了内容，按实际大小判断是否需要轮转
+            self._size = os.fstat(self._stream.fileno()).st_size
+            self._write_buffer_locked()
+        finally:
+            self.process_lock.release()
+
+    def _write_buffer_locked(self):
+        """把缓冲区写入文件（调用时已持有锁）"""
+        start = time.perf_counter()
+        data = "".join(self._buffer).encode(self.encoding, errors="replace")
+        self._buffer.clear()
+        self._buffered_chars = 0
+
+        if self.rotator is not None:
+            if self.rotator.should_rollover(self._size, len(data)):
+                self._rollover()
+        elif self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+            self._rollover()
+
+        view = memoryview(data)
+        while view:
+            written = self._stream.write(view)
+            view = view[written:]
+        self._size += len(data)
+
+        if self.fsync_policy == FsyncPolicy.INTERVAL and time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._fsync()
+
+        elapsed = time.perf_counter() - start
+        self._bytes_written += len(data)
+        self._batches += 1
+        self._flush_time_total += elapsed
+        if elapsed > self._flush_time_max:
+            self._flush_time_max = elapsed
+
+    def _fsync(self):
+        """把文件内容同步到磁盘（调用时已持有锁）"""
+        os.fsync(self._stream.fileno())
+        self._fsyncs += 1
+        self._last_fsync = time.monotonic()
+
+    def _rollover(self):
+        """
+        轮转日志文件（调用时已持有锁）
+        有轮转器时交给轮转器归档，否则按latest.log -> latest.log.1 -> ... -> latest.log.N的方式改名
+        """
+        if self.fsync_policy != FsyncPolicy.NEVER:
+            self._fsync()
+        self._stream.close()
+        self._stream = None
+
+        if self.rotator is not None:
+            self.rotator.rollover(self.baseFilename)
+        elif self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.baseFilename}.{i}"
+                target = f"{self.baseFilename}.{i + 1}"
+                if os.path.exists(source):
+                    os.replace(source, target)
+            os.replace(self.baseFilename, f"{self.baseFilename}.1")
+        else:
+            # 不保留备份时直接清空
+            open(self.baseFilename, "wb").close()
+
+        self._rollovers += 1
+        self._open()
+
+    def _flush_due(self):
+        """调度器任务：写出等待时间超过flush_interval的缓冲区"""
+        # 不阻塞地获取锁，锁被占用时跳过这一次：持有锁的线程可能正在close()中等待本任务结束
+        # （logging.shutdown()先acquire()再flush()、close()），阻塞等待会互相死锁；
+        # 缓冲区留到下一次定时写出或由持有锁的线程写出
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            if self._buffer and time.monotonic() - self._first_buffered >= self.flush_interval:
+                self._write_buffer()
+        except Exception:
+            # 没有对应的记录可交给handleError，按handleError的方式输出到标准错误并计数
+            self._flush_errors += 1
+            if logging.raiseExceptions:
+                sys.stderr.write("--- Logging error ---\n")
+                traceback.print_exc(file=sys.stderr)
+                sys.stderr.write(f"Timed flush of {self.baseFilename} failed, buffered records were dropped\n")
+        finally:
+            self.release()
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._write_buffer()
+        finally:
+            self.release()
+
+    def close(self):
+        # 先取消定时写出并等待正在运行的一次结束，再持有锁关闭文件；
+        # 调用方可能已经持有锁，正在运行的定时写出拿不到锁会立即返回，等待不会死锁
+        scheduler.cancel(self._flush_task, wait=True)
+        self._flush_task = None
+        self.acquire()
+        try:
+            if self._stream is not None:
+                self._write_buffer()
+                if self.fsync_policy != FsyncPolicy.NEVER:
+                    self._fsync()
+                self._stream.close()
+                self._stream = None
+        finally:
+            self.release()
+        if self.rotator is not None:
+            # 等待后台压缩完成，避免退出时留下未压缩的归档
+            self.rotator.wait_idle()
+        super().close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取写入统计信息
+
+        Returns:
+            统计信息字典
+        """
+        self.acquire()
+        try:
+            return {
+                "path": self.baseFilename,
+                "records": self._records,
+                "bytes_written": self._bytes_written,
+                "batches": self._batches,
+                "buffered_bytes": self._buffered_chars,
+                "fsyncs": self._fsyncs,
+                "rollovers": self._rollovers,
+                "fsync_policy": self.fsync_policy.value,
+                "avg_flush_ms": (self._flush_time_total / self._batches * 1000) if self._batches else 0.0,
+                "max_flush_ms": self._flush_time_max * 1000,
+                "flush_errors": self._flush_errors,
+                "rotation": self.rotator.get_stats() if self.rotator is not None else None
+            }
+        finally:
+            self.release()
+
+
+def create_file_sink(file_path: str, sink_config: Optional[Dict[str, Any]] = None,
+                     max_bytes: int = 0, backup_count: int = 0, rotator=None) -> BatchingFileHandler:
+    """
+    根据配置创建批量文件处理器
+
+    Args:
+        file_path: 日志文件路径
+        sink_config: 批量写入配置（logging.json中的file_sink节）
+        max_bytes: 单个文件最大字节数，0表示不轮转
+        backup_count: 保留的备份文件数量
+        rotator: 日志轮转器（LogRotator），可选
+
+    Returns:
+        批量文件处理器
+    """
+    sink_config = sink_config or {}
+    try:
+        fsync_policy = FsyncPolicy(sink_config.get("fsync_policy", FsyncPolicy.ON_ROTATE.value))
+    except ValueError:
+        fsync_policy = FsyncPolicy.ON_ROTATE
+
+    flush_level = logging.getLevelName(str(sink_config.get("flush_level", "ERROR")).upper())
+    if not isinstance(flush_level, int):
+        flush_level = logging.ERROR
+
+    return BatchingFileHandler(
+        file_path,
+        max_bytes=max_bytes,
+        backup_count=backup_count,
+        batch_size=sink_config.get("batch_size", 64 * 1024),
+        flush_interval=sink_config.get("flush_interval", 1.0),
+        flush_level=flush_level,
+        fsync_policy=fsync_policy,
+        fsync_interval=sink_config.get("fsync_interval", 5.0),
+        rotator=rotator
+    )
@@ -0,0 +1,557 @@
+"""
+带索引的日志存储
+记录按二进制帧追加到分段文件（seg-000001.dat），每积累一个块（默认256条）在旁边的索引文件
+（seg-000001.idx）中追加一条定长索引：块内时间范围、块在分段文件中的偏移和长度、块内出现过的级别位图。
+查询时用mmap在索引上二分查找时间起点，按级别位图跳过无关的块，只读取命中的块，
+因此查询耗时只与命中的数据量有关，不随日志总量增长。
+分段关闭（切换或程序退出）时写出范围文件（seg-000001.rng），记录分段内的最早和最晚时间，
+查询时时间范围不相交的分段不再打开
+
+命令行用法（在项目根目录）：
+python -m utils.impl.LogStore query --from 10:02 --to 10:05 --level ERROR
+python -m utils.impl.LogStore stats
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import logging
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+# 记录帧头：负载长度、时间戳、级别
+RECORD_HEADER = struct.Struct("<IdB")
+# 索引项：块内最早时间、分段内截至该块的最晚时间（单调不减，用于二分）、块偏移、块长度、记录数、级别位图
+INDEX_ENTRY = struct.Struct("<ddQIIB")
+# 分段范围：分段内最早时间、最晚时间
+SEGMENT_RANGE = struct.Struct("<dd")
+
+SEGMENT_SUFFIX = ".dat"
+INDEX_SUFFIX = ".idx"
+RANGE_SUFFIX = ".rng"
+
+# 级别 -> 位图中的位，其他级别统一使用最后一位
+_LEVEL_BITS = {logging.DEBUG: 0, logging.INFO: 1, logging.WARNING: 2, logging.ERROR: 3, logging.CRITICAL: 4}
+_OTHER_LEVEL_BIT = 5
+
+
+def level_bit(levelno: int) -> int:
+    """获取级别在位图中对应的位"""
+    return 1 << _LEVEL_BITS.get(levelno, _OTHER_LEVEL_BIT)
+
+
+def level_mask(levels: Optional[List[int]] = None, min_level: Optional[int] = None) -> int:
+    """
+    根据级别列表或最低级别生成查询用的位图
+
+    Args:
+        levels: 需要的级别列表
+        min_level: 最低级别（包含更高的级别）
+
+    Returns:
+        位图，0x3F表示全部级别
+    """
+    if levels:
+        mask = 0
+        for levelno in levels:
+            mask |= level_bit(levelno)
+        return mask
+    if min_level is not None:
+        mask = 1 << _OTHER_LEVEL_BIT
+        for levelno, bit in _LEVEL_BITS.items():
+            if levelno >= min_level:
+                mask |= 1 << bit
+        return mask
+    return 0x3F
+
+
+def _segment_paths(directory: str) -> List[Tuple[int, str]]:
+    """按编号列出目录中的分段文件"""
+    if not os.path.isdir(directory):
+        return []
+    segments = []
+    for name in os.listdir(directory):
+        if name.startswith("seg-") and name.endswith(SEGMENT_SUFFIX):
+            try:
+                number = int(name[4:-len(SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            segments.append((number, os.path.join(directory, name)))
+    segments.sort()
+    return segments
+
+
+def _segment_range(path: str) -> Optional[Tuple[float, float]]:
+    """读取分段的范围文件，分段未正常关闭（当前正在写入或异常退出）时返回None"""
+    try:
+        with open(path[:-len(SEGMENT_SUFFIX)] + RANGE_SUFFIX, "rb") as f:
+            data = f.read(SEGMENT_RANGE.size)
+    except OSError:
+        return None
+    if len(data) != SEGMENT_RANGE.size:
+        return None
+    return SEGMENT_RANGE.unpack(data)
+
+
+class IndexedStoreHandler(logging.Handler):
+    """带索引的分段存储处理器，记录负载由格式化器生成（通常为JSONL格式化器）"""
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, block_records: int = 256,
+                 max_segments: int = 0):
+        """
+        初始化分段存储处理器
+
+        Args:
+            directory: 存储目录
+            segment_bytes: 单个分段文件的最大字节数，超过后切换到新分段
+            block_records: 每个索引块包含的记录数
+            max_segments: 最多保留的分段数量，0表示不限制
+        """
+        super().__init__()
+        self.directory = os.path.abspath(directory)
+        self.segment_bytes = segment_bytes
+        self.block_records = max(1, int(block_records))
+        self.max_segments = max_segments
+
+        self._data = None
+        self._index = None
+        self._segment_number = 0
+        self._offset = 0
+        self._min_ts = float("inf")
+        self._max_ts = 0.0
+
+        # 当前块
+        self._block_offset = 0
+        self._block_count = 0
+        self._block_min = 0.0
+        self._block_mask = 0
+
+        # 统计计数器
+        self._records = 0
+        self._blocks = 0
+        self._bytes_written = 0
+        self._segments = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        existing = _segment_paths(self.directory)
+        # 每次启动使用新分段，上一次运行未写入索引的尾部由查询时的尾部扫描覆盖
+        self._open_segment(existing[-1][0] + 1 if existing else 1)
+
+    def _segment_base(self, number: int) -> str:
+        return os.path.join(self.directory, f"seg-{number:06d}")
+
+    def _open_segment(self, number: int):
+        """打开新的分段文件和索引文件（调用时已持有锁或在初始化中）"""
+        base = self._segment_base(number)
+        self._data = open(base + SEGMENT_SUFFIX, "ab")
+        self._index = open(base + INDEX_SUFFIX, "ab")
+        self._segment_number = number
+        self._offset = self._data.tell()
+        self._min_ts = float("inf")
+        self._max_ts = 0.0
+        self._block_count = 0
+        self._segments += 1
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        """删除超出数量限制的最旧分段"""
+        if not self.max_segments:
+            return
+        segments = _segment_paths(self.directory)
+        for number, path in segments[:max(0, len(segments) - self.max_segments)]:
+            if number == self._segment_number:
+                continue
+            base = path[:-len(SEGMENT_SUFFIX)]
+            for file_path in (path, base + INDEX_SUFFIX, base + RANGE_SUFFIX):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            payload = self.format(record).encode("utf-8", errors="replace")
+        except Exception:
+            self.handleError(record)
+            return
+
+        self.acquire()
+        try:
+            if self._data is None:
+                return
+            created = record.created
+            if self._block_count == 0:
+                self._block_offset = self._offset
+                self._block_min = created
+                self._block_mask = 0
+            elif created < self._block_min:
+                self._block_min = created
+            if created > self._max_ts:
+                self._max_ts = created
+            if created < self._min_ts:
+                self._min_ts = created
+            self._block_mask |= level_bit(record.levelno)
+            self._block_count += 1
+
+            frame = RECORD_HEADER.pack(len(payload), created, min(record.levelno, 255)) + payload
+            self._data.write(frame)
+            self._offset += len(frame)
+            self._records += 1
+            self._bytes_written += len(frame)
+
+            if self._block_count >= self.block_records:
+                self._close_block()
+                if self.segment_bytes and self._offset >= self.segment_bytes:
+                    self._roll_segment()
+        except Exception:
+            self.handleError(record)
+        finally:
+            self.release()
+
+    def _close_block(self):
+        """写出当前块的数据并追加索引项（调用时已持有锁）"""
+        if not self._block_count:
+            return
+        self._data.flush()
+        self._index.write(INDEX_ENTRY.pack(
+            self._block_min, self._max_ts, self._block_offset,
+            self._offset - self._block_offset, self._block_count, self._block_mask
+        ))
+        self._index.flush()
+        self._block_count = 0
+        self._blocks += 1
+
+    def _close_segment(self):
+        """写出最后一个块和分段范围文件并关闭分段（调用时已持有锁）"""
+        self._close_block()
+        self._data.close()
+        self._index.close()
+        if self._max_ts:
+            with open(self._segment_base(self._segment_number) + RANGE_SUFFIX, "wb") as f:
+                f.write(SEGMENT_RANGE.pack(self._min_ts, self._max_ts))
+
+    def _roll_segment(self):
+        """切换到新分段（调用时已持有锁）"""
+        self._close_segment()
+        self._open_segment(self._segment_number + 1)
+
+    def flush(self):
+        """写出缓冲的数据，未满的块留在分段末尾（查询时通过尾部扫描读取）"""
+        self.acquire()
+        try:
+            if self._data is not None:
+                self._data.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        self.acquire()
+        try:
+            if self._data is not None:
+                self._close_segment()
+                self._data = None
+                self._index = None
+        finally:
+            self.release()
+        super().close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取存储统计信息
+
+        Returns:
+            统计信息字典
+        """
+        self.acquire()
+        try:
+            return {
+                "path": self.directory,
+                "segment": self._segment_number,
+                "records": self._records,
+                "blocks": self._blocks,
+                "bytes_written": self._bytes_written,
+                "segments_opened": self._segments
+            }
+        finally:
+            self.release()
+
+
+class _Segment:
+    """只读打开的分段（数据和索引都通过mmap访问）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = self._map(path)
+        self.index = self._map(path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX)
+        self.entries = len(self.index) // INDEX_ENTRY.size if self.index is not None else 0
+
+    @staticmethod
+    def _map(path: str) -> Optional[mmap.mmap]:
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return None
+                return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        except OSError:
+            return None
+
+    def entry(self, i: int) -> Tuple[float, float, int, int, int, int]:
+        return INDEX_ENTRY.unpack_from(self.index, i * INDEX_ENTRY.size)
+
+    def indexed_end(self) -> int:
+        """已被索引覆盖的数据末尾偏移"""
+        if not self.entries:
+            return 0
+        _, _, offset, length, _, _ = self.entry(self.entries - 1)
+        return offset + length
+
+    def first_candidate(self, start: float) -> int:
+        """二分查找第一个最晚时间不早于start的块"""
+        low, high = 0, self.entries
+        while low < high:
+            middle = (low + high) // 2
+            if self.entry(middle)[1] < start:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def close(self):
+        for mapped in (self.data, self.index):
+            if mapped is not None:
+                mapped.close()
+
+
+def _iter_frames(data: mmap.mmap, offset: int, end: int) -> Iterator[Tuple[float, int, bytes]]:
+    """顺序解析[offset, end)范围内的记录帧，遇到不完整的帧时停止"""
+    header_size = RECORD_HEADER.size
+    while offset + header_size <= end:
+        length, created, levelno = RECORD_HEADER.unpack_from(data, offset)
+        payload_end = offset + header_size + length
+        if payload_end > end:
+            break
+        yield created, levelno, data[offset + header_size:payload_end]
+        offset = payload_end
+
+
+class LogStore:
+    """带索引日志存储的查询接口"""
+
+    def __init__(self, directory: str = "logs/store"):
+        """
+        初始化查询接口
+
+        Args:
+            directory: 存储目录
+        """
+        self.directory = os.path.abspath(directory)
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              levels: Optional[List[int]] = None, min_level: Optional[int] = None,
+              limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        按时间和级别范围查询记录
+
+        Args:
+            start: 开始时间戳（包含），None表示不限
+            end: 结束时间戳（包含），None表示不限
+            levels: 需要的级别列表
+            min_level: 最低级别
+            limit: 最多返回的记录数
+
+        Returns:
+            记录迭代器，每条记录为{"created", "levelno", "payload"}
+        """
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        mask = level_mask(levels, min_level)
+        wanted = set(levels) if levels else None
+        returned = 0
+
+        for _, path in _segment_paths(self.directory):
+            bounds = _segment_range(path)
+            if bounds is not None and (bounds[1] < start or bounds[0] > end):
+                continue
+            segment = _Segment(path)
+            try:
+                if segment.data is None:
+                    continue
+                for created, levelno, payload in self._scan_segment(segment, start, end, mask):
+                    if created < start or created > end:
+                        continue
+                    if wanted is not None:
+                        if levelno not in wanted:
+                            continue
+                    elif min_level is not None and levelno < min_level:
+                        continue
+                    yield {"created": created, "levelno": levelno, "payload": payload.decode("utf-8", errors="replace")}
+                    returned += 1
+                    if limit and returned >= limit:
+                        return
+            finally:
+                segment.close()
+
+    @staticmethod
+    def _scan_segment(segment: _Segment, start: float, end: float, mask: int):
+        """遍历分段中时间范围和级别位图可能命中的块，以及尚未被索引的尾部"""
+        for i in range(segment.first_candidate(start), segment.entries):
+            block_min, _, offset, length, _, block_mask = segment.entry(i)
+            if block_min > end:
+                # 索引按写入顺序排列，块最早时间超过查询终点后不会再有命中
+                return
+            if block_mask & mask:
+                yield from _iter_frames(segment.data, offset, offset + length)
+
+        # 未满的块（或上一次运行异常退出时）没有索引项，最多只有一个块的数据需要顺序扫描
+        yield from _iter_frames(segment.data, segment.indexed_end(), len(segment.data))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取存储概况
+
+        Returns:
+            分段数量、总字节数、索引块数和时间范围
+        """
+        segments = _segment_paths(self.directory)
+        total_bytes = 0
+        blocks = 0
+        first = None
+        last = None
+        for _, path in segments:
+            segment = _Segment(path)
+            try:
+                total_bytes += len(segment.data) if segment.data is not None else 0
+                blocks += segment.entries
+                if segment.entries:
+                    block_min = segment.entry(0)[0]
+                    block_max = segment.entry(segment.entries - 1)[1]
+                    first = block_min if first is None else min(first, block_min)
+                    last = block_max if last is None else max(last, block_max)
+            finally:
+                segment.close()
+        return {
+            "directory": self.directory,
+            "segments": len(segments),
+            "bytes": total_bytes,
+            "blocks": blocks,
+            "first": datetime.fromtimestamp(first).isoformat() if first else None,
+            "last": datetime.fromtimestamp(last).isoformat() if last else None
+        }
+
+
+def create_store_sink(store_config: Optional[Dict[str, Any]] = None) -> IndexedStoreHandler:
+    """
+    根据配置创建带索引的存储处理器
+
+    Args:
+        store_config: 存储配置（logging.json中的store节）
+
+    Returns:
+        存储处理器
+    """
+    store_config = store_config or {}
+    return IndexedStoreHandler(
+        store_config.get("dir", "logs/store"),
+        segment_bytes=store_config.get("segment_bytes", 64 * 1024 * 1024),
+        block_records=store_config.get("block_records", 256),
+        max_segments=store_config.get("max_segments", 0)
+    )
+
+
+# 命令行时间格式及其精度
+_DATE_FORMATS = (("%Y-%m-%d %H:%M:%S", timedelta(seconds=1)), ("%Y-%m-%d %H:%M", timedelta(minutes=1)),
+                 ("%Y-%m-%dT%H:%M:%S", timedelta(seconds=1)), ("%Y-%m-%d", timedelta(days=1)))
+_TIME_FORMATS = (("%H:%M:%S", timedelta(seconds=1)), ("%H:%M", timedelta(minutes=1)))
+
+
+def parse_time(text: str, inclusive_end: bool = False) -> float:
+    """
+    解析命令行中的时间，支持HH:MM、HH:MM:SS（当天）以及YYYY-mm-dd HH:MM[:SS]
+
+    Args:
+        text: 时间文本
+        inclusive_end: 是否作为包含的结束时间解析，为True时返回文本精度内的最后时刻
+            （如10:05表示10:05:59.999999，2024-01-02表示当天结束）
+
+    Returns:
+        时间戳
+    """
+    parsed = None
+    for fmt, precision in _DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+            break
+        except ValueError:
+            pass
+    else:
+        for fmt, precision in _TIME_FORMATS:
+            try:
+                parsed = datetime.combine(datetime.now().date(), datetime.strptime(text, fmt).time())
+                break
+            except ValueError:
+                pass
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"invalid time: {text}")
+    if inclusive_end:
+        parsed += precision - timedelta(microseconds=1)
+    return parsed.timestamp()
+
+
+def parse_end_time(text: str) -> float:
+    """解析命令行中的结束时间（包含文本精度内的整段时间）"""
+    return parse_time(text, inclusive_end=True)
+
+
+def _render(item: Dict[str, Any]) -> str:
+    """把查询结果渲染为一行文本"""
+    stamp = datetime.fromtimestamp(item["created"]).strftime("%Y-%m-%d %H:%M:%S")
+    level = logging.getLevelName(item["levelno"])
+    try:
+        entry = json.loads(item["payload"])
+        return f"{stamp} {level:<8} {entry.get('logger', '')}: {entry.get('message', '')}"
+    except (ValueError, AttributeError):
+        return f"{stamp} {level:<8} {item['payload']}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.impl.LogStore", description="CCTB indexed log store")
+    parser.add_argument("--dir", default="logs/store", help="store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query = commands.add_parser("query", help="query records by time and level")
+    query.add_argument("--from", dest="start", type=parse_time, help="start time, e.g. 10:02")
+    query.add_argument("--to", dest="end", type=parse_end_time, help="end time (inclusive), e.g. 10:05")
+    query.add_argument("--level", action="append", help="exact level, repeatable (e.g. --level ERROR)")
+    query.add_argument("--min-level", help="minimum level (e.g. WARNING)")
+    query.add_argument("--limit", type=int, default=0, help="maximum number of records")
+    query.add_argument("--json", action="store_true", help="print raw JSON payloads")
+
+    commands.add_parser("stats", help="show store summary")
+
+    args = parser.parse_args(argv)
+    store = LogStore(args.dir)
+
+    if args.command == "stats":
+        print(json.dumps(store.stats(), indent=2, ensure_ascii=False))
+        return 0
+
+    levels = [logging.getLevelName(name.upper()) for name in (args.level or [])]
+    min_level = logging.getLevelName(args.min_level.upper()) if args.min_level else None
+    if any(not isinstance(levelno, int) for levelno in levels) or (min_level is not None and not isinstance(min_level, int)):
+        parser.error("unknown level")
+
+    started = time.perf_counter()
+    count = 0
+    for item in store.query(args.start, args.end, levels or None, min_level, args.limit or None):
+        print(item["payload"] if args.json else _render(item))
+        count += 1
+    print(f"-- {count} records in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
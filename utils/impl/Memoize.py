@@ -0,0 +1,323 @@
+"""
+记忆化缓存
+memoize装饰器为函数结果提供带过期时间（TTL）、LRU容量上限和命中统计的缓存，
+所有缓存按名称登记在同一个注册表中，可以按名称或全部失效，统计随性能统计一起输出
+
+使用方法：
+from utils.impl.Memoize import memoize
+
+@memoize(ttl=60, maxsize=32)
+def probe(host):
+    ...
+
+probe.invalidate("10.0.0.1")   # 失效某组参数的结果
+probe.cache_clear()            # 清空该函数的缓存
+"""
+import time
+import math
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Union
+from utils.impl.CacheRegistry import cache_registry, deep_sizeof, PRIORITY_RECOMPUTABLE
+
+# 过期时间：秒数、返回剩余秒数的函数（如到下一秒或下一天为止），None表示进程内永不过期
+TTL = Union[float, Callable[[], float], None]
+
+_MISSING = object()
+
+
+def _make_key(args: tuple, kwargs: dict):
+    """由调用参数生成缓存键，无参数的函数共用同一个键"""
+    if not kwargs:
+        return args
+    return args + (_MISSING,) + tuple(sorted(kwargs.items()))
+
+
+class MemoCache:
+    """单个函数的结果缓存，按最近使用顺序淘汰"""
+
+    def __init__(self, name: str, ttl: TTL = None, maxsize: Optional[int] = 128):
+        """
+        初始化结果缓存
+
+        Args:
+            name: 缓存名称（注册表中的键）
+            ttl: 默认过期时间
+            maxsize: 最多保留的条目数，None表示不限制
+        """
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # 键 -> (值, 过期时刻（monotonic），None表示不过期)
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 正在计算的键 -> 锁，同一组参数并发未命中时只计算一次
+        self._inflight: Dict[Any, threading.Lock] = {}
+
+        # 统计计数器
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.uncacheable = 0
+
+    def _deadline(self, ttl: TTL) -> Optional[float]:
+        if ttl is None:
+            return None
+        seconds = ttl() if callable(ttl) else ttl
+        return time.monotonic() + seconds
+
+    def get(self, key: Any, default: Any = _MISSING) -> Any:
+        """
+        查询缓存
+
+        Args:
+            key: 缓存键
+            default: 未命中时的返回值
+
+        Returns:
+            缓存的值，未命中或已过期时返回default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, deadline = entry
+            if deadline is not None and time.monotonic() >= deadline:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Any, value: Any, ttl: TTL = _MISSING):
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 值
+            ttl: 该条目的过期时间，不指定时使用缓存的默认值
+        """
+        self._store(key, value, self._deadline(self.ttl if ttl is _MISSING else ttl))
+
+    def _store(self, key: Any, value: Any, deadline: Optional[float]):
+        with self._lock:
+            self._entries[key] = (value, deadline)
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+    def get_or_compute(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """
+        查询缓存，未命中时计算并写入（计算抛出的异常不会被缓存）
+
+        Args:
+            key: 缓存键
+            compute: 计算函数
+
+        Returns:
+            缓存或新计算的值
+        """
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._inflight.get(key)
+            if key_lock is None:
+                key_lock = self._inflight[key] = threading.Lock()
+        with key_lock:
+            # 等待其他线程计算完成后再查一次（不计入统计）
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or time.monotonic() < entry[1]):
+                return entry[0]
+            try:
+                # 过期时间从开始计算时算起，计算跨过整秒等边界时不会把旧结果多保留一个周期
+                deadline = self._deadline(self.ttl)
+                value = compute()
+                self._store(key, value, deadline)
+                return value
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+    def invalidate(self, key: Any = _MISSING) -> int:
+        """
+        失效缓存条目
+
+        Args:
+            key: 要失效的键，不指定时清空整个缓存
+
+        Returns:
+            失效的条目数
+        """
+        with self._lock:
+            if key is _MISSING:
+                count = len(self._entries)
+                self._entries.clear()
+            else:
+                count = 1 if self._entries.pop(key, None) is not None else 0
+            self.invalidations += count
+            return count
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def estimate_size(self) -> int:
+        """估算缓存占用的字节数（抽样估算）"""
+        with self._lock:
+            return deep_sizeof(self._entries)
+
+    def shrink(self, target_bytes: int):
+        """
+        按最近使用顺序淘汰条目，直到估算大小不超过target_bytes（缓存注册表的收缩回调）
+
+        Args:
+            target_bytes: 收缩后的目标字节数
+        """
+        with self._lock:
+            count = len(self._entries)
+            if not count:
+                return
+            size = deep_sizeof(self._entries)
+            if size <= target_bytes:
+                return
+            drop = min(count, math.ceil((size - target_bytes) / (size / count)))
+            if drop == count:
+                # 全部淘汰时直接清空，同时释放字典的哈希表
+                self._entries.clear()
+            else:
+                for _ in range(drop):
+                    self._entries.popitem(last=False)
+            self.evictions += drop
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "uncacheable": self.uncacheable
+        }
+
+
+# 缓存注册表：名称 -> MemoCache
+_caches: Dict[str, MemoCache] = {}
+_registry_lock = threading.Lock()
+
+
+def register_cache(cache: MemoCache) -> MemoCache:
+    """
+    登记缓存，同名缓存只保留第一个
+
+    Args:
+        cache: 缓存实例
+
+    Returns:
+        注册表中的缓存实例
+    """
+    with _registry_lock:
+        registered = _caches.setdefault(cache.name, cache)
+    if registered is cache:
+        # 内存超过阈值时由资源优化器收缩
+        cache_registry.register(f"memo:{cache.name}", cache.estimate_size, cache.shrink, PRIORITY_RECOMPUTABLE)
+    return registered
+
+
+def get_cache(name: str) -> Optional[MemoCache]:
+    """按名称获取已登记的缓存"""
+    return _caches.get(name)
+
+
+def invalidate(name: Optional[str] = None) -> int:
+    """
+    按名称失效缓存
+
+    Args:
+        name: 缓存名称，None表示失效所有缓存
+
+    Returns:
+        失效的条目数
+    """
+    if name is not None:
+        cache = _caches.get(name)
+        return cache.invalidate() if cache is not None else 0
+    return sum(cache.invalidate() for cache in list(_caches.values()))
+
+
+def get_memo_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    获取所有已登记缓存的统计信息
+
+    Returns:
+        缓存名称 -> 统计信息
+    """
+    return {name: cache.get_stats() for name, cache in list(_caches.items())}
+
+
+def memoize(ttl: TTL = None, maxsize: Optional[int] = 128, name: Optional[str] = None) -> Callable:
+    """
+    记忆化装饰器，放在handle_exception之下时，出错返回的默认值不会被缓存
+
+    Args:
+        ttl: 过期时间（秒，或返回剩余秒数的函数），None表示进程内永不过期
+        maxsize: 最多保留的结果数（按最近使用淘汰），None表示不限制
+        name: 缓存名称，默认为"模块.函数名"
+    """
+    def decorator(func: Callable) -> Callable:
+        cache = register_cache(MemoCache(name or f"{func.__module__}.{func.__qualname__}", ttl, maxsize))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _make_key(args, kwargs)
+            try:
+                hash(key)
+            except TypeError:
+                # 参数不可哈希时直接调用
+                cache.uncacheable += 1
+                return func(*args, **kwargs)
+            return cache.get_or_compute(key, lambda: func(*args, **kwargs))
+
+        def invalidate_args(*args, **kwargs) -> int:
+            """失效某组参数的缓存结果"""
+            return cache.invalidate(_make_key(args, kwargs))
+
+        wrapper.cache = cache
+        wrapper.invalidate = invalidate_args
+        wrapper.cache_clear = cache.invalidate
+        wrapper.cache_info = cache.get_stats
+        return wrapper
+    return decorator
+
+
+def until_next_second() -> float:
+    """到下一个整秒为止的秒数，用作按秒变化的结果的过期时间"""
+    return 1.0 - time.time() % 1.0
+
+
+def until_midnight() -> float:
+    """到本地时间下一个零点为止的秒数，用作按天变化的结果的过期时间"""
+    now = time.time()
+    local = time.localtime(now)
+    elapsed = local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec + now % 1.0
+    return max(0.001, 86400 - elapsed)
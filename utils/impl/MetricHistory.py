@@ -0,0 +1,401 @@
+"""
+指标时间序列存储
+每个指标一列预分配的array('d')环形缓冲，另有一列时间戳，追加一个采样只是几次数组赋值。
+滚动窗口（整个历史，或最近N秒）在追加时增量维护每个指标的计数、总和、最小值和最大值
+（最小/最大值用单调队列，均摊O(1)），以及一个分桶分位数草图，
+因此读取均值、最值和p50/p95/p99的开销与历史长度无关，历史可以保留数小时的1秒采样
+
+分位数草图按对数分桶（相对误差约1%），窗口移出的采样从桶中减去；桶数固定，
+读取分位数只需一次桶数组的前缀和（在C中完成）和二分查找，结果缓存到下一次采样
+
+均值和分位数按时间加权：每个采样的权重是它与上一个采样的间隔（即它所度量的时段，
+CPU占用和各种速率都是这段时间内的平均值）。采样间隔会自适应变化，高负载时采样更密，
+按采样数平均会高估均值和p95；按时间加权后结果与采样频率无关。count仍是采样数，最值和last不加权
+"""
+import math
+import bisect
+import threading
+from array import array
+from collections import deque
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 分位数草图：相邻桶的比例，相对误差约为(GAMMA - 1) / 2
+SKETCH_GAMMA = 1.02
+# 草图覆盖的取值范围，小于SKETCH_MIN的值（包括0）计入零桶，超出SKETCH_MAX的值计入最后一个桶
+SKETCH_MIN = 0.01
+SKETCH_MAX = 1e9
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+# 采样权重（毫秒，整数以便移出窗口时精确相减）的范围：第一个采样没有上一个采样，按DEFAULT_WEIGHT计；
+# 进程挂起后的长间隔最多按MAX_WEIGHT计，避免一个采样压过整个窗口
+DEFAULT_WEIGHT = 1000
+MAX_WEIGHT = 60000
+
+_LOG_GAMMA = math.log(SKETCH_GAMMA)
+_MIN_KEY = math.ceil(math.log(SKETCH_MIN) / _LOG_GAMMA)
+_MAX_KEY = math.ceil(math.log(SKETCH_MAX) / _LOG_GAMMA)
+_BUCKETS = _MAX_KEY - _MIN_KEY + 1
+
+
+class QuantileSketch:
+    """支持删除的对数分桶分位数草图，每个值可以带整数权重"""
+
+    __slots__ = ("counts", "zeros", "total", "low", "high", "_cache")
+
+    def __init__(self):
+        self.counts = array("l", bytes(_BUCKETS * array("l").itemsize))
+        self.zeros = 0
+        self.total = 0
+        # 曾经有过采样的桶的范围[low, high)，读取分位数时只需累加这一段
+        self.low = _BUCKETS
+        self.high = 0
+        # 分位数 -> 估计值，采样变化后清空
+        self._cache: Dict[float, float] = {}
+
+    @staticmethod
+    def _bucket(value: float) -> int:
+        if value >= SKETCH_MAX:
+            return _BUCKETS - 1
+        return math.ceil(math.log(value) / _LOG_GAMMA) - _MIN_KEY
+
+    def add(self, value: float, weight: int = 1):
+        if value < SKETCH_MIN:
+            self.zeros += weight
+        else:
+            bucket = self._bucket(value)
+            self.counts[bucket] += weight
+            if bucket < self.low:
+                self.low = bucket
+            if bucket >= self.high:
+                self.high = bucket + 1
+        self.total += weight
+        self._cache.clear()
+
+    def remove(self, value: float, weight: int = 1):
+        if value < SKETCH_MIN:
+            self.zeros -= weight
+        else:
+            self.counts[self._bucket(value)] -= weight
+        self.total -= weight
+        self._cache.clear()
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> List[float]:
+        """
+        估计多个分位数
+
+        Args:
+            qs: 分位数列表（0~1）
+
+        Returns:
+            估计值列表，没有采样时为0.0
+        """
+        missing = [q for q in qs if q not in self._cache]
+        if missing and self.total:
+            # cumulative[i]为零桶与low起前i个桶的权重之和，累加在C中完成，每个分位数再二分查找所在的桶
+            low = min(self.low, self.high)
+            cumulative = list(accumulate(self.counts[low:self.high], initial=self.zeros))
+            for q in missing:
+                position = bisect.bisect_right(cumulative, q * (self.total - 1)) - 1
+                if position < 0:
+                    self._cache[q] = 0.0
+                else:
+                    key = min(low + position, _BUCKETS - 1) + _MIN_KEY
+                    self._cache[q] = 2 * SKETCH_GAMMA ** key / (SKETCH_GAMMA + 1)
+        return [self._cache.get(q, 0.0) for q in qs]
+
+    def quantile(self, q: float) -> float:
+        """估计单个分位数"""
+        return self.quantiles((q,))[0]
+
+
+class _Aggregate:
+    """窗口内一个指标的增量统计"""
+
+    __slots__ = ("column", "sum", "min_queue", "max_queue", "sketch")
+
+    def __init__(self, column: array):
+        self.column = column
+        # 按权重加权的总和
+        self.sum = 0.0
+        # 单调队列中保存采样序号，队首分别是窗口内最小值和最大值的序号
+        self.min_queue = deque()
+        self.max_queue = deque()
+        self.sketch = QuantileSketch()
+
+
+class RollingWindow:
+    """时间序列上的滚动窗口：整个历史，或最近duration秒"""
+
+    def __init__(self, history: "MetricHistory", duration: Optional[float] = None):
+        """
+        初始化滚动窗口
+
+        Args:
+            history: 所属的时间序列
+            duration: 窗口时长（秒），None表示整个历史
+        """
+        self.history = history
+        self.duration = duration
+        # 窗口内最早采样的序号，窗口为[start, history.sequence)
+        self.start = history.sequence
+        # 窗口内采样的总权重（毫秒）
+        self.weight = 0
+        self.aggregates = {name: _Aggregate(column) for name, column in history.columns.items()}
+
+    @property
+    def count(self) -> int:
+        """窗口内的采样数"""
+        return self.history.sequence - self.start
+
+    def _evict(self):
+        """移出窗口内最早的采样（调用时该采样仍在环形缓冲中）"""
+        seq = self.start
+        index = seq % self.history.capacity
+        weight = self.history.weights[index]
+        self.weight -= weight
+        for aggregate in self.aggregates.values():
+            value = aggregate.column[index]
+            aggregate.sum -= value * weight
+            aggregate.sketch.remove(value, weight)
+            if aggregate.min_queue and aggregate.min_queue[0] == seq:
+                aggregate.min_queue.popleft()
+            if aggregate.max_queue and aggregate.max_queue[0] == seq:
+                aggregate.max_queue.popleft()
+        self.start += 1
+        if self.start == self.history.sequence:
+            # 窗口为空时重置总和，消除浮点累计误差
+            self.weight = 0
+            for aggregate in self.aggregates.values():
+                aggregate.sum = 0.0
+
+    def _before_overwrite(self, seq: int):
+        """序号为seq的采样即将覆盖seq - capacity，先把被覆盖的采样移出窗口"""
+        oldest_kept = seq + 1 - self.history.capacity
+        while self.start < oldest_kept:
+            self._evict()
+
+    def _push(self, seq: int):
+        """把刚写入的采样加入窗口，并移出超出时长的采样"""
+        capacity = self.history.capacity
+        index = seq % capacity
+        weight = self.history.weights[index]
+        self.weight += weight
+        for aggregate in self.aggregates.values():
+            column = aggregate.column
+            value = column[index]
+            aggregate.sum += value * weight
+            aggregate.sketch.add(value, weight)
+            min_queue = aggregate.min_queue
+            while min_queue and column[min_queue[-1] % capacity] >= value:
+                min_queue.pop()
+            min_queue.append(seq)
+            max_queue = aggregate.max_queue
+            while max_queue and column[max_queue[-1] % capacity] <= value:
+                max_queue.pop()
+            max_queue.append(seq)
+
+        if self.duration is not None:
+            timestamps = self.history.timestamps
+            cutoff = timestamps[index] - self.duration
+            while self.start < seq and timestamps[self.start % capacity] < cutoff:
+                self._evict()
+
+    def stats(self, name: str, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, float]:
+        """
+        获取窗口内一个指标的统计
+
+        Args:
+            name: 指标名称
+            quantiles: 需要的分位数
+
+        Returns:
+            count（采样数）、mean、min、max、last以及p50/p95/p99等分位数，均值和分位数按时间加权
+        """
+        with self.history._lock:
+            aggregate = self.aggregates[name]
+            count = self.count
+            result = {"count": count, "mean": 0.0, "min": 0.0, "max": 0.0, "last": 0.0}
+            if count:
+                capacity = self.history.capacity
+                column = aggregate.column
+                result["mean"] = aggregate.sum / self.weight
+                result["min"] = column[aggregate.min_queue[0] % capacity]
+                result["max"] = column[aggregate.max_queue[0] % capacity]
+                result["last"] = column[(self.history.sequence - 1) % capacity]
+            for q, value in zip(quantiles, aggregate.sketch.quantiles(quantiles)):
+                # 桶的代表值可能略超出实际范围，限制在窗口的最值之间
+                result[f"p{q * 100:g}"] = min(max(value, result["min"]), result["max"])
+            return result
+
+    def mean(self, name: str) -> float:
+        """窗口内一个指标按时间加权的均值"""
+        return self.aggregates[name].sum / self.weight if self.count else 0.0
+
+
+class MetricHistory:
+    """多个指标共用时间戳列的环形时间序列"""
+
+    def __init__(self, metrics: Sequence[str], capacity: int = 3600):
+        """
+        初始化时间序列
+
+        Args:
+            metrics: 指标名称列表
+            capacity: 保留的采样数
+        """
+        self.metrics = tuple(metrics)
+        self.capacity = max(1, int(capacity))
+        # 已写入的采样总数，下一个采样的序号
+        self.sequence = 0
+        self.timestamps = self._allocate(self.capacity)
+        # 每个采样的权重（毫秒）
+        self.weights = self._allocate_weights(self.capacity)
+        self.columns: Dict[str, array] = {name: self._allocate(self.capacity) for name in self.metrics}
+        # 采样线程写入，其他线程读取统计
+        self._lock = threading.RLock()
+        # 时长 -> 滚动窗口，None为整个历史
+        self._windows: Dict[Optional[float], RollingWindow] = {}
+        self.window(None)
+
+    @staticmethod
+    def _allocate(capacity: int) -> array:
+        return array("d", bytes(capacity * 8))
+
+    @staticmethod
+    def _allocate_weights(capacity: int) -> array:
+        return array("q", bytes(capacity * 8))
+
+    def __len__(self) -> int:
+        return min(self.sequence, self.capacity)
+
+    @property
+    def sample_bytes(self) -> int:
+        """每个采样占用的字节数（时间戳、权重和各指标）"""
+        return (len(self.metrics) + 2) * 8
+
+    def window(self, duration: Optional[float] = None) -> RollingWindow:
+        """
+        获取（必要时创建）滚动窗口，新窗口从现有的采样开始统计
+
+        Args:
+            duration: 窗口时长（秒），None表示整个历史
+
+        Returns:
+            滚动窗口
+        """
+        with self._lock:
+            window = self._windows.get(duration)
+            if window is None:
+                window = RollingWindow(self, duration)
+                # 回放仍在缓冲中的采样
+                window.start = self.sequence - len(self)
+                end = self.sequence
+                self.sequence = window.start
+                for seq in range(window.start, end):
+                    self.sequence = seq + 1
+                    window._push(seq)
+                self._windows[duration] = window
+            return window
+
+    def append(self, timestamp: float, values: Sequence[float]):
+        """
+        追加一个采样
+
+        Args:
+            timestamp: 采样时间戳
+            values: 各指标的值，顺序与metrics一致
+        """
+        with self._lock:
+            seq = self.sequence
+            if seq:
+                elapsed = timestamp - self.timestamps[(seq - 1) % self.capacity]
+                weight = min(max(1, round(elapsed * 1000)), MAX_WEIGHT)
+            else:
+                weight = DEFAULT_WEIGHT
+            windows = self._windows.values()
+            for window in windows:
+                window._before_overwrite(seq)
+
+            index = seq % self.capacity
+            self.timestamps[index] = timestamp
+            self.weights[index] = weight
+            for column, value in zip(self.columns.values(), values):
+                column[index] = value
+            self.sequence = seq + 1
+
+            for window in windows:
+                window._push(seq)
+
+    def stats(self, name: str, duration: Optional[float] = None,
+              quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, float]:
+        """
+        获取一个指标在窗口内的统计
+
+        Args:
+            name: 指标名称
+            duration: 窗口时长（秒），None表示整个历史
+            quantiles: 需要的分位数
+
+        Returns:
+            统计字典
+        """
+        with self._lock:
+            return self.window(duration).stats(name, quantiles)
+
+    def samples(self, name: str, since: Optional[float] = None) -> List[Tuple[float, float]]:
+        """
+        按时间顺序获取一个指标的采样
+
+        Args:
+            name: 指标名称
+            since: 只返回不早于该时间戳的采样
+
+        Returns:
+            (时间戳, 值)列表
+        """
+        with self._lock:
+            column = self.columns[name]
+            start = self.sequence - len(self)
+            indexes = [seq % self.capacity for seq in range(start, self.sequence)]
+            times = [self.timestamps[i] for i in indexes]
+            first = bisect.bisect_left(times, since) if since is not None else 0
+            return [(times[k], column[indexes[k]]) for k in range(first, len(indexes))]
+
+    def resize(self, capacity: int):
+        """
+        调整保留的采样数，保留最新的采样，所有窗口重新统计
+
+        Args:
+            capacity: 新的采样数
+        """
+        with self._lock:
+            capacity = max(1, int(capacity))
+            if capacity == self.capacity:
+                return
+            keep = min(len(self), capacity)
+            start = self.sequence - keep
+            old_indexes = [seq % self.capacity for seq in range(start, self.sequence)]
+            timestamps = self._allocate(capacity)
+            weights = self._allocate_weights(capacity)
+            columns = {name: self._allocate(capacity) for name in self.metrics}
+            for k, old in enumerate(old_indexes):
+                timestamps[k] = self.timestamps[old]
+                weights[k] = self.weights[old]
+                for name in self.metrics:
+                    columns[name][k] = self.columns[name][old]
+
+            durations = list(self._windows)
+            self.capacity = capacity
+            self.timestamps = timestamps
+            self.weights = weights
+            self.columns = columns
+            self.sequence = keep
+            self._windows = {}
+            for duration in durations:
+                self.window(duration)
+
+    def estimate_size(self) -> int:
+        """估算占用的字节数（预分配的数组和各窗口的分位数草图）"""
+        arrays = self.capacity * self.sample_bytes
+        sketches = len(self._windows) * len(self.metrics) * _BUCKETS * array("l").itemsize
+        return arrays + sketches
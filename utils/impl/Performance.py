@@ -5,33 +5,130 @@
 
 from __future__ import annotations
 import gc
-import os
-import psutil
-import threading
 import time
 from typing import Dict, List, Callable, Any
-from collections import deque
 from utils import UtilsManager as utils
-from utils.impl.ErrorHandler import handle_exception, SystemError
+from utils.impl.ErrorHandler import handle_exception, SystemError, get_error_stats
+from utils.impl.ConfigManager import config
+from utils.impl.Memoize import get_memo_stats
+from utils.impl.CacheRegistry import cache_registry, PRIORITY_HISTORY
+from utils.impl.MetricHistory import MetricHistory
+from utils.impl.ProcessSampler import sampler
+from utils.impl.Scheduler import scheduler
+from utils.impl.RuleEngine import Rule, compile_rules
+
+# 高资源占用警告的最小间隔（秒），期间被抑制的次数在下一条警告中给出
+HIGH_USAGE_WARN_INTERVAL = 300.0
+
+
+class AdaptiveInterval:
+    """
+    自适应采样间隔：指标变化快或接近阈值时间隔减半直到下限，读数平稳时逐步放宽直到上限，
+    并且间隔不小于让监控自身CPU占用不超过预算所需的最小值
+    """
+    
+    # 变化快时间隔乘以SHRINK，平稳时乘以GROW
+    SHRINK = 0.5
+    GROW = 1.25
+    # 相邻两次采样CPU变化超过的百分点数、内存变化超过的比例、线程数变化超过的个数视为变化快
+    # （线程池和一次性任务的线程随时创建和退出，线程数差一两个不算变化）
+    CPU_DELTA = 10.0
+    MEMORY_DELTA = 0.02
+    THREAD_DELTA = 2
+    # 达到阈值的这一比例视为接近阈值
+    NEAR_THRESHOLD = 0.8
+    
+    def __init__(self, floor: float, ceiling: float, budget_percent: float):
+        """
+        初始化自适应采样间隔
+        
+        Args:
+            floor: 最短间隔（秒）
+            ceiling: 最长间隔（秒）
+            budget_percent: 监控自身允许占用的CPU（单核百分比）
+        """
+        self.floor = min(floor, ceiling)
+        self.ceiling = max(floor, ceiling)
+        self.budget_percent = budget_percent
+        self.adjustments = 0
+        self.last_reason = ""
+        
+    def budget_floor(self, sample_cost: float) -> float:
+        """按每次采样的CPU开销计算满足预算的最短间隔"""
+        return sample_cost * 100 / self.budget_percent
+        
+    def next_interval(self, interval: float, stats: Dict[str, Any], previous: Dict[str, Any],
+                      sample_cost: float) -> float:
+        """
+        根据最近两次采样计算下一个采样间隔
+        
+        Args:
+            interval: 当前间隔（秒）
+            stats: 本次采样
+            previous: 上一次采样，没有时为None
+            sample_cost: 每次采样的CPU开销（秒，平滑值）
+            
+        Returns:
+            下一个采样间隔（秒）
+        """
+        values = config.values
+        cpu = stats.get("cpu", 0)
+        memory_mb = stats.get("memory_mb", 0)
+        
+        if cpu >= values.cpu_threshold_percent * self.NEAR_THRESHOLD or \
+                memory_mb >= values.memory_threshold_mb * self.NEAR_THRESHOLD:
+            reason = "near threshold"
+        elif previous is not None and (
+                abs(cpu - previous.get("cpu", 0)) > self.CPU_DELTA or
+                abs(memory_mb - previous.get("memory_mb", 0)) > previous.get("memory_mb", 0) * self.MEMORY_DELTA or
+                abs(stats.get("threads", 0) - previous.get("threads", 0)) > self.THREAD_DELTA):
+            reason = "changing"
+        else:
+            reason = "stable"
+        
+        target = interval * (self.GROW if reason == "stable" else self.SHRINK)
+        target = min(self.ceiling, max(self.floor, target))
+        
+        budget_floor = self.budget_floor(sample_cost)
+        if target < budget_floor:
+            target = min(self.ceiling, budget_floor)
+            reason = "cpu budget"
+        
+        if target != interval:
+            self.adjustments += 1
+        self.last_reason = reason
+        return target
 
 
 class PerformanceMonitor:
     """性能监控器，用于跟踪系统资源使用情况"""
     
-    def __init__(self, max_history: int = 100):
+    # 历史记录中的指标，顺序与采样时追加的值一致
+    METRICS = ("cpu", "memory_mb", "threads")
+    # 内存紧张时历史记录最少保留的采样数
+    MIN_HISTORY = 60
+    # 采样开销的指数平滑系数
+    COST_SMOOTHING = 0.2
+    
+    def __init__(self, max_history: int = 3600):
         """
         初始化性能监控器
         
         Args:
-            max_history: 最大历史记录数量
+            max_history: 最大历史记录数量（预分配的采样数）
         """
         self.max_history = max_history
-        self.cpu_history = deque(maxlen=max_history)
-        self.memory_history = deque(maxlen=max_history)
-        self.thread_count_history = deque(maxlen=max_history)
+        # 带时间戳的数组环形缓冲，均值、最值和分位数增量维护
+        self.history = MetricHistory(self.METRICS, max_history)
         self.monitoring = False
-        self.monitor_thread = None
+        # 采样任务运行在全局调度器上
+        self.monitor_task = None
         self.monitor_interval = 1.0  # 默认1秒采样间隔
+        # 自适应采样，None表示固定间隔
+        self.adaptive: AdaptiveInterval = None
+        self._previous_sample: Dict[str, Any] = None
+        # 每次采样（含历史记录和回调）在调度线程上消耗的CPU时间，指数平滑
+        self.sample_cost = 0.0
         self.callbacks: List[Callable[[Dict[str, Any]], None]] = []
         
     def start_monitoring(self, interval: float = 1.0):
@@ -46,8 +143,9 @@ class PerformanceMonitor:
             
         self.monitor_interval = interval
         self.monitoring = True
-        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        # 采样服务在导入时就设置了CPU起点，重新设置并等一个周期再采样，第一次采样不包含启动阶段的CPU占用
+        sampler.prime()
+        self.monitor_task = scheduler.schedule_periodic("performance.monitor", self._sample, interval)
         utils.info(f"Performance monitoring started with {interval}s interval")
         
     def stop_monitoring(self):
@@ -56,45 +154,85 @@ class PerformanceMonitor:
             return
             
         self.monitoring = False
-        if self.monitor_thread and self.monitor_thread.is_alive():
-            self.monitor_thread.join(timeout=2.0)
+        scheduler.cancel(self.monitor_task, wait=True)
+        self.monitor_task = None
         utils.info("Performance monitoring stopped")
         
-    def _monitor_loop(self):
-        """监控循环"""
-        process = psutil.Process(os.getpid())
+    def set_interval(self, interval: float):
+        """
+        修改采样间隔，监控运行时立即生效
         
-        while self.monitoring:
-            try:
-                # 收集性能数据
-                cpu_percent = process.cpu_percent()
-                memory_info = process.memory_info()
-                memory_mb = memory_info.rss / (1024 * 1024)  # 转换为MB
-                thread_count = process.num_threads()
-                
-                # 存储历史数据
-                self.cpu_history.append(cpu_percent)
-                self.memory_history.append(memory_mb)
-                self.thread_count_history.append(thread_count)
-                
-                # 调用回调函数
-                perf_data = {
-                    "cpu": cpu_percent,
-                    "memory_mb": memory_mb,
-                    "threads": thread_count,
-                    "timestamp": time.time()
-                }
-                
-                for callback in self.callbacks:
-                    try:
-                        callback(perf_data)
-                    except Exception as e:
-                        utils.error(f"Performance callback error: {e}")
-                        
-                time.sleep(self.monitor_interval)
-            except Exception as e:
-                utils.error(f"Performance monitoring error: {e}")
-                time.sleep(self.monitor_interval)
+        Args:
+            interval: 监控间隔（秒）
+        """
+        self.monitor_interval = interval
+        if self.monitor_task is not None:
+            scheduler.reschedule(self.monitor_task, interval)
+        
+    def configure_adaptive(self, enabled: bool, floor: float = 0.5, ceiling: float = 30.0,
+                           budget_percent: float = 0.5):
+        """
+        启用或关闭自适应采样间隔
+        
+        Args:
+            enabled: 是否启用
+            floor: 最短间隔（秒）
+            ceiling: 最长间隔（秒）
+            budget_percent: 监控自身允许占用的CPU（单核百分比）
+        """
+        self.adaptive = AdaptiveInterval(floor, ceiling, budget_percent) if enabled else None
+        
+    def get_sampling_stats(self) -> Dict[str, Any]:
+        """
+        获取采样间隔和监控自身开销
+        
+        Returns:
+            统计信息字典，overhead_percent为监控占用的CPU（单核百分比）
+        """
+        adaptive = self.adaptive
+        return {
+            "interval": self.monitor_interval,
+            "adaptive": adaptive is not None,
+            "floor": adaptive.floor if adaptive else None,
+            "ceiling": adaptive.ceiling if adaptive else None,
+            "budget_percent": adaptive.budget_percent if adaptive else None,
+            "adjustments": adaptive.adjustments if adaptive else 0,
+            "last_reason": adaptive.last_reason if adaptive else "",
+            "sample_cost_ms": self.sample_cost * 1000,
+            "overhead_percent": self.sample_cost / self.monitor_interval * 100
+        }
+        
+    def _sample(self):
+        """采样一次（调度器任务）"""
+        started = time.thread_time()
+        try:
+            # 由共享的采样服务在一次oneshot中读取全部计数器
+            perf_data = sampler.sample()
+            
+            # 存储历史数据
+            self.history.append(perf_data["timestamp"],
+                                (perf_data["cpu"], perf_data["memory_mb"], perf_data["threads"]))
+            
+            # 调用回调函数
+            for callback in self.callbacks:
+                try:
+                    callback(perf_data)
+                except Exception as e:
+                    utils.error(f"Performance callback error: {e}")
+        except Exception as e:
+            utils.error(f"Performance monitoring error: {e}")
+            return
+        
+        cost = time.thread_time() - started
+        self.sample_cost = cost if not self.sample_cost else \
+            self.sample_cost + (cost - self.sample_cost) * self.COST_SMOOTHING
+        
+        adaptive = self.adaptive
+        if adaptive is not None:
+            interval = adaptive.next_interval(self.monitor_interval, perf_data, self._previous_sample, self.sample_cost)
+            if interval != self.monitor_interval:
+                self.set_interval(interval)
+        self._previous_sample = perf_data
                 
     def add_callback(self, callback: Callable[[Dict[str, Any]], None]):
         """
@@ -107,24 +245,14 @@ class PerformanceMonitor:
         
     def get_current_stats(self) -> Dict[str, Any]:
         """
-        获取当前性能统计
+        获取当前性能统计，监控运行时直接返回采样服务最近一次的采样
         
         Returns:
             包含当前性能统计的字典
         """
         try:
-            process = psutil.Process(os.getpid())
-            cpu_percent = process.cpu_percent()
-            memory_info = process.memory_info()
-            memory_mb = memory_info.rss / (1024 * 1024)
-            thread_count = process.num_threads()
-            
-            return {
-                "cpu": cpu_percent,
-                "memory_mb": memory_mb,
-                "threads": thread_count,
-                "timestamp": time.time()
-            }
+            # 允许一个采样间隔的延迟，避免监控线程睡眠抖动时重复采样
+            return sampler.latest(self.monitor_interval * 2 if self.monitoring else 0)
         except Exception as e:
             utils.error(f"Failed to get performance stats: {e}")
             return {
@@ -136,19 +264,75 @@ class PerformanceMonitor:
             
     def get_average_stats(self) -> Dict[str, float]:
         """
-        获取平均性能统计
+        获取平均性能统计（增量维护，不随历史长度增长）
         
         Returns:
             包含平均性能统计的字典
         """
-        if not self.cpu_history:
-            return {"cpu": 0, "memory_mb": 0, "threads": 0}
+        window = self.history.window()
+        return {name: window.mean(name) for name in self.METRICS}
+    
+    def get_history_stats(self, duration: float = None) -> Dict[str, Dict[str, float]]:
+        """
+        获取历史记录的统计（均值、最值、最新值和p50/p95/p99）
+        
+        Args:
+            duration: 只统计最近duration秒，None表示整个历史
             
-        return {
-            "cpu": sum(self.cpu_history) / len(self.cpu_history),
-            "memory_mb": sum(self.memory_history) / len(self.memory_history),
-            "threads": sum(self.thread_count_history) / len(self.thread_count_history)
-        }
+        Returns:
+            指标名称 -> 统计字典
+        """
+        return {name: self.history.stats(name, duration) for name in self.METRICS}
+    
+    def resize_history(self, max_history: int):
+        """
+        调整历史记录保留的采样数，保留最新的采样
+        
+        Args:
+            max_history: 新的采样数
+        """
+        self.max_history = max_history
+        self.history.resize(max_history)
+    
+    def estimate_history_size(self) -> int:
+        """估算历史记录占用的字节数"""
+        return self.history.estimate_size()
+    
+    def shrink_history(self, target_bytes: int):
+        """
+        缩小历史记录的容量，直到估算大小不超过target_bytes（缓存注册表的收缩回调），
+        数组是预分配的，只有缩小容量才能真正释放内存
+        
+        Args:
+            target_bytes: 收缩后的目标字节数
+        """
+        history = self.history
+        fixed = history.estimate_size() - history.capacity * history.sample_bytes
+        capacity = max(self.MIN_HISTORY, (target_bytes - fixed) // history.sample_bytes)
+        if capacity < history.capacity:
+            history.resize(capacity)
+
+
+# config.json中没有配置optimization_rules时使用的规则
+DEFAULT_OPTIMIZATION_RULES = (
+    {
+        "name": "high_memory",
+        "description": "High memory usage - shrink caches and trigger garbage collection",
+        "when": {"metric": "memory_mb", "stat": "last", "above": "memory_threshold_mb"},
+        "action": "optimize_memory",
+        "cooldown": 120,
+        "repeat": 600,
+        "max_per_hour": 10
+    },
+    {
+        "name": "high_cpu",
+        "description": "High CPU usage",
+        "when": {"metric": "cpu", "stat": "p95", "window": 60, "above": "cpu_threshold_percent"},
+        "action": "warn",
+        "cooldown": 300,
+        "max_per_hour": 6
+    }
+)
 
 
 class ResourceOptimizer:
@@ -162,50 +346,78 @@ class ResourceOptimizer:
             monitor: 性能监控器实例
         """
         self.monitor = monitor
-        self.optimization_rules = []
+        # 生效的规则：配置中的规则在前，add_rule()添加的规则在后
+        self.optimization_rules: List[Rule] = []
+        self.custom_rules: List[Rule] = []
         self.auto_optimize = False
         self.optimization_interval = 30.0  # 默认30秒检查一次
-        self.optimize_thread = None
+        # 优化任务运行在全局调度器上
+        self.optimize_task = None
         self.optimizing = False
+        # 最近一次内存优化从各缓存回收的字节数
+        self.last_reclaimed: Dict[str, int] = {}
+        # 规则可以使用的动作
+        self.actions = {
+            "optimize_memory": lambda stats, rule, values: self._optimize_memory(stats),
+            "collect_garbage": lambda stats, rule, values: gc.collect(),
+            "warn": self._warn
+        }
         
-        # 默认优化规则
-        self._setup_default_rules()
+        # 编译配置中的规则
+        self.load_rules(config.values.optimization_rules)
         
-    def _setup_default_rules(self):
-        """设置默认优化规则"""
-        # 内存使用过高时触发垃圾回收
-        self.add_rule(
-            condition=lambda stats: stats.get("memory_mb", 0) > 200,  # 超过200MB
-            action=lambda stats: self._optimize_memory(),
-            description="High memory usage - trigger garbage collection"
-        )
+    def load_rules(self, specs):
+        """
+        编译规则声明并替换配置中的规则，同名规则沿用原来的触发状态和历史
         
-        # CPU使用过高时记录警告
-        self.add_rule(
-            condition=lambda stats: stats.get("cpu", 0) > 80,  # 超过80%
-            action=lambda stats: utils.warn(f"High CPU usage: {stats.get('cpu', 0):.1f}%"),
-            description="High CPU usage - log warning"
-        )
+        Args:
+            specs: 规则声明列表，为空时使用DEFAULT_OPTIMIZATION_RULES
+        """
+        rules = compile_rules(specs or DEFAULT_OPTIMIZATION_RULES, self.monitor.history, self.actions, utils.warn)
+        # 只从配置中的旧规则沿用状态：add_rule()添加的规则以描述为名称，可能与配置规则同名，
+        # 它们保留在custom_rules中，状态不能转移给配置规则
+        custom = set(map(id, self.custom_rules))
+        previous = {rule.name: rule for rule in self.optimization_rules if id(rule) not in custom}
+        for rule in rules:
+            if rule.name in previous:
+                rule.inherit(previous[rule.name])
+        self.optimization_rules = rules + self.custom_rules
+        
+    def register_action(self, name: str, action: Callable[[Dict[str, Any], Rule, Dict[str, float]], None]):
+        """
+        登记规则可以使用的动作，需要在load_rules()之前登记
+        
+        Args:
+            name: 动作名称
+            action: 动作函数，接收本次采样、规则和条件读取到的值
+        """
+        self.actions[name] = action
+        
+    @staticmethod
+    def _warn(stats: Dict[str, Any], rule: Rule, values: Dict[str, float]):
+        """warn动作：记录警告和触发时读取到的值"""
+        details = ", ".join(f"{label} {value:.1f}" for label, value in values.items())
+        utils.warn(f"{rule.message or rule.description or rule.name}: {details}")
         
     def add_rule(self, condition: Callable[[Dict[str, Any]], bool], 
                  action: Callable[[Dict[str, Any]], None], 
                  description: str = ""):
         """
-        添加优化规则
+        添加优化规则（条件满足的每次检查都会执行动作）
         
         Args:
             condition: 条件函数，接收性能统计，返回布尔值
             action: 动作函数，接收性能统计
             description: 规则描述
         """
-        rule = {
-            "condition": condition,
-            "action": action,
-            "description": description,
-            "enabled": True,
-            "trigger_count": 0,
-            "last_triggered": 0
-        }
+        rule = Rule(
+            name=description or f"custom_{len(self.custom_rules) + 1}",
+            evaluate=lambda active, history, stats, values: condition(stats),
+            action=lambda stats, rule, values: action(stats),
+            description=description,
+            repeat=0
+        )
+        self.custom_rules.append(rule)
         self.optimization_rules.append(rule)
         
     def start_auto_optimization(self, interval: float = 30.0):
@@ -221,8 +433,7 @@ class ResourceOptimizer:
         self.optimization_interval = interval
         self.auto_optimize = True
         self.optimizing = True
-        self.optimize_thread = threading.Thread(target=self._optimize_loop, daemon=True)
-        self.optimize_thread.start()
+        self.optimize_task = scheduler.schedule_periodic("performance.optimize", self._optimize_tick, interval)
         utils.info(f"Auto optimization started with {interval}s interval")
         
     def stop_auto_optimization(self):
@@ -232,54 +443,71 @@ class ResourceOptimizer:
             
         self.optimizing = False
         self.auto_optimize = False
-        if self.optimize_thread and self.optimize_thread.is_alive():
-            self.optimize_thread.join(timeout=2.0)
+        scheduler.cancel(self.optimize_task, wait=True)
+        self.optimize_task = None
         utils.info("Auto optimization stopped")
         
-    def _optimize_loop(self):
-        """优化循环"""
-        while self.optimizing:
-            try:
-                stats = self.monitor.get_current_stats()
-                self._check_rules(stats)
-                time.sleep(self.optimization_interval)
-            except Exception as e:
-                utils.error(f"Auto optimization error: {e}")
-                time.sleep(self.optimization_interval)
+    def set_interval(self, interval: float):
+        """
+        修改优化检查间隔，自动优化运行时立即生效
+        
+        Args:
+            interval: 检查间隔（秒）
+        """
+        self.optimization_interval = interval
+        if self.optimize_task is not None:
+            scheduler.reschedule(self.optimize_task, interval)
+        
+    def _optimize_tick(self):
+        """检查一次优化规则（调度器任务）"""
+        try:
+            stats = self.monitor.get_current_stats()
+            self._check_rules(stats)
+        except Exception as e:
+            utils.error(f"Auto optimization error: {e}")
                 
     def _check_rules(self, stats: Dict[str, Any]):
-        """检查并执行优化规则"""
+        """对性能历史求值并执行满足条件的优化规则"""
         current_time = time.time()
+        history = self.monitor.history
         
         for rule in self.optimization_rules:
-            if not rule["enabled"]:
+            if not rule.enabled:
                 continue
                 
             try:
-                if rule["condition"](stats):
-                    rule["action"](stats)
-                    rule["trigger_count"] += 1
-                    rule["last_triggered"] = current_time
-                    
-                    if rule["description"]:
-                        utils.debug(f"Optimization rule triggered: {rule['description']}")
+                if rule.check(current_time, history, stats):
+                    utils.debug(f"Optimization rule triggered: {rule.description or rule.name}")
             except Exception as e:
-                utils.error(f"Error executing optimization rule: {e}")
+                utils.error(f"Error executing optimization rule {rule.name}: {e}")
                 
-    def _optimize_memory(self):
-        """执行内存优化"""
+    def _optimize_memory(self, stats: Dict[str, Any] = None):
+        """
+        执行内存优化：按优先级收缩已登记的缓存，直到估算回收的字节数覆盖超出阈值的部分，再做一次垃圾回收
+
+        Args:
+            stats: 触发优化时的性能统计，不提供时重新采样
+        """
         try:
             # 获取优化前的内存使用
-            before_mb = self.monitor.get_current_stats().get("memory_mb", 0)
+            before_mb = (stats or self.monitor.get_current_stats()).get("memory_mb", 0)
+            over_bytes = int((before_mb - config.values.memory_threshold_mb) * 1024 * 1024)
+            
+            # 收缩缓存
+            reclaimed = cache_registry.reclaim(over_bytes) if over_bytes > 0 else {}
             
             # 强制垃圾回收
             collected = gc.collect()
             
-            # 获取优化后的内存使用
-            after_mb = self.monitor.get_current_stats().get("memory_mb", 0)
+            # 获取优化后的内存使用（需要回收后的新采样）
+            after_mb = sampler.sample().get("memory_mb", 0)
             saved_mb = before_mb - after_mb
             
+            if reclaimed:
+                details = ", ".join(f"{name} {freed / 1024:.1f} KB" for name, freed in reclaimed.items())
+                utils.info(f"Memory optimization: reclaimed {sum(reclaimed.values()) / 1024:.1f} KB from caches ({details})")
             utils.info(f"Memory optimization: collected {collected} objects, freed {saved_mb:.2f} MB")
+            self.last_reclaimed = reclaimed
         except Exception as e:
             utils.error(f"Memory optimization failed: {e}")
             
@@ -293,17 +521,9 @@ class ResourceOptimizer:
         获取优化规则状态
         
         Returns:
-            规则状态列表
-        """
-        return [
-            {
-                "description": rule["description"],
-                "enabled": rule["enabled"],
-                "trigger_count": rule["trigger_count"],
-                "last_triggered": rule["last_triggered"]
-            }
-            for rule in self.optimization_rules
-        ]
+            规则状态列表，包含是否处于触发状态、触发次数和最近的触发历史
+        """
+        return [rule.get_status() for rule in self.optimization_rules]
 
 
 # 全局性能监控器和优化器实例
@@ -317,19 +537,93 @@ def initialize_performance_manager():
     global _monitor, _optimizer
     
     if _monitor is None:
-        _monitor = PerformanceMonitor()
+        _monitor = PerformanceMonitor(config.values.performance_history_size)
         _optimizer = ResourceOptimizer(_monitor)
+        _configure_adaptive(config.snapshot())
+        
+        # 添加性能监控回调，记录到日志；采样间隔可能只有零点几秒，警告按时间限流
+        last_warned = None
+        suppressed = 0
         
-        # 添加性能监控回调，记录到日志
         def log_performance(stats):
+            nonlocal last_warned, suppressed
             if stats.get("cpu", 0) > 70 or stats.get("memory_mb", 0) > 150:
-                utils.warn(f"High resource usage: CPU {stats.get('cpu', 0):.1f}%, Memory {stats.get('memory_mb', 0):.1f}MB")
+                now = time.monotonic()
+                if last_warned is not None and now - last_warned < HIGH_USAGE_WARN_INTERVAL:
+                    suppressed += 1
+                    return
+                note = f" ({suppressed} similar warnings suppressed)" if suppressed else ""
+                last_warned = now
+                suppressed = 0
+                utils.warn(f"High resource usage: CPU {stats.get('cpu', 0):.1f}%, Memory {stats.get('memory_mb', 0):.1f}MB{note}")
                 
         _monitor.add_callback(log_performance)
         
+        # 性能历史也登记为可收缩的缓存
+        cache_registry.register("performance.history", _monitor.estimate_history_size, _monitor.shrink_history,
+                                PRIORITY_HISTORY)
+        
+        # 配置热加载后调整采样和优化间隔、启停监控，不需要重启
+        config.subscribe(_on_config_change, (
+            "performance_monitoring",
+            "performance_monitor_interval",
+            "performance_adaptive_sampling",
+            "performance_monitor_min_interval",
+            "performance_monitor_max_interval",
+            "performance_monitor_cpu_budget",
+            "performance_auto_optimize",
+            "performance_optimize_interval",
+            "performance_history_size",
+            "optimization_rules"
+        ))
+        
         utils.info("Performance manager initialized")
 
 
+def _configure_adaptive(snapshot):
+    """按配置快照启用或关闭监控器的自适应采样"""
+    _monitor.configure_adaptive(
+        snapshot["performance_adaptive_sampling"],
+        snapshot["performance_monitor_min_interval"],
+        snapshot["performance_monitor_max_interval"],
+        snapshot["performance_monitor_cpu_budget"]
+    )
+
+
+def _on_config_change(changed: frozenset, snapshot):
+    """配置变化回调：把新的监控配置应用到正在运行的监控器和优化器"""
+    if _monitor is None:
+        return
+    
+    if "performance_monitor_interval" in changed:
+        _monitor.set_interval(snapshot.get("performance_monitor_interval", _monitor.monitor_interval))
+    if changed & {"performance_adaptive_sampling", "performance_monitor_min_interval",
+                  "performance_monitor_max_interval", "performance_monitor_cpu_budget"}:
+        _configure_adaptive(snapshot)
+        # 关闭自适应采样后回到配置的固定间隔
+        if _monitor.adaptive is None:
+            _monitor.set_interval(snapshot.get("performance_monitor_interval", _monitor.monitor_interval))
+    if "performance_history_size" in changed:
+        _monitor.resize_history(snapshot.get("performance_history_size", _monitor.max_history))
+    if "optimization_rules" in changed:
+        _optimizer.load_rules(snapshot.get("optimization_rules", ()))
+    if "performance_optimize_interval" in changed:
+        _optimizer.set_interval(snapshot.get("performance_optimize_interval", _optimizer.optimization_interval))
+    
+    if "performance_monitoring" in changed:
+        if snapshot.get("performance_monitoring", True):
+            _monitor.start_monitoring(_monitor.monitor_interval)
+        else:
+            _monitor.stop_monitoring()
+    if "performance_auto_optimize" in changed:
+        if snapshot.get("performance_auto_optimize", True) and _monitor.monitoring:
+            _optimizer.start_auto_optimization(_optimizer.optimization_interval)
+        else:
+            _optimizer.stop_auto_optimization()
+    
+    utils.info(f"Performance settings updated: {', '.join(sorted(changed))}")
+
+
 @handle_exception(SystemError, default_return=None, error_message="Failed to start performance monitoring")
 def start_performance_monitoring(interval: float = 5.0, auto_optimize: bool = True, 
                                 optimize_interval: float = 30.0):
@@ -369,13 +663,23 @@ def get_performance_stats() -> Dict[str, Any]:
     if _monitor is None:
         return {}
         
+    from utils.impl.AdvancedLog import logger
+    
     current = _monitor.get_current_stats()
     average = _monitor.get_average_stats()
     
     return {
         "current": current,
         "average": average,
-        "rules": _optimizer.get_rules_status() if _optimizer else []
+        "sampler": sampler.get_stats(),
+        "sampling": _monitor.get_sampling_stats(),
+        "scheduler": scheduler.get_stats(),
+        "history": _monitor.get_history_stats(),
+        "rules": _optimizer.get_rules_status() if _optimizer else [],
+        "errors": get_error_stats(),
+        "caches": cache_registry.get_stats(),
+        "memo": get_memo_stats(),
+        "logging": logger.get_stats()
     }
 
 
@@ -0,0 +1,180 @@
+"""
+进程采样服务
+整个进程只持有一个长期存在的psutil.Process，所有计数器在一次process.oneshot()中读取：
+CPU占用、内存、线程数、I/O字节数、上下文切换次数、句柄数（Windows）或文件描述符数、每个线程的CPU占用。
+监控器、优化器和界面都读取最近一次的采样，不再各自创建Process对象
+（新建的Process第一次调用cpu_percent()总是返回0.0）
+
+每次采样都记录耗时和采样本身消耗的CPU时间，用于控制监控开销
+"""
+import os
+import time
+import threading
+from typing import Any, Dict, List, Optional
+import psutil
+
+BYTES_PER_MB = 1024 * 1024
+# 采样结果中最多保留的线程数（按CPU占用排序）
+MAX_THREADS_REPORTED = 16
+
+
+class ProcessSampler:
+    """进程采样服务，线程安全"""
+
+    def __init__(self, pid: Optional[int] = None):
+        """
+        初始化进程采样服务
+
+        Args:
+            pid: 进程ID，默认为当前进程
+        """
+        self._process = psutil.Process(pid or os.getpid())
+        # 先调用一次，之后每次cpu_percent()都是相对上一次采样的占用
+        self._process.cpu_percent(None)
+        self._lock = threading.Lock()
+        self._latest: Optional[Dict[str, Any]] = None
+        # 上一次采样的累计计数器，用于计算速率
+        self._previous: Dict[str, Any] = {}
+        # 当前平台或权限不支持的计数器，之后不再尝试
+        self._unsupported = set()
+
+        # 统计计数器
+        self._samples = 0
+        self._sample_time = 0.0
+        self._sample_cpu_time = 0.0
+        self._max_sample_time = 0.0
+
+    def prime(self):
+        """
+        重新设置CPU占用的起点，下一次采样的cpu只统计从现在开始的占用
+        全局实例在导入时创建，开始周期采样前调用，避免第一次采样把启动阶段（导入、加载配置）的CPU占用算进去
+        """
+        with self._lock:
+            self._process.cpu_percent(None)
+
+    def _read(self, name: str, reader):
+        """读取一个可选的计数器，不支持时返回None并记住"""
+        if name in self._unsupported:
+            return None
+        try:
+            return reader()
+        except (psutil.AccessDenied, NotImplementedError, AttributeError):
+            self._unsupported.add(name)
+            return None
+
+    def sample(self) -> Dict[str, Any]:
+        """
+        立即采样一次
+
+        Returns:
+            采样结果，包含cpu、memory_mb、threads、timestamp以及扩展计数器
+        """
+        with self._lock:
+            started = time.perf_counter()
+            cpu_started = time.thread_time()
+            process = self._process
+
+            with process.oneshot():
+                timestamp = time.time()
+                cpu_percent = process.cpu_percent(None)
+                cpu_times = process.cpu_times()
+                memory_info = process.memory_info()
+                thread_count = process.num_threads()
+                io = self._read("io_counters", process.io_counters)
+                ctx = self._read("num_ctx_switches", process.num_ctx_switches)
+                handles = self._read("num_handles", process.num_handles) if os.name == "nt" else \
+                    self._read("num_fds", process.num_fds)
+                threads = self._read("threads", process.threads)
+
+            previous = self._previous
+            elapsed = timestamp - previous["timestamp"] if previous else 0.0
+            current = {
+                "timestamp": timestamp,
+                "io_read": io.read_bytes if io else None,
+                "io_write": io.write_bytes if io else None,
+                "ctx": ctx.voluntary + ctx.involuntary if ctx else None,
+                "threads": {thread.id: thread.user_time + thread.system_time for thread in threads} if threads else {}
+            }
+
+            result = {
+                "cpu": cpu_percent,
+                "memory_mb": memory_info.rss / BYTES_PER_MB,
+                "vms_mb": memory_info.vms / BYTES_PER_MB,
+                "threads": thread_count,
+                "timestamp": timestamp,
+                "cpu_user": cpu_times.user,
+                "cpu_system": cpu_times.system,
+                "io_read_bytes": current["io_read"],
+                "io_write_bytes": current["io_write"],
+                "io_read_rate": self._rate(current, previous, "io_read", elapsed),
+                "io_write_rate": self._rate(current, previous, "io_write", elapsed),
+                "ctx_switches": current["ctx"],
+                "ctx_switch_rate": self._rate(current, previous, "ctx", elapsed),
+                "handles": handles,
+                "thread_cpu": self._thread_cpu(current["threads"], previous.get("threads", {}), elapsed)
+            }
+            self._previous = current
+            self._latest = result
+
+            duration = time.perf_counter() - started
+            self._samples += 1
+            self._sample_time += duration
+            self._sample_cpu_time += time.thread_time() - cpu_started
+            if duration > self._max_sample_time:
+                self._max_sample_time = duration
+            return result
+
+    @staticmethod
+    def _rate(current: Dict[str, Any], previous: Dict[str, Any], key: str, elapsed: float) -> Optional[float]:
+        """由两次采样的累计值计算每秒速率"""
+        if elapsed <= 0 or current[key] is None or previous.get(key) is None:
+            return None
+        return max(0.0, (current[key] - previous[key]) / elapsed)
+
+    @staticmethod
+    def _thread_cpu(current: Dict[int, float], previous: Dict[int, float], elapsed: float) -> List[Dict[str, Any]]:
+        """计算每个线程在两次采样之间的CPU占用（百分比），按占用从高到低排列"""
+        if elapsed <= 0 or not current:
+            return []
+        names = {thread.native_id: thread.name for thread in threading.enumerate()}
+        usage = []
+        for thread_id, cpu_time in current.items():
+            percent = max(0.0, (cpu_time - previous.get(thread_id, cpu_time)) / elapsed * 100)
+            usage.append({"id": thread_id, "name": names.get(thread_id, "?"), "cpu": percent})
+        usage.sort(key=lambda item: item["cpu"], reverse=True)
+        return usage[:MAX_THREADS_REPORTED]
+
+    def latest(self, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """
+        获取最近一次采样
+
+        Args:
+            max_age: 允许的最大采样年龄（秒），超过时重新采样；None表示只要有采样就直接返回
+
+        Returns:
+            采样结果
+        """
+        latest = self._latest
+        if latest is None or (max_age is not None and time.time() - latest["timestamp"] > max_age):
+            return self.sample()
+        return latest
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取采样服务自身的统计信息（采样次数、耗时和CPU开销）
+
+        Returns:
+            统计信息字典
+        """
+        samples = self._samples
+        return {
+            "samples": samples,
+            "avg_sample_ms": self._sample_time / samples * 1000 if samples else 0.0,
+            "max_sample_ms": self._max_sample_time * 1000,
+            "sample_cpu_seconds": self._sample_cpu_time,
+            "unsupported": sorted(self._unsupported)
+        }
+
+
+# 全局进程采样服务
+sampler = ProcessSampler()
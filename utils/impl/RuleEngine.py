@@ -0,0 +1,354 @@
+"""
+声明式优化规则
+规则写在config.json的optimization_rules中，加载时编译一次，之后每次检查只对共享的性能历史（MetricHistory）求值
+
+规则示例：
+    {
+        "name": "high_cpu",
+        "when": {"all": [
+            {"metric": "cpu", "stat": "p95", "window": 60, "above": "cpu_threshold_percent", "exit": 70},
+            {"metric": "threads", "stat": "mean", "window": 60, "above": 20}
+        ]},
+        "action": "warn",
+        "cooldown": 300,
+        "repeat": null,
+        "max_per_hour": 6
+    }
+
+- 条件：metric为指标名称，stat为mean、min、max、last或p50、p95、p99等分位数，window为滚动窗口时长（秒）；
+  不写window时stat只能是last，读取本次采样（可以使用采样中的任意字段，如io_write_rate）
+- 阈值：above/below为进入阈值，exit为退出阈值，可以是数字或config.json中的配置项名称（求值时读取，热加载后立即生效）；
+  不写exit时默认与进入阈值相差HYSTERESIS，条件满足后要回落过退出阈值才算解除，避免在阈值附近反复触发
+- 组合：all/any可以嵌套
+- 触发：条件进入时执行一次动作；repeat为持续满足时再次执行的间隔（秒，null表示不再执行），
+  cooldown为两次执行的最小间隔（秒），max_per_hour为每小时最多执行的次数
+"""
+from collections import deque
+from typing import Any, Callable, Dict, List, Mapping, Optional
+from utils.impl.ConfigManager import config, ConfigError
+
+# 未指定退出阈值时，退出阈值与进入阈值的相对差
+HYSTERESIS = 0.1
+# 每条规则保留的触发历史条数
+HISTORY_SIZE = 20
+# 统计量名称
+STATS = ("mean", "min", "max", "last")
+
+# 动作：接收本次采样、规则和条件读取到的值
+Action = Callable[[Dict[str, Any], "Rule", Dict[str, float]], None]
+# 编译后的条件：接收规则当前是否处于触发状态、性能历史、本次采样和记录读取值的字典
+Evaluator = Callable[[bool, Any, Dict[str, Any], Dict[str, float]], bool]
+
+
+def _threshold(value: Any, where: str) -> Callable[[], float]:
+    """把阈值（数字或配置项名称）编译为求值函数"""
+    if isinstance(value, bool):
+        raise ConfigError(f"{where}: threshold must be a number or a config key")
+    if isinstance(value, (int, float)):
+        number = float(value)
+        return lambda: number
+    if isinstance(value, str) and hasattr(config.values, value):
+        return lambda: float(getattr(config.values, value))
+    raise ConfigError(f"{where}: threshold must be a number or a config key, got {value!r}")
+
+
+def _compile_condition(spec: Mapping[str, Any], metrics: tuple, history, where: str) -> Evaluator:
+    """编译单个阈值条件"""
+    metric = spec.get("metric")
+    stat = spec.get("stat", "last")
+    window = spec.get("window")
+    if not isinstance(metric, str):
+        raise ConfigError(f"{where}: condition needs a metric")
+
+    quantile = None
+    if isinstance(stat, str) and stat.startswith("p"):
+        try:
+            quantile = float(stat[1:]) / 100
+        except ValueError:
+            quantile = -1
+        if not 0 < quantile < 1:
+            raise ConfigError(f"{where}: unknown stat {stat!r}")
+        key = f"p{quantile * 100:g}"
+    elif stat in STATS:
+        key = stat
+    else:
+        raise ConfigError(f"{where}: unknown stat {stat!r}")
+
+    if window is None:
+        if stat != "last":
+            raise ConfigError(f"{where}: stat {stat!r} needs a window")
+    elif isinstance(window, bool) or not isinstance(window, (int, float)) or window <= 0:
+        raise ConfigError(f"{where}: window must be a positive number of seconds")
+    elif metric not in metrics:
+        raise ConfigError(f"{where}: metric {metric!r} is not kept in history ({', '.join(metrics)})")
+
+    if ("above" in spec) == ("below" in spec):
+        raise ConfigError(f"{where}: condition needs exactly one of above/below")
+    above = "above" in spec
+    enter = _threshold(spec["above" if above else "below"], where)
+    if "exit" in spec:
+        exit_ = _threshold(spec["exit"], where)
+    else:
+        ratio = 1 - HYSTERESIS if above else 1 + HYSTERESIS
+        exit_ = lambda: enter() * ratio
+
+    label = f"{stat}({metric})" if window is None else f"{stat}({metric},{window:g}s)"
+    quantiles = (quantile,) if quantile is not None else ()
+    if window is not None:
+        # 提前创建滚动窗口，之后随采样增量维护
+        history.window(window)
+
+    def evaluate(active: bool, history, sample: Dict[str, Any], values: Dict[str, float]) -> bool:
+        if window is None:
+            value = sample.get(metric)
+            if value is None:
+                return False
+        else:
+            stats = history.stats(metric, window, quantiles)
+            if not stats["count"]:
+                return False
+            value = stats[key]
+        values[label] = value
+        threshold = exit_() if active else enter()
+        return value > threshold if above else value < threshold
+
+    return evaluate
+
+
+def compile_condition(spec: Any, metrics: tuple, history, where: str = "rule") -> Evaluator:
+    """
+    把条件树（阈值条件或all/any组合）编译为求值函数
+
+    Args:
+        spec: 条件树
+        metrics: 性能历史中的指标名称
+        history: 性能历史（MetricHistory）
+        where: 出错时提示的位置
+
+    Returns:
+        求值函数
+    """
+    if not isinstance(spec, Mapping):
+        raise ConfigError(f"{where}: condition must be an object")
+    for combinator, reducer in (("all", all), ("any", any)):
+        if combinator in spec:
+            children = spec[combinator]
+            if not isinstance(children, (list, tuple)) or not children:
+                raise ConfigError(f"{where}: {combinator} needs a non-empty list")
+            evaluators = tuple(compile_condition(child, metrics, history, f"{where}.{combinator}[{i}]")
+                               for i, child in enumerate(children))
+
+            # 不短路，每个条件都按自己的状态求值并记录读取到的值
+            def evaluate(active, history, sample, values, evaluators=evaluators, reducer=reducer):
+                return reducer([evaluator(active, history, sample, values) for evaluator in evaluators])
+
+            return evaluate
+    return _compile_condition(spec, metrics, history, where)
+
+
+class Rule:
+    """编译后的优化规则及其触发状态"""
+
+    def __init__(self, name: str, evaluate: Evaluator, action: Action, description: str = "",
+                 cooldown: float = 0.0, repeat: Optional[float] = None, max_per_hour: Optional[int] = None,
+                 enabled: bool = True, action_name: str = "", message: str = ""):
+        """
+        初始化规则
+
+        Args:
+            name: 规则名称
+            evaluate: 编译后的条件
+            action: 动作
+            description: 规则描述
+            cooldown: 两次执行的最小间隔（秒）
+            repeat: 条件持续满足时再次执行的间隔（秒），None表示每次进入只执行一次
+            max_per_hour: 每小时最多执行的次数，None表示不限制
+            enabled: 是否启用
+            action_name: 动作名称
+            message: 动作使用的消息（如warn）
+        """
+        self.name = name
+        self.evaluate = evaluate
+        self.action = action
+        self.description = description
+        self.cooldown = cooldown
+        self.repeat = repeat
+        self.max_per_hour = max_per_hour
+        self.enabled = enabled
+        self.action_name = action_name
+        self.message = message
+
+        # 触发状态
+        self.active = False
+        self.entered_at = 0.0
+        self.last_triggered = 0.0
+        self.trigger_count = 0
+        self.suppressed = 0
+        self._fired = False
+        self._suppressed_noted = False
+        self._recent = deque()
+        self.history = deque(maxlen=HISTORY_SIZE)
+
+    def _record(self, now: float, event: str, values: Dict[str, float]):
+        self.history.append({"time": now, "event": event, "values": dict(values)})
+
+    def check(self, now: float, history, sample: Dict[str, Any]) -> bool:
+        """
+        求值并在需要时执行动作
+
+        Args:
+            now: 当前时间戳
+            history: 性能历史
+            sample: 本次采样
+
+        Returns:
+            本次是否执行了动作
+        """
+        values: Dict[str, float] = {}
+        matched = self.evaluate(self.active, history, sample, values)
+        if not self.active:
+            if not matched:
+                return False
+            self.active = True
+            self.entered_at = now
+            self._fired = False
+            self._suppressed_noted = False
+            self._record(now, "enter", values)
+        elif not matched:
+            self.active = False
+            self._record(now, "exit", values)
+            return False
+
+        if self._fired and (self.repeat is None or now - self.last_triggered < self.repeat):
+            return False
+        if self.trigger_count and now - self.last_triggered < self.cooldown:
+            return False
+        while self._recent and now - self._recent[0] >= 3600:
+            self._recent.popleft()
+        if self.max_per_hour is not None and len(self._recent) >= self.max_per_hour:
+            self.suppressed += 1
+            if not self._suppressed_noted:
+                self._suppressed_noted = True
+                self._record(now, "suppressed", values)
+            return False
+
+        self._fired = True
+        self.trigger_count += 1
+        self.last_triggered = now
+        self._recent.append(now)
+        self._record(now, "fire", values)
+        self.action(sample, self, values)
+        return True
+
+    def inherit(self, previous: "Rule"):
+        """重新加载规则时沿用同名旧规则的触发状态和历史"""
+        self.active = previous.active
+        self.entered_at = previous.entered_at
+        self.last_triggered = previous.last_triggered
+        self.trigger_count = previous.trigger_count
+        self.suppressed = previous.suppressed
+        self._fired = previous._fired
+        self._suppressed_noted = previous._suppressed_noted
+        self._recent = previous._recent
+        self.history = previous.history
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取规则状态
+
+        Returns:
+            状态字典，history为最近的进入、执行、抑制和解除记录
+        """
+        return {
+            "name": self.name,
+            "description": self.description,
+            "action": self.action_name,
+            "enabled": self.enabled,
+            "active": self.active,
+            "trigger_count": self.trigger_count,
+            "last_triggered": self.last_triggered,
+            "suppressed": self.suppressed,
+            "cooldown": self.cooldown,
+            "repeat": self.repeat,
+            "max_per_hour": self.max_per_hour,
+            "history": list(self.history)
+        }
+
+
+def _number(spec: Mapping[str, Any], key: str, where: str, default: Any) -> Any:
+    value = spec.get(key, default)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ConfigError(f"{where}: {key} must be a non-negative number")
+    return value
+
+
+def compile_rule(spec: Any, history, actions: Mapping[str, Action]) -> Rule:
+    """
+    把一条规则声明编译为Rule
+
+    Args:
+        spec: 规则声明
+        history: 性能历史（MetricHistory）
+        actions: 可用的动作，动作名称 -> 动作
+
+    Returns:
+        编译后的规则
+
+    Raises:
+        ConfigError: 规则声明无效
+    """
+    if not isinstance(spec, Mapping) or not isinstance(spec.get("name"), str):
+        raise ConfigError("Optimization rule must be an object with a name")
+    name = spec["name"]
+    where = f"rule {name}"
+    if "when" not in spec:
+        raise ConfigError(f"{where}: missing when")
+    action_name = spec.get("action")
+    if action_name not in actions:
+        raise ConfigError(f"{where}: unknown action {action_name!r} (available: {', '.join(sorted(actions))})")
+
+    max_per_hour = _number(spec, "max_per_hour", where, None)
+    return Rule(
+        name=name,
+        evaluate=compile_condition(spec["when"], history.metrics, history, where),
+        action=actions[action_name],
+        description=spec.get("description", ""),
+        cooldown=_number(spec, "cooldown", where, 0.0),
+        repeat=_number(spec, "repeat", where, None),
+        max_per_hour=int(max_per_hour) if max_per_hour is not None else None,
+        enabled=bool(spec.get("enabled", True)),
+        action_name=action_name,
+        message=spec.get("message", "")
+    )
+
+
+def compile_rules(specs: Any, history, actions: Mapping[str, Action],
+                  report: Callable[[str], None] = None) -> List[Rule]:
+    """
+    编译一组规则，无效的规则被跳过并报告
+
+    Args:
+        specs: 规则声明列表
+        history: 性能历史（MetricHistory）
+        actions: 可用的动作
+        report: 报告无效规则的函数
+
+    Returns:
+        编译后的规则列表
+    """
+    rules = []
+    names = set()
+    for spec in specs:
+        try:
+            rule = compile_rule(spec, history, actions)
+            if rule.name in names:
+                raise ConfigError(f"rule {rule.name}: duplicate name")
+        except ConfigError as e:
+            if report is not None:
+                report(f"Ignoring optimization rule: {e}")
+            continue
+        names.add(rule.name)
+        rules.append(rule)
+    return rules
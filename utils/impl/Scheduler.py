@@ -0,0 +1,314 @@
+"""
+统一调度器
+进程内所有周期性的后台工作（性能采样、自动优化、配置文件轮询、日志缓冲写出、合并摘要、自动前置窗口）
+都登记到同一个调度线程上，不再每个任务各开一个睡眠循环的守护线程。
+任务应当很快结束：可能阻塞数秒的工作（错误数据库写入要等其他进程释放SQLite锁，
+多进程日志客户端要等属主确认）仍在各自的线程中进行，避免拖慢其他任务
+
+- 任务按下次运行时间放在最小堆中，调度线程只在最早的任务到期或任务变化时醒来
+- 周期任务可以设置抖动，避免多个同周期任务总在同一时刻醒来；抖动不会累积成周期漂移
+- 任务运行时间超过周期、或进程挂起后错过的多次运行合并为一次（coalesce），并计入missed
+- 每个任务记录运行次数、失败次数、错过次数和耗时统计
+- shutdown()取消所有任务并等待正在运行的任务结束后线程退出，关闭顺序是确定的
+"""
+import time
+import heapq
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+_logger = logging.getLogger("CCTB.Scheduler")
+
+
+class ScheduledTask:
+    """调度器中的一个任务"""
+
+    __slots__ = ("name", "func", "interval", "jitter", "coalesce", "base", "next_run", "generation",
+                 "cancelled", "runs", "failures", "missed", "total_time", "max_time", "last_run",
+                 "last_duration")
+
+    def __init__(self, name: str, func: Callable[[], Any], interval: Optional[float], jitter: float,
+                 coalesce: bool, first_run: float):
+        self.name = name
+        self.func = func
+        # None表示一次性任务
+        self.interval = interval
+        self.jitter = jitter
+        self.coalesce = coalesce
+        # 不含抖动的计划时间，周期按它推进，抖动只加在实际运行时间上
+        self.base = first_run
+        self.next_run = first_run
+        # 每次重新排期加一，堆中世代不一致的旧条目直接丢弃
+        self.generation = 0
+        self.cancelled = False
+
+        # 统计计数器
+        self.runs = 0
+        self.failures = 0
+        self.missed = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_run = 0.0
+        self.last_duration = 0.0
+
+    @property
+    def periodic(self) -> bool:
+        return self.interval is not None
+
+
+class Scheduler:
+    """单线程调度器，线程安全"""
+
+    def __init__(self, name: str = "CCTB-Scheduler"):
+        """
+        初始化调度器，调度线程在登记第一个任务时启动
+
+        Args:
+            name: 调度线程名称
+        """
+        self.name = name
+        self._heap: List[tuple] = []
+        self._tasks: Dict[str, ScheduledTask] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running_task: Optional[ScheduledTask] = None
+        self._stopping = False
+        self._sequence = 0
+        self.wakeups = 0
+
+    def _push(self, task: ScheduledTask):
+        """把任务按下次运行时间放入堆，调用方持有锁"""
+        task.generation += 1
+        self._sequence += 1
+        heapq.heappush(self._heap, (task.next_run, self._sequence, task.generation, task))
+        self._condition.notify()
+
+    def _ensure_thread(self):
+        """按需启动调度线程，调用方持有锁"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run_loop, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _add(self, name: str, func: Callable[[], Any], interval: Optional[float], delay: float,
+             jitter: float, coalesce: bool) -> ScheduledTask:
+        task = ScheduledTask(name, func, interval, jitter, coalesce, time.monotonic() + max(0.0, delay))
+        if jitter:
+            task.next_run += random.uniform(0, jitter)
+        with self._condition:
+            # 同名任务只保留最新登记的一个
+            previous = self._tasks.get(name)
+            if previous is not None:
+                previous.cancelled = True
+            self._tasks[name] = task
+            self._push(task)
+            self._ensure_thread()
+        return task
+
+    def schedule_periodic(self, name: str, func: Callable[[], Any], interval: float,
+                          delay: Optional[float] = None, jitter: float = 0.0,
+                          coalesce: bool = True) -> ScheduledTask:
+        """
+        登记周期任务
+
+        Args:
+            name: 任务名称，同名任务会被替换
+            func: 任务函数，不接收参数
+            interval: 运行周期（秒）
+            delay: 第一次运行前的延迟（秒），默认为一个周期
+            jitter: 每次运行最多随机推迟的秒数
+            coalesce: 错过的多次运行是否合并为一次，为False时会连续补跑
+
+        Returns:
+            任务对象，可用于cancel()和reschedule()
+        """
+        if interval <= 0:
+            raise ValueError(f"Task interval must be positive: {interval}")
+        return self._add(name, func, interval, interval if delay is None else delay, jitter, coalesce)
+
+    def schedule_once(self, name: str, func: Callable[[], Any], delay: float = 0.0) -> ScheduledTask:
+        """
+        登记一次性任务
+
+        Args:
+            name: 任务名称，同名任务会被替换
+            func: 任务函数，不接收参数
+            delay: 延迟（秒）
+
+        Returns:
+            任务对象
+        """
+        return self._add(name, func, None, delay, 0.0, True)
+
+    def reschedule(self, task: ScheduledTask, interval: Optional[float] = None, delay: Optional[float] = None):
+        """
+        修改任务的周期或下次运行时间
+
+        Args:
+            task: 任务对象
+            interval: 新的周期（秒），None表示不变
+            delay: 距下次运行的秒数，默认为一个（新的）周期
+        """
+        with self._condition:
+            if task.cancelled:
+                return
+            if interval is not None:
+                if interval <= 0:
+                    raise ValueError(f"Task interval must be positive: {interval}")
+                task.interval = interval
+            if delay is None:
+                delay = task.interval or 0.0
+            task.base = time.monotonic() + max(0.0, delay)
+            task.next_run = task.base + (random.uniform(0, task.jitter) if task.jitter else 0.0)
+            # 任务正在运行时由调度线程在运行结束后重新排期
+            if task is not self._running_task:
+                self._push(task)
+
+    def cancel(self, task: Optional[ScheduledTask], wait: bool = False):
+        """
+        取消任务
+
+        Args:
+            task: 任务对象，None时忽略
+            wait: 任务正在运行时是否等待它结束（在调度线程内调用时忽略）
+        """
+        if task is None:
+            return
+        with self._condition:
+            task.cancelled = True
+            if self._tasks.get(task.name) is task:
+                del self._tasks[task.name]
+            self._condition.notify()
+            if wait and threading.current_thread() is not self._thread:
+                while self._running_task is task:
+                    self._condition.wait()
+
+    def get_task(self, name: str) -> Optional[ScheduledTask]:
+        """按名称获取任务"""
+        return self._tasks.get(name)
+
+    def _run_loop(self):
+        """调度循环"""
+        condition = self._condition
+        while True:
+            with condition:
+                task = None
+                while not self._stopping:
+                    if not self._heap:
+                        condition.wait()
+                        self.wakeups += 1
+                        continue
+                    next_run, _, generation, candidate = self._heap[0]
+                    if candidate.cancelled or generation != candidate.generation:
+                        heapq.heappop(self._heap)
+                        continue
+                    delay = next_run - time.monotonic()
+                    if delay > 0:
+                        condition.wait(delay)
+                        self.wakeups += 1
+                        continue
+                    heapq.heappop(self._heap)
+                    task = candidate
+                    self._running_task = task
+                    break
+                if self._stopping:
+                    return
+
+            self._execute(task)
+
+            with condition:
+                self._running_task = None
+                if task.periodic and not task.cancelled:
+                    self._advance(task)
+                elif not task.periodic and self._tasks.get(task.name) is task:
+                    del self._tasks[task.name]
+                condition.notify_all()
+
+    @staticmethod
+    def _execute(task: ScheduledTask):
+        """运行任务并记录耗时"""
+        started = time.perf_counter()
+        try:
+            task.func()
+        except Exception as e:
+            task.failures += 1
+            _logger.error(f"Scheduled task {task.name} failed: {e}")
+        duration = time.perf_counter() - started
+        task.runs += 1
+        task.last_run = time.time()
+        task.last_duration = duration
+        task.total_time += duration
+        if duration > task.max_time:
+            task.max_time = duration
+
+    def _advance(self, task: ScheduledTask):
+        """计算周期任务的下次运行时间，调用方持有锁"""
+        now = time.monotonic()
+        # 运行期间被reschedule()过时base已经在未来
+        if task.base <= now:
+            task.base += task.interval
+            if task.base <= now:
+                behind = int((now - task.base) // task.interval) + 1
+                task.missed += behind
+                if task.coalesce:
+                    # 错过的运行合并为一次：跳到下一个还没到的周期点
+                    task.base += behind * task.interval
+        task.next_run = task.base + (random.uniform(0, task.jitter) if task.jitter else 0.0)
+        self._push(task)
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """
+        取消所有任务并停止调度线程，等待正在运行的任务结束
+
+        Args:
+            timeout: 最长等待秒数，None表示一直等待
+
+        Returns:
+            调度线程已退出返回True
+        """
+        with self._condition:
+            for task in self._tasks.values():
+                task.cancelled = True
+            self._tasks.clear()
+            self._heap.clear()
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is None or thread is threading.current_thread():
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取调度器统计信息
+
+        Returns:
+            统计信息字典，tasks为任务名称 -> 运行统计
+        """
+        now = time.monotonic()
+        with self._condition:
+            tasks = {
+                task.name: {
+                    "interval": task.interval,
+                    "next_in": max(0.0, task.next_run - now),
+                    "runs": task.runs,
+                    "failures": task.failures,
+                    "missed": task.missed,
+                    "avg_ms": task.total_time / task.runs * 1000 if task.runs else 0.0,
+                    "max_ms": task.max_time * 1000,
+                    "last_ms": task.last_duration * 1000,
+                    "last_run": task.last_run
+                }
+                for task in self._tasks.values()
+            }
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "wakeups": self.wakeups,
+                "tasks": tasks
+            }
+
+
+# 全局调度器
+scheduler = Scheduler()
@@ -4,7 +4,9 @@
 """
 
 import platform
+from types import MappingProxyType
 from utils.impl.ErrorHandler import handle_exception, SystemError
+from utils.impl.Memoize import memoize
 
 """
 检查系统版本工具
@@ -14,22 +16,14 @@ utils.SysCheck()
 
 返回值：json
 eg.:{"name":"windows","version":"11"}
+结果在进程内只计算一次（platform.platform()在部分系统上会启动子进程），
+缓存的是只读映射，每次调用返回一份新的字典，调用方修改返回值不会影响其他调用方；
+需要重新检查时调用sysCheck.cache_clear()
 """
 
-@handle_exception(SystemError, default_return={"name": "unknown"}, error_message="Failed to get system information")
-def sysCheck():
-    """
-    获取当前操作系统的基本信息
-    
-    Returns:
-        dict: 包含系统信息的字典，包含以下键:
-            - name: 系统名称 ('windows', 'linux', 'darwin' 或 'unknown')
-            - platform: 系统平台信息
-            - version: 系统版本信息
-            
-    Raises:
-        SystemError: 当系统检查过程中发生错误时抛出
-    """
+@memoize(maxsize=1, name="utils.impl.SysCheck.sysCheck")
+def _system_info():
+    """获取系统信息并缓存为只读映射"""
     try:
         # 获取系统名称
         system_name = platform.system().lower()
@@ -44,16 +38,35 @@ def sysCheck():
         else:
             name = "unknown"
         
-        # 返回系统信息
-        return {
+        return MappingProxyType({
             "name": name,
             "platform": platform.platform(),
             "version": platform.version()
-        }
+        })
     except Exception as e:
         raise SystemError(f"Error getting system information: {e}")
 
 
+@handle_exception(SystemError, default_return={"name": "unknown"}, error_message="Failed to get system information")
+def sysCheck():
+    """
+    获取当前操作系统的基本信息
+    
+    Returns:
+        dict: 包含系统信息的字典（每次调用都是新的副本），包含以下键:
+            - name: 系统名称 ('windows', 'linux', 'darwin' 或 'unknown')
+            - platform: 系统平台信息
+            - version: 系统版本信息
+            
+    Raises:
+        SystemError: 当系统检查过程中发生错误时抛出
+    """
+    return dict(_system_info())
+
+
+sysCheck.cache_clear = _system_info.cache_clear
+
+
 if __name__ == "__main__":
     # 测试代码
     system_info = sysCheck()